@@ -0,0 +1,72 @@
+"""過去のコンテスト結果をまとめて結果データベースに記録する
+
+使い方:
+    python backfill.py abc350-abc360
+    python backfill.py 350-360 --type abc --type arc
+    python backfill.py abc350-abc360 --restart
+
+同じ指定で実行し直すと、前回中断したところから再開する。
+"""
+
+import argparse
+import asyncio
+import functools
+import sys
+
+from env.config import Config
+from utils.atcoder_session import login
+from utils.backfill import DEFAULT_CONCURRENCY, Backfill, parse_contest_ids
+from utils.executor import executor
+from utils.result_store import ResultStore
+
+
+def print_progress(progress, contest_id, ok):
+    status = "完了" if ok else "失敗"
+    print(
+        f"[{progress.finished}/{progress.total}] {contest_id}: {status} "
+        f"({progress.elapsed:.0f}秒)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="過去のコンテスト結果を結果データベースに記録する")
+    parser.add_argument("contests", help="コンテストの指定 (例: abc350-abc360,arc170)")
+    parser.add_argument(
+        "--type",
+        action="append",
+        dest="contest_types",
+        help="種類を省略した番号に使うコンテストの種類 (既定: abc, 複数指定可)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="並行して取得するコンテスト数",
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="前回の続きからではなく最初からやり直す"
+    )
+    args = parser.parse_args()
+
+    try:
+        contest_ids = parse_contest_ids(args.contests, args.contest_types or ["abc"])
+    except ValueError as e:
+        parser.error(str(e))
+
+    config = Config()
+    backfill = Backfill(
+        ResultStore(config.result_store_file),
+        functools.partial(login, config.atcoder_username, config.atcoder_password),
+        concurrency=args.concurrency,
+    )
+    try:
+        result = asyncio.run(backfill.run(contest_ids, print_progress, args.restart))
+    finally:
+        executor.shutdown()
+    for contest_id, error in result.failed.items():
+        print(f"失敗: {contest_id}: {error}")
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""AffiliatedPolice のキーワード検索のマイクロベンチマーク
+
+benchmarks/data/messages.txt のメッセージを順に検索し、キーワード数を
+増やしたときに 1 メッセージ当たりのコストがどう変わるかを比べる。
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from cogs.affiliated_police import POLICE_RULES_FILE
+from utils.keyword_matcher import KeywordMatcher
+from utils.message_gate import MessageGate
+from utils.police_rules import RuleFile
+
+CORPUS_FILE = os.path.join(os.path.dirname(__file__), "data", "messages.txt")
+RULE_FILE = RuleFile(os.path.join(os.path.dirname(__file__), "..", POLICE_RULES_FILE))
+RULE_FILE.reload()
+BASE_KEYWORDS = list(RULE_FILE.rule_set.matcher.keywords)
+KEYWORD_COUNTS = [len(BASE_KEYWORDS), 100, 500]
+
+
+def load_corpus():
+    with open(CORPUS_FILE, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def make_keywords(count):
+    """実際のキーワードに、本文には出てこない合成キーワードを足して count 個にする"""
+    keywords = list(BASE_KEYWORDS)
+    i = 0
+    while len(keywords) < count:
+        keywords.append(f"付属{i:03d}号")
+        i += 1
+    return keywords
+
+
+def naive_scan(keywords, corpus):
+    hits = 0
+    for message in corpus:
+        for keyword in keywords:
+            if keyword in message:
+                hits += 1
+                break
+    return hits
+
+
+def matcher_scan(matcher, corpus):
+    hits = 0
+    for message in corpus:
+        if matcher.best_match(message) is not None:
+            hits += 1
+    return hits
+
+
+@pytest.mark.parametrize("keyword_count", KEYWORD_COUNTS)
+def bench_keyword_matcher(benchmark, keyword_count):
+    corpus = load_corpus()
+    keywords = make_keywords(keyword_count)
+    matcher = KeywordMatcher(keywords)
+
+    hits = benchmark(matcher_scan, matcher, corpus)
+
+    assert hits == naive_scan(keywords, corpus)
+    benchmark.extra_info["messages"] = len(corpus)
+    benchmark.extra_info["hits"] = hits
+
+
+@pytest.mark.parametrize("keyword_count", KEYWORD_COUNTS)
+def bench_naive_substring_scan(benchmark, keyword_count):
+    """置き換え前の実装 (キーワードごとに本文を走査する) との比較用"""
+    corpus = load_corpus()
+    keywords = make_keywords(keyword_count)
+
+    benchmark(naive_scan, keywords, corpus)
+
+
+def bench_gated_scan(benchmark):
+    """MessageGate で前処理してから検索する、on_message と同じ経路"""
+    corpus = load_corpus()
+    author = SimpleNamespace(bot=False)
+    guild = SimpleNamespace(id=1)
+    messages = [
+        SimpleNamespace(author=author, webhook_id=None, guild=guild, content=text)
+        for text in corpus
+    ]
+    rule_set = RULE_FILE.rule_set
+    gate = MessageGate()
+    gate.set_keywords(rule_set.matcher.keywords)
+    gate.set_guild_policy(False, enabled_guilds=[guild.id])
+
+    def run():
+        hits = 0
+        for message in messages:
+            text = gate.admit(message)
+            if text is not None and rule_set.match(text) is not None:
+                hits += 1
+        return hits
+
+    hits = benchmark(run)
+
+    assert hits == naive_scan(BASE_KEYWORDS, corpus)
+    summary = gate.summary()
+    benchmark.extra_info["scanned_ratio"] = summary["scanned"] / (
+        summary["scanned"] + summary["skipped"]
+    )
@@ -0,0 +1,147 @@
+"""リマインダー経路の負荷ベンチマーク
+
+1k ギルド × 7 通知タイミング × 4 コンテストタイプ規模で、各 cog の
+タスクループ 1 回分のコストを pytest-benchmark で計測する。
+
+    uv run pytest benchmarks/ --benchmark-columns=min,mean,max
+
+送信遅延のパーセンタイル・メモリ使用量・1 バースト当たりの YAML 書き込み回数は
+各ベンチマークの extra_info に記録される。
+"""
+
+import datetime
+import tracemalloc
+
+import pytest
+
+import cogs.threads
+from benchmarks.fake_discord import (
+    make_contests,
+    make_raw_contests,
+    make_threads_config,
+    write_yaml,
+)
+
+GUILD_COUNTS = [10, 100, 1000]
+
+
+def reset_reminder_burst(world):
+    """先頭コンテストのリマインダーが未送信の状態に戻す"""
+    reminder = world["reminder"]
+    for config in reminder.reminders.values():
+        for contest_type in ("ABC", "ARC", "AGC", "AHC"):
+            for type_config in config[contest_type]:
+                type_config["sent_reminders"] = []
+    reminder.last_checked = world["now"] - datetime.timedelta(minutes=1)
+
+
+def measure_peak_memory(loop, coro_factory):
+    tracemalloc.start()
+    try:
+        loop.run_until_complete(coro_factory())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+@pytest.mark.parametrize("guild_count", GUILD_COUNTS)
+def bench_check_reminders_burst(
+    benchmark, loop, make_world, yaml_writes, unthrottled_broadcaster, guild_count
+):
+    """ABC 開始 5 分前、全ギルドへ一斉にリマインダーを送る tick"""
+    world = make_world(
+        guild_count, send_latency=0.005, lead=datetime.timedelta(minutes=5)
+    )
+    reminder = world["reminder"]
+
+    reset_reminder_burst(world)
+    peak = measure_peak_memory(loop, reminder.check_reminders)
+
+    reset_reminder_burst(world)
+    yaml_writes["count"] = 0
+    loop.run_until_complete(reminder.check_reminders())
+    writes_per_burst = yaml_writes["count"]
+    sent = unthrottled_broadcaster.last_broadcast
+
+    benchmark.pedantic(
+        lambda: loop.run_until_complete(reminder.check_reminders()),
+        setup=lambda: reset_reminder_burst(world),
+        rounds=5,
+        iterations=1,
+    )
+
+    assert sent["succeeded"] == guild_count
+    benchmark.extra_info.update(
+        {
+            "deliveries": sent["targets"],
+            "yaml_writes_per_burst": writes_per_burst,
+            "send_latency_p50": sent["p50"],
+            "send_latency_p95": sent["p95"],
+            "send_latency_p99": sent["p99"],
+            "peak_memory_bytes": peak,
+        }
+    )
+
+
+@pytest.mark.parametrize("guild_count", GUILD_COUNTS)
+def bench_check_reminders_idle(benchmark, loop, make_world, yaml_writes, guild_count):
+    """送信対象がない通常の tick (インデックス構築後の定常コスト)"""
+    world = make_world(guild_count, lead=datetime.timedelta(days=1))
+    reminder = world["reminder"]
+    loop.run_until_complete(reminder.check_reminders())
+
+    yaml_writes["count"] = 0
+    benchmark(lambda: loop.run_until_complete(reminder.check_reminders()))
+
+    benchmark.extra_info["yaml_writes"] = yaml_writes["count"]
+    benchmark.extra_info["due_index_size"] = len(reminder._due_index)
+
+
+@pytest.mark.parametrize("guild_count", GUILD_COUNTS)
+def bench_threads_tick(
+    benchmark, loop, make_world, asset_files, yaml_writes, guild_count
+):
+    """コンテスト 1 時間前のスレッド作成 tick"""
+    world = make_world(
+        guild_count, lead=datetime.timedelta(minutes=59, seconds=30)
+    )
+    write_yaml(asset_files["threads"], make_threads_config(world["guilds"]))
+    contest_data = world["contest_data"]
+
+    async def create_threads_cog():
+        return await world["bot"].add_cog(cogs.threads.Threads(world["bot"]))
+
+    threads = loop.run_until_complete(create_threads_cog())
+
+    def reset():
+        for contest in contest_data.contests:
+            contest["threads_created"] = False
+        yaml_writes["count"] = 0
+
+    benchmark.pedantic(
+        lambda: loop.run_until_complete(threads.check_contests_and_create_threads()),
+        setup=reset,
+        rounds=5,
+        iterations=1,
+    )
+    benchmark.extra_info["yaml_writes_per_burst"] = yaml_writes["count"]
+
+
+def bench_contest_data_refresh(benchmark, loop, make_world, yaml_writes, monkeypatch):
+    """ContestData.fetch_contests の変換と保存のコスト (取得部分は差し替え)"""
+    world = make_world(1)
+    contest_data = world["contest_data"]
+    raw = make_raw_contests(make_contests(world["now"], per_type=200))
+
+    async def fake_fetch():
+        return raw
+
+    monkeypatch.setattr(contest_data, "fetch_contests_from_web", fake_fetch)
+
+    yaml_writes["count"] = 0
+    benchmark(lambda: loop.run_until_complete(contest_data.fetch_contests()))
+
+    assert len(contest_data.contests) == len(raw)
+    benchmark.extra_info["contests"] = len(raw)
+    benchmark.extra_info["yaml_writes"] = yaml_writes["count"]
@@ -0,0 +1,105 @@
+import asyncio
+import datetime
+
+import pytest
+import yaml
+
+import cogs.contest_data
+import cogs.reminder
+import cogs.threads
+from benchmarks.fake_discord import (
+    FakeBot,
+    FakeGuild,
+    make_contests,
+    make_reminders,
+    write_yaml,
+)
+from utils.broadcast import Broadcaster
+
+
+@pytest.fixture
+def loop():
+    """cog のタスクループを動かすためのイベントループ"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    for task in asyncio.all_tasks(loop):
+        task.cancel()
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+
+
+@pytest.fixture
+def yaml_writes(monkeypatch):
+    """yaml.dump の呼び出し回数を数える"""
+    counter = {"count": 0}
+    original_dump = yaml.dump
+
+    def counting_dump(*args, **kwargs):
+        counter["count"] += 1
+        return original_dump(*args, **kwargs)
+
+    monkeypatch.setattr(yaml, "dump", counting_dump)
+    return counter
+
+
+@pytest.fixture
+def asset_files(tmp_path, monkeypatch):
+    """各 cog の保存先を一時ディレクトリに差し替える"""
+    paths = {
+        "contests": tmp_path / "contests.yaml",
+        "reminders": tmp_path / "reminders.yaml",
+        "reminder_state": tmp_path / "reminder_state.yaml",
+        "threads": tmp_path / "threads.yaml",
+    }
+    monkeypatch.setattr(cogs.contest_data, "CONTESTS_FILE", str(paths["contests"]))
+    monkeypatch.setattr(cogs.reminder, "CONTESTS_FILE", str(paths["contests"]))
+    monkeypatch.setattr(cogs.reminder, "REMINDERS_FILE", str(paths["reminders"]))
+    monkeypatch.setattr(
+        cogs.reminder, "REMINDER_STATE_FILE", str(paths["reminder_state"])
+    )
+    monkeypatch.setattr(cogs.threads, "THREADS_FILE", str(paths["threads"]))
+    return paths
+
+
+@pytest.fixture
+def unthrottled_broadcaster(monkeypatch):
+    """グローバルレート制限を外した Broadcaster (コードパス自体のコストを測る)"""
+    broadcaster = Broadcaster(global_rate=0)
+    monkeypatch.setattr(cogs.reminder, "broadcaster", broadcaster)
+    return broadcaster
+
+
+@pytest.fixture
+def make_world(loop, asset_files):
+    """ギルド数を指定して FakeBot と合成 YAML を用意する"""
+
+    def build(guild_count, per_type=50, send_latency=0.0, **contest_kwargs):
+        now = datetime.datetime.now()
+        guilds = [
+            FakeGuild(
+                name=f"guild{i}",
+                role_names=("ABC参加勢", "ARC参加勢", "AGC参加勢", "AHC参加勢"),
+                send_latency=send_latency,
+            )
+            for i in range(guild_count)
+        ]
+        bot = FakeBot(guilds)
+        contests = make_contests(now, per_type=per_type, **contest_kwargs)
+        write_yaml(asset_files["contests"], contests)
+        write_yaml(asset_files["reminders"], make_reminders(guilds))
+
+        async def create_cogs():
+            contest_data = await bot.add_cog(cogs.contest_data.ContestData(bot))
+            reminder = await bot.add_cog(cogs.reminder.Reminder(bot))
+            return contest_data, reminder
+
+        contest_data, reminder = loop.run_until_complete(create_cogs())
+        return {
+            "now": now,
+            "bot": bot,
+            "guilds": guilds,
+            "contest_data": contest_data,
+            "reminder": reminder,
+        }
+
+    return build
@@ -0,0 +1,210 @@
+"""ネットワークに出ない Discord の代用品 (ベンチマーク用)
+
+Reminder / Threads / ContestData が触る属性とメソッドだけを実装している。
+送信は指定した遅延だけ await して記録するだけで、実際の通信は行わない。
+"""
+
+import asyncio
+import datetime
+import itertools
+
+import yaml
+
+_ids = itertools.count(10**17)
+
+
+class FakeRole:
+    def __init__(self, guild, name):
+        self.id = next(_ids)
+        self.guild = guild
+        self.name = name
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None, embeds=None, file=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embeds = embeds or ([embed] if embed else [])
+        self.file = file
+
+
+class FakeThread:
+    def __init__(self, channel, name):
+        self.id = next(_ids)
+        self.parent = channel
+        self.name = name
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        message = FakeMessage(self, content=content, **kwargs)
+        self.messages.append(message)
+        return message
+
+
+class FakeChannel:
+    def __init__(self, guild, name="general", send_latency=0.0):
+        self.id = next(_ids)
+        self.guild = guild
+        self.name = name
+        self.send_latency = send_latency
+        self.messages = []
+        self.threads = []
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    async def send(self, content=None, **kwargs):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        message = FakeMessage(self, content=content, **kwargs)
+        self.messages.append(message)
+        return message
+
+    async def create_thread(self, name, **kwargs):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        thread = FakeThread(self, name)
+        self.threads.append(thread)
+        return thread
+
+
+class FakeGuild:
+    def __init__(self, name="guild", role_names=(), send_latency=0.0):
+        self.id = next(_ids)
+        self.name = name
+        self.roles = [FakeRole(self, role_name) for role_name in role_names]
+        self.channels = [FakeChannel(self, send_latency=send_latency)]
+        self.create_role_calls = 0
+
+    def get_role(self, role_id):
+        for role in self.roles:
+            if role.id == role_id:
+                return role
+        return None
+
+    async def create_role(self, name):
+        self.create_role_calls += 1
+        role = FakeRole(self, name)
+        self.roles.append(role)
+        return role
+
+
+class FakeBot:
+    """commands.Bot の代わりに cog へ渡すオブジェクト"""
+
+    def __init__(self, guilds):
+        self.guilds = list(guilds)
+        self.user = object()
+        self._cogs = {}
+        self._channels = {
+            channel.id: channel for guild in self.guilds for channel in guild.channels
+        }
+        self._guilds = {guild.id: guild for guild in self.guilds}
+        # 一度もセットしないので、各 cog のタスクループは before_loop で止まったままになる
+        self._ready = asyncio.Event()
+
+    async def add_cog(self, cog):
+        await cog.cog_load()
+        self._cogs[type(cog).__name__] = cog
+        return cog
+
+    def get_cog(self, name):
+        return self._cogs.get(name)
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def get_guild(self, guild_id):
+        return self._guilds.get(guild_id)
+
+    async def wait_until_ready(self):
+        await self._ready.wait()
+
+    def sent_messages(self):
+        return sum(len(channel.messages) for channel in self._channels.values())
+
+
+def make_contests(
+    now,
+    per_type=50,
+    contest_types=("ABC", "ARC", "AGC", "AHC"),
+    lead=datetime.timedelta(seconds=30),
+):
+    """contests.yaml と同じ形のコンテスト一覧を作る
+
+    先頭の ABC は now + lead に始まる。既定値では1分前リマインダーが
+    ちょうど送信対象になる。
+    """
+    contests = []
+    for i in range(per_type):
+        for j, contest_type in enumerate(contest_types):
+            start = now + lead + datetime.timedelta(days=i, hours=j)
+            end = start + datetime.timedelta(minutes=100)
+            number = 1000 + i
+            contests.append(
+                {
+                    "name": f"AtCoder {contest_type} {number}",
+                    "start_time": start.strftime("%Y-%m-%d %H:%M:%S"),
+                    "end_time": end.strftime("%Y-%m-%d %H:%M:%S"),
+                    "duration": "01:40",
+                    "type": contest_type,
+                    "url": f"https://atcoder.jp/contests/{contest_type.lower()}{number}",
+                    "rated_range": " ~ 1999",
+                    "threads_created": False,
+                }
+            )
+    return contests
+
+
+def make_raw_contests(contests):
+    """atcoder-contest-info の contests.yaml 形式に戻す (ContestData 用)"""
+    raw = []
+    for contest in contests:
+        start = datetime.datetime.strptime(contest["start_time"], "%Y-%m-%d %H:%M:%S")
+        raw.append(
+            {
+                "name_en": contest["name"],
+                "start_time": start.strftime("%Y-%m-%dT%H:%M:%S+09:00"),
+                "duration_min": 100,
+                "url": contest["url"],
+                "rated_range": contest["rated_range"],
+            }
+        )
+    return raw
+
+
+def make_reminders(guilds, reminder_times=(1, 5, 10, 15, 30, 60, 120)):
+    """全ギルド・全コンテストタイプに reminder_times の通知を設定した reminders.yaml"""
+    reminders = {}
+    for guild in guilds:
+        config = {"reminder_channel_id": str(guild.channels[0].id)}
+        for contest_type in ("ABC", "ARC", "AGC", "AHC"):
+            config[contest_type] = [
+                {"reminder_time": t, "enabled": True, "sent_reminders": []}
+                for t in reminder_times
+            ]
+        reminders[str(guild.id)] = config
+    return reminders
+
+
+def make_threads_config(guilds):
+    """全ギルドで全コンテストタイプのスレッド作成を有効にした threads.yaml"""
+    return {
+        str(guild.id): {
+            "channel_id": str(guild.channels[0].id),
+            **{t: {"enabled": True} for t in ("ABC", "ARC", "AGC", "AHC")},
+        }
+        for guild in guilds
+    }
+
+
+def write_yaml(path, data):
+    """合成データを書き出す (yaml.dump の書き込み回数には数えない)"""
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
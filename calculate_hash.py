@@ -1,8 +1,17 @@
 import hashlib
 
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamHasher:
+    """受信しながら内容のハッシュ値を計算する (BLAKE2b, 128ビット)"""
+
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def update(self, chunk):
+        self._hash.update(chunk)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
 
-def calculate_hash(filename):
-    """ファイルのハッシュ値を計算する"""
-    with open(filename, "rb") as f:
-        file_content = f.read()
-    return hashlib.md5(file_content).hexdigest()
\ No newline at end of file
@@ -1,50 +1,205 @@
+import asyncio
+import os
+
 import discord
-from discord.ext import commands
+import yaml
+from discord import app_commands
+from discord.ext import commands, tasks
+
+from utils.message_gate import MessageGate
+from utils.metrics import metrics
+from utils.police_rules import CooldownMap, RuleFile
 
-# Keywords to detect
-KEYWORDS = {
-    "筑付": "筑附",
-    "付属中": "附属中",
-    "大学付属": "大学附属",
-    "桐蔭祭": "桐陰祭",
-    "桐蔭会": "桐陰会",
-    "付属高": "附属高",
-    "付属小": "附属小"
+POLICE_RULES_FILE = "asset/police_rules.yaml"
+POLICE_GUILDS_FILE = "asset/police_guilds.yaml"
 
-}
 
 class AffiliatedPolice(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # ルールはYAMLから読み込み、内容が変わったときだけ検索器を組み立て直す
+        self.rule_file = RuleFile(POLICE_RULES_FILE)
+        self.guild_settings = {}
+        # (channel_id, rule_id) -> クールダウン終了時刻
+        self.cooldowns = CooldownMap()
+        # 本文を検索する前に、明らかに関係ないメッセージを捨てる
+        self.gate = MessageGate()
+
+    async def cog_load(self):
+        await asyncio.to_thread(self.rule_file.reload)
+        self.guild_settings = await asyncio.to_thread(self.load_guild_settings)
+        self.gate.set_keywords(self.rule_file.rule_set.matcher.keywords)
+        self.refresh_guild_policy()
+        self.reload_rules_loop.start()
+
+    def cog_unload(self):
+        self.reload_rules_loop.cancel()
+
+    def load_guild_settings(self):
+        """サーバーごとの有効/無効設定をYAMLファイルから読み込む"""
+        if os.path.exists(POLICE_GUILDS_FILE):
+            with open(POLICE_GUILDS_FILE, "r", encoding="utf-8") as f:
+                settings = yaml.safe_load(f)
+                return settings if settings is not None else {}
+        return {}
+
+    def save_guild_settings(self):
+        """サーバーごとの有効/無効設定をYAMLファイルに保存する"""
+        with open(POLICE_GUILDS_FILE, "w", encoding="utf-8") as f:
+            yaml.dump(
+                self.guild_settings,
+                f,
+                allow_unicode=True,
+                default_flow_style=False,
+                sort_keys=False,
+            )
+        self.refresh_guild_policy()
+
+    def refresh_guild_policy(self):
+        """サーバー設定からゲートの有効/無効集合を作り直す"""
+        enabled_guilds = [
+            int(guild_id)
+            for guild_id, setting in self.guild_settings.items()
+            if setting.get("enabled", False)
+        ]
+        self.gate.set_guild_policy(False, enabled_guilds=enabled_guilds)
+
+    def get_guild_setting(self, guild_id):
+        """サーバーの設定を返す (未設定なら無効。/police---enable で有効にする)"""
+        return self.guild_settings.get(
+            str(guild_id), {"enabled": False, "disabled_rules": []}
+        )
+
+    @tasks.loop(seconds=30)
+    @metrics.timed("loop_tick_seconds", loop="reload_rules_loop")
+    async def reload_rules_loop(self):
+        """ルールファイルが更新されていれば読み直す"""
+        if self.rule_file.reload():
+            self.gate.set_keywords(self.rule_file.rule_set.matcher.keywords)
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
-        # Ignore messages from the bot itself
-        if message.author == self.bot.user:
+        # Bot・Webhook・無効なサーバー・キーワードの先頭文字を含まないものはここで捨てる
+        text = self.gate.admit(message)
+        if text is None:
             return
 
-        # Check if any keyword is in the message content
-        message_content = message.content # No need for lower() with Japanese keywords
+        disabled_rules = ()
+        if message.guild is not None:
+            guild_setting = self.get_guild_setting(message.guild.id)
+            disabled_rules = guild_setting.get("disabled_rules") or ()
 
-        if "UI/UX" in message_content:
-            await message.reply("🚨 こちらは“UI/UX”警察です 🚨\nUIとUXは似て非なる概念であるため、スラッシュ区切りの表記は推奨されていません。UIが実体ある一つのモノであるのに対し、UXには実体がなく、それも一つとは限りません。人々それぞれに内在する感情や記憶などの「目に見えない何か」を体験と称します。また、ソフトウェアなどのUIの影響を受けずに形成される体験についてもしっかりと熟慮する必要があります。もしも二つを併記したい場合には、「UIとその体験」と書くと収まりが良くなります。ご検討をよろしくお願いいたします。")
+        # 全ルールのキーワードを1回の走査で検索する
+        match = self.rule_file.rule_set.match(text, disabled_rules)
+        if match is None:
             return
 
-        if "アフォーダンス" in message_content:
-            await message.reply("🚨 こちらはアフォーダンス警察です 🚨\nその「アフォーダンス」、**「シグニファイア」**ではありませんか？本来、ジェームズ・J・ギブソンが提唱したアフォーダンスは「環境が動物に提供する価値」そのものを指す客観的な概念です。ドン・ノーマンが著書『誰のためのデザイン？』でこの言葉を紹介した際、彼はこれを「ユーザーが直感的にどう扱えばいいか分かること（知覚されたアフォーダンス）」という意味で使いました。これにより、デザイン業界では「アフォーダンス＝使い方のヒント」という誤解が広まってしまいました。彼は後に、自身の定義がギブソンの本来の定義と混同されていることを認め、混乱を解消するために「シグニファイア」という用語を強調するようになりました。あなたはどうせアフォーダンスをシグニファイアの意味で使いましたよね？あなたの為に例を用いて説明しましょう。\n**アフォーダンス（実体）：**\nシステム上、その領域をクリックするとデータが送信される機能そのもの。画面にボタンの絵がなくても、そこをクリックして送信できるならアフォーダンスはあります。 \n**シグニファイア（合図）：**\n立体的なデザイン、ドロップシャドウ、あるいは「送信」という文字ラベルとか。これらが「ここは押せそうだ」とユーザーに伝える。\nつまり、**アフォーダンスは「設計（Design/Engineering）」**の問題であり、**シグニファイアは「伝達（Communication/UI）」**の問題なのです。優れたデザインとは、**「適切なアフォーダンスが用意され、それが適切なシグニファイアによって過不足なくユーザーに伝わっている状態」**を指します。")
+        rule, found_keyword = match
+        cooldown_key = (message.channel.id, rule.id)
+        if self.cooldowns.active(cooldown_key):
             return
+        self.cooldowns.start(cooldown_key, rule.cooldown)
+
+        print(f"メッセージ内でキーワード '{found_keyword}' が検出されました： {message.content}")
+        await message.reply(rule.render(found_keyword))
+
+    @app_commands.command(
+        name="police---enable", description="このサーバーで警察を有効にします"
+    )
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def enable_police(self, interaction: discord.Interaction):
+        setting = self.guild_settings.setdefault(
+            str(interaction.guild_id), {"enabled": False, "disabled_rules": []}
+        )
+        setting["enabled"] = True
+        self.save_guild_settings()
+        await interaction.response.send_message("このサーバーで警察を有効にしました。")
+
+    @app_commands.command(
+        name="police---disable", description="このサーバーで警察を無効にします"
+    )
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def disable_police(self, interaction: discord.Interaction):
+        setting = self.guild_settings.setdefault(
+            str(interaction.guild_id), {"enabled": False, "disabled_rules": []}
+        )
+        setting["enabled"] = False
+        self.save_guild_settings()
+        await interaction.response.send_message("このサーバーで警察を無効にしました。")
+
+    @app_commands.command(
+        name="police---rule", description="ルールごとに警察のON/OFFを切り替えます"
+    )
+    @app_commands.describe(rule_id="ルールID", enabled="有効にするかどうか")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def set_police_rule(
+        self, interaction: discord.Interaction, rule_id: str, enabled: bool
+    ):
+        if rule_id not in self.rule_file.rule_set.rule_ids:
+            await interaction.response.send_message(
+                f"ルール `{rule_id}` は存在しません。", ephemeral=True
+            )
+            return
+        setting = self.guild_settings.setdefault(
+            str(interaction.guild_id), {"enabled": False, "disabled_rules": []}
+        )
+        disabled_rules = set(setting.get("disabled_rules") or [])
+        if enabled:
+            disabled_rules.discard(rule_id)
+        else:
+            disabled_rules.add(rule_id)
+        setting["disabled_rules"] = sorted(disabled_rules)
+        self.save_guild_settings()
+        await interaction.response.send_message(
+            f"ルール `{rule_id}` を{'有効' if enabled else '無効'}にしました。"
+        )
+
+    @set_police_rule.autocomplete("rule_id")
+    async def police_rule_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        return [
+            app_commands.Choice(name=rule_id, value=rule_id)
+            for rule_id in self.rule_file.rule_set.rule_ids
+            if current in rule_id
+        ][:25]
+
+    @app_commands.command(
+        name="police---reload", description="警察ルールを読み直します"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def reload_police_rules(self, interaction: discord.Interaction):
+        if self.rule_file.reload(force=True):
+            self.gate.set_keywords(self.rule_file.rule_set.matcher.keywords)
+        await interaction.response.send_message(
+            f"警察ルールを読み直しました: {len(self.rule_file.rule_set.rules)}件",
+            ephemeral=True,
+        )
+
+    @app_commands.command(
+        name="police---stats", description="警察が検索した/読み飛ばしたメッセージ数を表示します"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def police_stats(self, interaction: discord.Interaction):
+        summary = self.gate.summary()
+        total = summary["scanned"] + summary["skipped"]
+        embed = discord.Embed(
+            title="警察の統計",
+            description=(
+                f"**受信:** {total}件\n"
+                f"**検索:** {summary['scanned']}件\n"
+                f"**読み飛ばし:** {summary['skipped']}件"
+            ),
+            color=discord.Color.blue(),
+        )
+        for reason in ("bot", "webhook", "guild_disabled", "empty", "prefilter", "truncated"):
+            embed.add_field(name=reason, value=str(summary.get(reason, 0)), inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @reload_rules_loop.before_loop
+    async def before_reload_rules_loop(self):
+        await self.bot.wait_until_ready()
 
-        found_keyword = None
-        for keyword in KEYWORDS.keys():
-            if keyword in message_content:
-                found_keyword = keyword
-                break
-
-        if found_keyword:
-            correct_term = KEYWORDS[found_keyword]
-            # Action to be taken when a keyword is found
-            print(f"メッセージ内でキーワード '{found_keyword}' が検出されました： {message.content}")
-            await message.reply(f"🚨附属警察出動！！！🚨\n「{found_keyword}」ではなく「{correct_term}」です！！")
 
 async def setup(bot):
     await bot.add_cog(AffiliatedPolice(bot))
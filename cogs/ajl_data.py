@@ -0,0 +1,487 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+import urllib.parse
+
+import discord
+import requests
+import yaml
+from discord import app_commands
+from discord.ext import commands, tasks
+
+import calculate_hash
+from env.config import Config
+from utils.ajl_rankings import (
+    CONTEST_TYPES,
+    DEFAULT_SCHOOL,
+    AJLUpdate,
+    RankingPage,
+    grade_ranking_url,
+    grades,
+    school_ranking_url,
+)
+from utils.ajl_snapshots import AJLSnapshotStore, table_to_rows
+from utils.executor import executor
+from utils.metrics import metrics, record_http
+
+config = Config()
+SEASON = config.season
+YEAR = config.year
+
+BOT_SETTINGS_FILE = "bot_settings.json"
+# 取得したページを保存するディレクトリ (AJL HTML_ARCHIVE が有効なとき)
+html_dir = "html/"
+# この秒数以内に取得したページは取得し直さずに使い回す
+PAGE_MAX_AGE = 60
+
+
+def load_school_abbreviations():
+    """学校名略称yamlを読み込む"""
+    with open("asset/school_abbreviations.yaml", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def load_bot_settings():
+    with open(BOT_SETTINGS_FILE, "r") as f:
+        return json.load(f)
+
+
+def update_guild_settings(guild_id, key, update):
+    """サーバーの設定 key のリストを update で書き換え、書き換え後のリストを返す
+
+    設定ファイルがなければ作る。
+    """
+    guild_id = str(guild_id)
+    try:
+        settings = load_bot_settings()
+    except FileNotFoundError:
+        settings = {}
+    guild_settings = settings.setdefault(guild_id, {})
+    values = update(list(guild_settings.get(key) or []))
+    if values:
+        guild_settings[key] = values
+    else:
+        guild_settings.pop(key, None)
+        if not guild_settings: # 他に設定がなければサーバーIDごと削除
+            del settings[guild_id]
+    # 書きかけのファイルを読まないよう、一時ファイルに書いてから置き換える
+    with open(BOT_SETTINGS_FILE + ".tmp", "w") as f:
+        json.dump(settings, f, indent=4)
+    os.replace(BOT_SETTINGS_FILE + ".tmp", BOT_SETTINGS_FILE)
+    return values
+
+
+def tracked_schools(settings, guild_id):
+    """サーバーで追跡している学校 (設定していなければ筑附)"""
+    return list(settings.get(str(guild_id), {}).get("ajl_schools") or [DEFAULT_SCHOOL])
+
+
+def tracked_users(settings, guild_id):
+    """サーバーで学校とは別に追跡しているユーザID"""
+    return list(settings.get(str(guild_id), {}).get("ajl_users") or [])
+
+
+def all_tracked(settings):
+    """いずれかのサーバーが追跡している学校とユーザー"""
+    schools, users = {DEFAULT_SCHOOL}, set()
+    for guild_settings in settings.values():
+        if isinstance(guild_settings, dict):
+            schools.update(guild_settings.get("ajl_schools") or [])
+            users.update(guild_settings.get("ajl_users") or [])
+    return schools, users
+
+
+def fetch_with_hash(url):
+    """ページを受信しながらハッシュ値を計算し、(内容, ハッシュ値) を返す"""
+    hasher = calculate_hash.StreamHasher()
+    body = bytearray()
+    status = None
+    try:
+        with requests.get(url, stream=True, timeout=30) as response:
+            status = response.status_code
+            response.raise_for_status()
+            for chunk in response.iter_content(calculate_hash.CHUNK_SIZE):
+                hasher.update(chunk)
+                body.extend(chunk)
+    finally:
+        record_http(url, len(body), status)
+    return bytes(body), hasher.hexdigest()
+
+
+def write_archive(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path + ".tmp", "wb") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+
+
+def html_path(url):
+    """ページを保存するファイル名 (例: html/ajl2025winter_grade_1_rankings_A_score.html)
+
+    gzip で保存するので、実際のファイル名には .gz がつく。
+    """
+    parts = urllib.parse.urlsplit(url).path.strip("/").split("/")
+    return os.path.join(html_dir, "_".join(parts))
+
+
+class AJLData(commands.Cog):
+    """AJL の順位表を取得・パースし、他の cog に共有する
+
+    15分ごとにすべての順位表を1回ずつ取得し、ajl_update イベントで学校別・
+    生徒別の cog に渡す。受信した内容のハッシュが前回と同じページはパースせず、
+    前回の結果を使う。コマンドから使うときも、同じページは一定時間内に
+    1回だけ取得し、学校名・ユーザIDの索引を作っておく。各サーバーが追跡する
+    学校やユーザーが増えても、ページの取得とパースの回数は増えない。
+    取得したページは、いずれかのサーバーが追跡している行だけを
+    スナップショットとして記録する。
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.snapshots = AJLSnapshotStore(
+            config.ajl_snapshot_file, config.ajl_store_full_rows
+        )
+        self.school_abbreviations = {}
+        self.pages = {}
+        # ページごとの最後に取得した内容のハッシュ値 (起動時にスナップショットから読み込む)
+        self.hashes = {}
+        # ページごとの、最後に ajl_update で送ったスナップショットのID。
+        # コマンドからの取得で先にスナップショットが記録されても、変更を通知し損ねない
+        self.published = {}
+        self._fetches = {}
+        self._archive_writes = set()
+        self._cycle_seconds = metrics.timer(
+            "ajl_cycle_seconds", "AJLの順位表を一巡取得する所要時間"
+        )
+        self._fetched_bytes = metrics.counter(
+            "ajl_fetched_bytes_total", "AJLの順位表の受信バイト数"
+        )
+        self._pages_total = metrics.counter(
+            "ajl_pages_total", "取得したAJLの順位表の数 (内容が変わったかどうか別)"
+        )
+
+    async def cog_load(self):
+        self.school_abbreviations.update(
+            await asyncio.to_thread(load_school_abbreviations)
+        )
+        for url, (snapshot_id, content_hash) in (
+            await executor.run_io(self.snapshots.latest_by_page)
+        ).items():
+            self.published[url] = snapshot_id
+            self.hashes[url] = content_hash
+        self.ajl_ingest_loop.start()
+
+    def cog_unload(self):
+        self.ajl_ingest_loop.cancel()
+
+    def abbreviation(self, school):
+        return self.school_abbreviations.get(school, school)
+
+    async def load_settings(self):
+        return await executor.run_io(load_bot_settings)
+
+    async def load_tracked(self):
+        """いずれかのサーバーが追跡している学校とユーザー"""
+        try:
+            settings = await self.load_settings()
+        except FileNotFoundError:
+            settings = {}
+        return all_tracked(settings)
+
+    async def get_pages(self, urls, max_age=PAGE_MAX_AGE, tracked=None):
+        """urls のページを返す。max_age 秒以内に取得したページや取得中のページは使い回す"""
+        if tracked is None and not all(self.is_fresh(url, max_age) for url in urls):
+            tracked = await self.load_tracked()
+        return await asyncio.gather(
+            *(self.get_page(url, tracked, max_age) for url in urls)
+        )
+
+    def is_fresh(self, url, max_age=PAGE_MAX_AGE):
+        page = self.pages.get(url)
+        return page is not None and time.monotonic() - page.fetched_at < max_age
+
+    async def get_page(self, url, tracked=None, max_age=PAGE_MAX_AGE):
+        if self.is_fresh(url, max_age):
+            return self.pages[url]
+        fetch = self._fetches.get(url)
+        if fetch is None:
+            if tracked is None:
+                tracked = await self.load_tracked()
+            fetch = asyncio.ensure_future(self._fetch_page(url, *tracked))
+            self._fetches[url] = fetch
+            fetch.add_done_callback(lambda _: self._fetches.pop(url, None))
+        # 呼び出し元がキャンセルされても、他の待っている呼び出し元のために取得は続ける
+        return await asyncio.shield(fetch)
+
+    async def _fetch_page(self, url, schools, users):
+        content, content_hash = await executor.run_io(fetch_with_hash, url)
+        self._fetched_bytes.inc(len(content))
+
+        previous_hash = self.hashes.get(url)
+        self.hashes[url] = content_hash
+        if content_hash != previous_hash:
+            self._pages_total.inc(result="changed")
+            if config.ajl_html_archive:
+                self.archive(url, content)
+        else:
+            self._pages_total.inc(result="unchanged")
+
+        # 内容が変わっていなければパースし直さない
+        page = previous_page = self.pages.get(url)
+        previous = None
+        if page is None or page.content_hash != content_hash:
+            html = content.decode("utf-8", errors="replace")
+            page = await executor.run_cpu(RankingPage.parse, url, html, content_hash)
+            if previous_page is not None:
+                # 追跡を始めたばかりの行を変わる前のスナップショットに足し、新規参加者と誤認しない
+                previous = (
+                    previous_page.content_hash,
+                    previous_page.tracked_rows(schools, users),
+                )
+
+        # 内容が前回と同じなら追記されず、最新のスナップショットが返る
+        page.snapshot_id, _ = await executor.run_io(
+            self.snapshots.record,
+            url,
+            content_hash,
+            page.tracked_rows(schools, users),
+            table_to_rows(page.df) if self.snapshots.keep_full_rows else None,
+            previous=previous,
+            serial_key=self.snapshots.path,
+        )
+        page.fetched_bytes = len(content)
+        page.fetched_at = time.monotonic()
+        self.pages[url] = page
+        return page
+
+    def archive(self, url, content):
+        """取得したページを gzip で html/ に保存する。保存はバックグラウンドで行う"""
+        path = html_path(url) + ".gz"
+        write = asyncio.ensure_future(
+            executor.run_io(write_archive, path, content, serial_key=path)
+        )
+        self._archive_writes.add(write)
+        write.add_done_callback(self._archive_written)
+
+    def _archive_written(self, write):
+        self._archive_writes.discard(write)
+        if not write.cancelled() and write.exception() is not None:
+            print(f"HTMLの保存に失敗しました: {write.exception()}")
+
+    def ranking_urls(self):
+        """取得する順位表 (学校別と学年別) の URL"""
+        urls = []
+        for contest_type in CONTEST_TYPES:
+            urls.append(school_ranking_url(YEAR, SEASON, contest_type))
+            urls.extend(
+                grade_ranking_url(YEAR, SEASON, contest_type, grade)
+                for grade in grades(SEASON)
+            )
+        return urls
+
+    async def ingest(self):
+        """すべての順位表を取得して ajl_update イベントを送る"""
+        started = time.perf_counter()
+        try:
+            settings = await self.load_settings()
+        except FileNotFoundError:
+            print(f"{BOT_SETTINGS_FILE} not found.")
+            settings = {}
+        tracked = all_tracked(settings)
+        urls = self.ranking_urls()
+        results = await asyncio.gather(
+            *(self.get_page(url, tracked, max_age=0) for url in urls),
+            return_exceptions=True,
+        )
+        # 取得に失敗したページがあっても、取得できたページの変更は通知する
+        pages = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                print(f"AJLの順位表の取得に失敗しました ({url}): {result}")
+            else:
+                pages[url] = result
+        changed = {
+            url for url, page in pages.items() if page.snapshot_id != self.published.get(url)
+        }
+        update = AJLUpdate(pages, settings, changed)
+        self.published.update({url: page.snapshot_id for url, page in pages.items()})
+        elapsed = time.perf_counter() - started
+        self._cycle_seconds.observe(elapsed)
+        print(
+            f"AJLの順位表を取得しました: {len(pages)}/{len(urls)}ページ "
+            f"(変更{len(update.changed)}件, {update.fetched_bytes}バイト, {elapsed:.1f}秒)"
+        )
+        self.bot.dispatch("ajl_update", update)
+        return update
+
+    @tasks.loop(minutes=15)
+    @metrics.timed("loop_tick_seconds", loop="ajl_ingest_loop")
+    async def ajl_ingest_loop(self):
+        """15分ごとに AJL の順位表を取得し、学校別・生徒別の通知に共有する"""
+        try:
+            await self.ingest()
+        except Exception as e:
+            print(f"Error in ajl_ingest_loop: {e}")
+
+    @ajl_ingest_loop.before_loop
+    async def before_ajl_ingest_loop(self):
+        await self.bot.wait_until_ready()
+
+    async def previous_rows(self, page, keys):
+        """page の内容が変わる前のスナップショットでの keys の行"""
+        previous = await executor.run_io(
+            self.snapshots.previous, page.url, page.snapshot_id
+        )
+        if previous is None:
+            return {}
+        return await executor.run_io(self.snapshots.rows, previous.id, list(keys))
+
+    async def seen_before(self, page, keys):
+        """keys のうち、page のこれまでのスナップショットに載っていたもの"""
+        return await executor.run_io(
+            self.snapshots.seen_before, page.url, page.snapshot_id, list(keys)
+        )
+
+    async def update_guild_settings(self, guild_id, key, update):
+        """サーバーの設定 key のリストを update で書き換え、書き換え後のリストを返す"""
+        return await executor.run_io(
+            update_guild_settings, guild_id, key, update, serial_key=BOT_SETTINGS_FILE
+        )
+
+    async def send_settings_result(self, interaction, title, description, color):
+        embed = discord.Embed(title=title, description=description, color=color)
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(
+        name="ajl---track_school",
+        description="AJLの順位を通知する学校を追加します。",
+    )
+    @app_commands.describe(school="学校名 (順位表の表記のまま)")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def ajl_track_school(self, interaction: discord.Interaction, school: str):
+        try:
+            page = await self.get_page(school_ranking_url(YEAR, SEASON, "A"))
+            if school not in page.schools:
+                await self.send_settings_result(
+                    interaction,
+                    "エラー",
+                    f"順位表に **{school}** が見つかりませんでした。",
+                    discord.Color.red(),
+                )
+                return
+
+            def add(schools):
+                # 未設定のときは筑附を追跡していたので、それも残す
+                schools = schools or [DEFAULT_SCHOOL]
+                return schools if school in schools else schools + [school]
+
+            schools = await self.update_guild_settings(interaction.guild_id, "ajl_schools", add)
+            await self.send_settings_result(
+                interaction,
+                "設定完了",
+                "追跡する学校: " + "、".join(schools),
+                discord.Color.green(),
+            )
+        except Exception as e:
+            await self.send_settings_result(
+                interaction, "エラー", f"エラーが発生しました: {e}", discord.Color.red()
+            )
+
+    @app_commands.command(
+        name="ajl---untrack_school",
+        description="AJLの順位を通知する学校を外します。",
+    )
+    @app_commands.describe(school="学校名")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def ajl_untrack_school(self, interaction: discord.Interaction, school: str):
+        try:
+            schools = await self.update_guild_settings(
+                interaction.guild_id,
+                "ajl_schools",
+                lambda schools: [s for s in schools or [DEFAULT_SCHOOL] if s != school],
+            )
+            await self.send_settings_result(
+                interaction,
+                "設定解除",
+                "追跡する学校: " + "、".join(schools or [f"{DEFAULT_SCHOOL} (既定)"]),
+                discord.Color.green(),
+            )
+        except Exception as e:
+            await self.send_settings_result(
+                interaction, "エラー", f"エラーが発生しました: {e}", discord.Color.red()
+            )
+
+    @app_commands.command(
+        name="ajl---track_user",
+        description="学校とは別に、AJLの順位を通知するユーザーを追加します。",
+    )
+    @app_commands.describe(user_id="AtCoderのユーザID")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def ajl_track_user(self, interaction: discord.Interaction, user_id: str):
+        try:
+            users = await self.update_guild_settings(
+                interaction.guild_id,
+                "ajl_users",
+                lambda users: users if user_id in users else users + [user_id],
+            )
+            await self.send_settings_result(
+                interaction,
+                "設定完了",
+                "追跡するユーザー: " + "、".join(users),
+                discord.Color.green(),
+            )
+        except Exception as e:
+            await self.send_settings_result(
+                interaction, "エラー", f"エラーが発生しました: {e}", discord.Color.red()
+            )
+
+    @app_commands.command(
+        name="ajl---untrack_user",
+        description="AJLの順位を通知するユーザーを外します。",
+    )
+    @app_commands.describe(user_id="AtCoderのユーザID")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def ajl_untrack_user(self, interaction: discord.Interaction, user_id: str):
+        try:
+            users = await self.update_guild_settings(
+                interaction.guild_id,
+                "ajl_users",
+                lambda users: [u for u in users if u != user_id],
+            )
+            await self.send_settings_result(
+                interaction,
+                "設定解除",
+                "追跡するユーザー: " + ("、".join(users) or "なし"),
+                discord.Color.green(),
+            )
+        except Exception as e:
+            await self.send_settings_result(
+                interaction, "エラー", f"エラーが発生しました: {e}", discord.Color.red()
+            )
+
+    @app_commands.command(
+        name="ajl---tracked",
+        description="このサーバーで追跡しているAJLの学校とユーザーを表示します。",
+    )
+    async def ajl_tracked(self, interaction: discord.Interaction):
+        try:
+            settings = await self.load_settings()
+        except FileNotFoundError:
+            settings = {}
+        schools = tracked_schools(settings, interaction.guild_id)
+        users = tracked_users(settings, interaction.guild_id)
+        await self.send_settings_result(
+            interaction,
+            "AJLの追跡設定",
+            "**学校**\n"
+            + "\n".join(f"- {school}" for school in schools)
+            + "\n**ユーザー**\n"
+            + ("\n".join(f"- {user_id}" for user_id in users) or "なし"),
+            discord.Color.blue(),
+        )
+
+
+async def setup(bot):
+    await bot.add_cog(AJLData(bot))
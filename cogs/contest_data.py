@@ -1,4 +1,5 @@
 import asyncio
+import copy
 import datetime # Ensure this is imported
 import os
 import traceback
@@ -11,6 +12,8 @@ from discord.ext import commands, tasks
 from discord import app_commands # Added for slash command
 import discord # Added for Embed
 from env.config import Config
+from utils.executor import executor
+from utils.metrics import aiohttp_trace_config, metrics
 
 CONTESTS_FILE = "asset/contests.yaml"
 # ATCODER_CONTESTS_URL = "https://atcoder.jp/contests/" # Removed
@@ -26,8 +29,14 @@ USER_AGENTS = [
 class ContestData(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.contests = []
+        # self.contests を差し替えるたびに増やす (他の cog がキャッシュの更新に使う)
+        self.contests_version = 0
+
+    async def cog_load(self):
+        self.contests = await asyncio.to_thread(self.load_contests)
+        self.contests_version += 1
         self.fetch_contests.start()
-        self.contests = self.load_contests()
 
     def load_contests(self) -> list[dict]:
         if os.path.exists(CONTESTS_FILE):
@@ -46,12 +55,20 @@ class ContestData(commands.Cog):
                 sort_keys=False,
             )
 
+    async def save_contests_async(self, contests_to_save: list[dict]):
+        """コンテスト情報の複製をスレッドプールで保存する (同じファイルへの書き込みは順番に行う)"""
+        await executor.run_io(
+            self.save_contests, copy.deepcopy(contests_to_save), serial_key=CONTESTS_FILE
+        )
+
     async def fetch_contests_from_web(self) -> list[dict]:
         headers = {
             "User-Agent": random.choice(USER_AGENTS)
         }
         new_url = "https://github.com/tsukuba-denden/atcoder-contest-info/raw/refs/heads/main/contests.yaml"
-        async with aiohttp.ClientSession(headers=headers) as session:
+        async with aiohttp.ClientSession(
+            headers=headers, trace_configs=[aiohttp_trace_config()]
+        ) as session:
             async with session.get(new_url, timeout=10) as response:
                 try:
                     response.raise_for_status()
@@ -88,6 +105,7 @@ class ContestData(commands.Cog):
         return "Other"
 
     @tasks.loop(hours=24)
+    @metrics.timed("loop_tick_seconds", loop="fetch_contests")
     async def fetch_contests(self):
         raw_contests = await self.fetch_contests_from_web()
         if raw_contests:
@@ -131,7 +149,8 @@ class ContestData(commands.Cog):
                     continue
 
             self.contests = transformed_contests
-            self.save_contests(self.contests)
+            self.contests_version += 1
+            await self.save_contests_async(self.contests)
             print(f"{len(transformed_contests)}件のコンテスト情報を更新・保存しました。")
         else:
             print("コンテスト情報の取得に失敗したため、更新できませんでした。")
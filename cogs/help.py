@@ -37,6 +37,21 @@ class Help(commands.Cog):
             value="コンテストの結果画像を送信します",
             inline=False,
         )
+        embed.add_field(
+            name="`/result---member_history`",
+            value="部員の最近のコンテスト成績とパフォーマンスの傾向を表示します",
+            inline=False,
+        )
+        embed.add_field(
+            name="`/result---club_average`",
+            value="直近のコンテストでの部員の平均パフォーマンスを表示します",
+            inline=False,
+        )
+        embed.add_field(
+            name="`/result---backfill`",
+            value="過去のコンテスト結果をまとめて結果データベースに記録します (管理者のみ)",
+            inline=False,
+        )
         embed.add_field(
             name="`/result---set_channel`",
             value="コンテスト結果を自動送信するチャンネルを設定します",
@@ -52,14 +67,54 @@ class Help(commands.Cog):
             value="コンテストタイプごとにスレッド作成のON/OFFを設定します。",
             inline=False,
         )   
+        embed.add_field(
+            name="`/police---enable` / `/police---disable`",
+            value="このサーバーでの附属警察のON/OFFを切り替えます (既定はOFF)",
+            inline=False,
+        )
+        embed.add_field(
+            name="`/police---rule`",
+            value="附属警察のルールごとにON/OFFを切り替えます",
+            inline=False,
+        )
+        embed.add_field(
+            name="`/metrics`",
+            value="ループやコマンドの所要時間、HTTP・Discordへの送信数などの統計を表示します (管理者のみ)",
+            inline=False,
+        )
+        embed.add_field(
+            name="`/metrics---stalls`",
+            value="イベントループを止めている処理を、cog・関数ごとに停止時間の長い順で表示します (管理者のみ)",
+            inline=False,
+        )
         embed.add_field(
             name="`/tsukuba_rank`",
-            value="[AJL](https://info.atcoder.jp/utilize/school/ajl)における筑附の順位やスコア・一つ上の学校との比較を表示します",
+            value="[AJL](https://info.atcoder.jp/utilize/school/ajl)における追跡している学校 (既定: 筑附) の順位やスコア・一つ上の学校との比較を表示します",
+            inline=False,
+        )
+        embed.add_field(
+            name="`/tsukuba_rank---history`",
+            value="保存済みの記録から、指定した日数前 (既定: 7日) からの追跡している学校の順位とスコアの変化を表示します",
             inline=False,
         )
         embed.add_field(
             name="`/tsukuba_student_rank`",
-            value="AJLにおける筑附の生徒の順位・1つ上の順位の人との比較・新規参加者を表示します",
+            value="AJLにおける追跡している学校の生徒と追跡しているユーザーの順位・1つ上の順位の人との比較・新規参加者を表示します",
+            inline=False,
+        )
+        embed.add_field(
+            name="`/ajl---track_school` / `/ajl---untrack_school`",
+            value="AJLの順位を通知する学校を追加・削除します (管理者のみ)",
+            inline=False,
+        )
+        embed.add_field(
+            name="`/ajl---track_user` / `/ajl---untrack_user`",
+            value="学校とは別に、AJLの順位を通知するユーザーを追加・削除します (管理者のみ)",
+            inline=False,
+        )
+        embed.add_field(
+            name="`/ajl---tracked`",
+            value="このサーバーで追跡しているAJLの学校とユーザーを表示します",
             inline=False,
         )
         
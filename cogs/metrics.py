@@ -0,0 +1,168 @@
+import time
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from env.config import Config
+from utils.loop_watchdog import watchdog
+from utils.metrics import MetricsServer, metrics
+
+config = Config()
+
+
+def _format_labels(key) -> str:
+    return ", ".join(value for _, value in key) or "-"
+
+
+class Metrics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.server = MetricsServer()
+        self._original_interaction_check = None
+        metrics.timer("loop_tick_seconds", "タスクループ1回の所要時間")
+        metrics.timer("app_command_seconds", "スラッシュコマンド1回の所要時間")
+        metrics.gauge("guilds", "参加しているサーバー数").set_function(
+            lambda: len(self.bot.guilds)
+        )
+        metrics.gauge("contests", "ContestData が保持しているコンテスト数").set_function(
+            self._contest_count
+        )
+        metrics.gauge("reminder_entries", "有効なリマインダー設定の数").set_function(
+            self._reminder_entry_count
+        )
+
+    async def cog_load(self):
+        # コマンドの開始時刻を記録するため、コマンドツリーの前処理に割り込む
+        tree = self.bot.tree
+        self._original_interaction_check = tree.interaction_check
+
+        async def interaction_check(interaction: discord.Interaction) -> bool:
+            interaction.extras["metrics_started"] = time.perf_counter()
+            return await self._original_interaction_check(interaction)
+
+        tree.interaction_check = interaction_check
+
+        if config.watchdog_threshold_ms:
+            watchdog.threshold = config.watchdog_threshold_ms / 1000
+            watchdog.start()
+
+        if config.metrics_port:
+            try:
+                await self.server.start(config.metrics_host, config.metrics_port)
+            except OSError as e:
+                print(f"メトリクスのHTTPサーバーを起動できませんでした: {e}")
+
+    async def cog_unload(self):
+        if self._original_interaction_check is not None:
+            self.bot.tree.interaction_check = self._original_interaction_check
+        watchdog.stop()
+        await self.server.stop()
+
+    def _contest_count(self) -> int:
+        contest_data_cog = self.bot.get_cog("ContestData")
+        return len(contest_data_cog.contests) if contest_data_cog else 0
+
+    def _reminder_entry_count(self) -> int:
+        reminder_cog = self.bot.get_cog("Reminder")
+        return reminder_cog.reminder_entry_count() if reminder_cog else 0
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(
+        self, interaction: discord.Interaction, command: app_commands.Command
+    ):
+        started = interaction.extras.get("metrics_started")
+        if started is not None:
+            metrics.timer("app_command_seconds").observe(
+                time.perf_counter() - started, command=command.qualified_name
+            )
+
+    @app_commands.command(name="metrics", description="ループやコマンドの所要時間などの統計を表示します")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def metrics_command(self, interaction: discord.Interaction):
+        embed = discord.Embed(title="メトリクス", color=discord.Color.blue())
+        for name, title in (
+            ("loop_tick_seconds", "タスクループ"),
+            ("app_command_seconds", "コマンド"),
+            ("discord_send_seconds", "Discordへの送信"),
+            ("event_loop_lag_seconds", "イベントループの遅れ"),
+            ("render_seconds", "結果画像の描画"),
+            ("ajl_cycle_seconds", "AJLの順位表の取得"),
+        ):
+            summary = metrics.timer(name).summary()
+            lines = [
+                f"`{_format_labels(key)}` {stats['count']}回 "
+                f"平均{stats['mean'] * 1000:.0f}ms p95={stats['p95'] * 1000:.0f}ms "
+                f"最大{stats['max'] * 1000:.0f}ms"
+                for key, stats in sorted(
+                    summary.items(), key=lambda item: item[1]["max"], reverse=True
+                )
+            ]
+            embed.add_field(
+                name=title, value="\n".join(lines)[:1024] or "記録なし", inline=False
+            )
+
+        counters = []
+        for name in (
+            "http_requests_total",
+            "http_response_bytes_total",
+            "result_generate_failures_total",
+            "discord_sends_total",
+            "discord_send_retries_total",
+            "loop_tick_errors_total",
+            "app_command_errors_total",
+            "event_loop_stalls_total",
+            "render_requests_total",
+            "result_cache_requests_total",
+            "jobs_total",
+            "backfill_contests_total",
+            "ajl_fetched_bytes_total",
+            "ajl_pages_total",
+        ):
+            for key, value in metrics.counter(name).values.items():
+                counters.append(f"`{name}` ({_format_labels(key)}): {value:.0f}")
+        embed.add_field(
+            name="カウンター", value="\n".join(counters)[:1024] or "記録なし", inline=False
+        )
+
+        gauges = [
+            f"`{name}`: {value:.0f}"
+            for name in ("guilds", "contests", "reminder_entries", "job_queue_depth")
+            for value in metrics.gauge(name).collect().values()
+        ]
+        embed.add_field(name="現在値", value="\n".join(gauges) or "記録なし", inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(
+        name="metrics---stalls",
+        description="イベントループを止めている処理を停止時間の長い順に表示します",
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def stalls_command(self, interaction: discord.Interaction):
+        if not watchdog.running:
+            await interaction.response.send_message(
+                "イベントループの監視は無効になっています", ephemeral=True
+            )
+            return
+        ranked = watchdog.report(limit=10)
+        embed = discord.Embed(
+            title="イベントループの停止",
+            description=f"しきい値: {watchdog.threshold * 1000:.0f}ms"
+            + ("" if ranked else "\n停止は記録されていません"),
+            color=discord.Color.blue(),
+        )
+        for rank, stats in enumerate(ranked, 1):
+            callee = ", ".join(name for name, _ in stats.blocked_in.most_common(2))
+            embed.add_field(
+                name=f"{rank}. {stats.cog} {stats.function}",
+                value=(
+                    f"合計{stats.total:.2f}秒 / {stats.count}回 / 最大{stats.max:.2f}秒\n"
+                    f"停止中の呼び出し先: `{callee}`"
+                )[:1024],
+                inline=False,
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(Metrics(bot))
@@ -1,8 +1,11 @@
+import asyncio
+import bisect
+import copy
 import datetime
 import os
 import time
 import traceback
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import discord
 import yaml
@@ -11,6 +14,9 @@ from discord.ext import commands, tasks
 from discord.ui import Button, ChannelSelect, Select, View
 
 from env.config import Config
+from utils.broadcast import Delivery, broadcaster
+from utils.executor import executor
+from utils.metrics import metrics
 
 
 # TODO: 全てのメッセージをembedに
@@ -25,9 +31,13 @@ from env.config import Config
 # TODO: コンテスト情報取得の部分は独自Cog化
 
 config = Config()
+CATCHUP_GRACE = datetime.timedelta(minutes=config.reminder_catchup_grace_minutes)
+# ロール作成に失敗したギルドで、作成をやり直すまでの秒数
+ROLE_CREATION_RETRY_SECONDS = 60 * 60
 
 CONTESTS_FILE = "asset/contests.yaml"
 REMINDERS_FILE = "asset/reminders.yaml"
+REMINDER_STATE_FILE = "asset/reminder_state.yaml"
 ATCODER_CONTESTS_URL = "https://atcoder.jp/contests/"
 
 CONTEST_TYPES = ["ABC", "ARC", "AGC", "AHC"]
@@ -54,11 +64,76 @@ class Reminder(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         # self.contests = self.load_contests()
-        self.reminders = self.load_reminders()
+        self.reminders = {}
+        # guild_id -> {contest_type: role_id} のロールキャッシュ
+        self.contest_roles: Dict[int, Dict[str, int]] = {}
+        # ロール作成に失敗した (guild_id, contest_type) -> 失敗した時刻 (time.monotonic)
+        self.failed_role_creations: Dict[tuple, float] = {}
         # self.fetch_contests.start()  # タスクは ContestData Cog で開始
-        self.check_reminders.start()  # Start the check_reminders task
+        # 送信予定時刻でソートしたインデックス (bisect で範囲を引く)
+        self._due_index: List[tuple] = []
+        self._due_times: List[datetime.datetime] = []
+        self._due_index_key = None
+        self._reminders_version = 0
+        self.last_checked = None
         self.last_checked_date_no_abc = None
+
+    async def cog_load(self):
+        self.reminders = await asyncio.to_thread(self.load_reminders)
+        state = await asyncio.to_thread(self.load_reminder_state)
+        self.last_checked = state.get("last_checked")
+        self.last_checked_date_no_abc = state.get("no_abc_last_sent")
+        self.check_reminders.start()  # Start the check_reminders task
         self.check_no_abc_notification.start()
+        self.provision_roles_loop.start()
+
+    def cog_unload(self):
+        self.check_reminders.cancel()
+        self.check_no_abc_notification.cancel()
+        self.provision_roles_loop.cancel()
+        self.write_reminder_state(self.reminder_state())
+
+    def load_reminder_state(self) -> Dict:
+        """スケジューラの進捗 (次に見るべき時刻など) をYAMLファイルから読み込む"""
+        if not os.path.exists(REMINDER_STATE_FILE):
+            return {}
+        with open(REMINDER_STATE_FILE, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        state = {}
+        try:
+            if data.get("last_checked"):
+                state["last_checked"] = datetime.datetime.strptime(
+                    data["last_checked"], "%Y-%m-%d %H:%M:%S"
+                )
+            if data.get("no_abc_last_sent"):
+                state["no_abc_last_sent"] = datetime.datetime.strptime(
+                    data["no_abc_last_sent"], "%Y-%m-%d"
+                ).date()
+        except (TypeError, ValueError) as e:
+            print(f"リマインダー状態ファイルの読み込みエラー: {e}")
+        return state
+
+    def reminder_state(self) -> Dict:
+        """スケジューラの進捗をYAMLファイルに保存する形にする"""
+        return {
+            "last_checked": self.last_checked.strftime("%Y-%m-%d %H:%M:%S")
+            if self.last_checked
+            else None,
+            "no_abc_last_sent": self.last_checked_date_no_abc.strftime("%Y-%m-%d")
+            if self.last_checked_date_no_abc
+            else None,
+        }
+
+    def write_reminder_state(self, data: Dict):
+        """スケジューラの進捗をYAMLファイルに保存する"""
+        with open(REMINDER_STATE_FILE, "w", encoding="utf-8") as f:
+            yaml.dump(data, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+
+    async def save_reminder_state(self):
+        """スケジューラの進捗をスレッドプールで保存する (同じファイルへの書き込みは順番に行う)"""
+        await executor.run_io(
+            self.write_reminder_state, self.reminder_state(), serial_key=REMINDER_STATE_FILE
+        )
 
     def _find_abc_contests_in_current_week(self, contests, current_date):
         """Find ABC contests in the current week (Monday to Sunday)"""
@@ -85,6 +160,7 @@ class Reminder(commands.Cog):
         return abc_contests_this_week
 
     @tasks.loop(minutes=1)
+    @metrics.timed("loop_tick_seconds", loop="check_no_abc_notification")
     async def check_no_abc_notification(self):
         contest_data_cog = self.bot.get_cog("ContestData")
         if not contest_data_cog or not contest_data_cog.contests:
@@ -98,7 +174,13 @@ class Reminder(commands.Cog):
             # Already checked today or notification sent.
             return
 
-        if now.weekday() == 5 and now.hour == 20 and now.minute == 0:  # Saturday 20:00
+        # Saturday 20:00。再起動をまたいでも猶予時間内 (21:00 まで) なら送信する
+        notify_at = datetime.datetime.combine(today_date, datetime.time(20, 0))
+        notify_until = min(
+            notify_at + CATCHUP_GRACE + datetime.timedelta(minutes=1),
+            notify_at + datetime.timedelta(hours=1),
+        )
+        if now.weekday() == 5 and notify_at <= now < notify_until:
             print(f"[{now}] Saturday 20:00 detected. Checking for ABC contests...")
 
             abc_scheduled_for_2100 = False
@@ -123,6 +205,28 @@ class Reminder(commands.Cog):
                 # Find ABC contests in the current week
                 abc_contests_this_week = self._find_abc_contests_in_current_week(contests, today_date)
                 
+                # Create the notification message
+                description = "本日は 21:00からのABCの開催はありません。"
+
+                # Add information about ABC contests in the current week
+                if abc_contests_this_week:
+                    description += "\n\n**今週のABC開催予定:**"
+                    for abc_info in abc_contests_this_week:
+                        contest = abc_info["contest"]
+                        start_time = abc_info["start_time"]
+                        weekday_names = ["月", "火", "水", "木", "金", "土", "日"]
+                        weekday = weekday_names[start_time.weekday()]
+                        description += f"\n• {contest['name']}: {start_time.strftime('%m/%d')}({weekday}) {start_time.strftime('%H:%M')}"
+                else:
+                    description += "\n\n今週は他のABC開催予定もありません。"
+
+                embed = discord.Embed(
+                    title="本日のABC開催情報",
+                    description=description,
+                    color=discord.Color.orange()
+                )
+
+                deliveries = []
                 for guild_id_str, reminder_config in self.reminders.items():
                     if "ABC" not in reminder_config or not reminder_config["ABC"]:
                         continue
@@ -144,39 +248,28 @@ class Reminder(commands.Cog):
 
                         channel = self.bot.get_channel(channel_id)
                         if channel:
-                            try:
-                                # Create the notification message
-                                description = "本日は 21:00からのABCの開催はありません。"
-                                
-                                # Add information about ABC contests in the current week
-                                if abc_contests_this_week:
-                                    description += "\n\n**今週のABC開催予定:**"
-                                    for abc_info in abc_contests_this_week:
-                                        contest = abc_info["contest"]
-                                        start_time = abc_info["start_time"]
-                                        weekday_names = ["月", "火", "水", "木", "金", "土", "日"]
-                                        weekday = weekday_names[start_time.weekday()]
-                                        description += f"\n• {contest['name']}: {start_time.strftime('%m/%d')}({weekday}) {start_time.strftime('%H:%M')}"
-                                else:
-                                    description += "\n\n今週は他のABC開催予定もありません。"
-                                
-                                embed = discord.Embed(
-                                    title="本日のABC開催情報",
-                                    description=description,
-                                    color=discord.Color.orange()
+                            deliveries.append(
+                                Delivery(
+                                    channel,
+                                    lambda channel=channel: channel.send(embed=embed),
+                                    label=f"'no ABC' notification to channel {channel_id} in guild {guild_id_str}",
+                                    context=(channel_id, guild_id_str),
                                 )
-                                await channel.send(embed=embed)
-                                print(f"Sent 'no ABC' embed notification to channel {channel_id} in guild {guild_id_str}.")
-                            except discord.Forbidden:
-                                print(f"Error: Missing permissions to send embed to channel {channel_id} in guild {guild_id_str}.")
-                            except Exception as e:
-                                print(f"Error sending 'no ABC' notification to channel {channel_id} in guild {guild_id_str}: {e}")
+                            )
                         else:
                             print(f"Error: Channel {channel_id} not found for guild {guild_id_str}.")
 
+                results = await broadcaster.broadcast(deliveries, name="no ABC notification")
+                for result in results:
+                    channel_id, guild_id_str = result.delivery.context
+                    if result.ok:
+                        print(f"Sent 'no ABC' embed notification to channel {channel_id} in guild {guild_id_str}.")
+                    elif isinstance(result.error, discord.Forbidden):
+                        print(f"Error: Missing permissions to send embed to channel {channel_id} in guild {guild_id_str}.")
+
             # Update last checked date after processing for Saturday 20:00
             self.last_checked_date_no_abc = today_date
-            # self.save_reminders(self.reminders) # Not strictly needed as last_checked_date_no_abc is in-memory
+            await self.save_reminder_state()
 
     @check_no_abc_notification.before_loop
     async def before_check_no_abc_notification(self):
@@ -206,6 +299,16 @@ class Reminder(commands.Cog):
                 return data
         return {}
 
+    def reminder_entry_count(self) -> int:
+        """全サーバーで有効になっているリマインダー設定の数"""
+        return sum(
+            1
+            for reminder_config in self.reminders.values()
+            for contest_type in CONTEST_TYPES
+            for type_config in reminder_config.get(contest_type) or []
+            if type_config.get("enabled")
+        )
+
     def save_reminders(self, reminders: Dict):
         """リマインダー設定をYAMLファイルに保存する"""
         with open(REMINDERS_FILE, "w", encoding="utf-8") as f:
@@ -217,23 +320,163 @@ class Reminder(commands.Cog):
                 sort_keys=False,
             )
 
+    async def save_reminders_async(self):
+        """リマインダー設定の複製をスレッドプールで保存する (同じファイルへの書き込みは順番に行う)"""
+        await executor.run_io(
+            self.save_reminders, copy.deepcopy(self.reminders), serial_key=REMINDERS_FILE
+        )
+
+    async def apply_reminder_config(self, guild_id: str):
+        """リマインダー設定を保存し、必要な参加勢ロールを用意する"""
+        await self.save_reminders_async()
+        self._reminders_version += 1  # 送信予定インデックスを作り直させる
+        await self.provision_contest_roles(guild_id)
+
+    def _contest_type_from_role_name(self, role_name: str) -> Optional[str]:
+        """ロール名から対応するコンテストタイプを返す"""
+        if not role_name.endswith("参加勢"):
+            return None
+        contest_type = role_name[: -len("参加勢")]
+        return contest_type if contest_type in CONTEST_TYPES else None
+
+    def _build_role_cache(self, guild: discord.Guild) -> Dict[str, int]:
+        """ギルドのロール一覧を一度だけ走査してキャッシュを作成する"""
+        roles = {}
+        for role in guild.roles:
+            contest_type = self._contest_type_from_role_name(role.name)
+            if contest_type and contest_type not in roles:
+                roles[contest_type] = role.id
+        self.contest_roles[guild.id] = roles
+        return roles
+
+    def get_contest_role(
+        self, guild: discord.Guild, contest_type: str
+    ) -> Optional[discord.Role]:
+        """キャッシュからコンテストタイプの参加勢ロールを取得する (API呼び出しなし)"""
+        roles = self.contest_roles.get(guild.id)
+        if roles is None:
+            roles = self._build_role_cache(guild)
+        role_id = roles.get(contest_type)
+        if role_id is None:
+            return None
+        return guild.get_role(role_id)
+
+    async def provision_contest_roles(self, guild_id: str):
+        """有効なコンテストタイプの参加勢ロールを事前に作成する"""
+        guild = self.bot.get_guild(int(guild_id))
+        if not guild:
+            return
+        reminder_config = self.reminders.get(guild_id, {})
+        for contest_type in CONTEST_TYPES:
+            type_configs = reminder_config.get(contest_type) or []
+            if not any(config.get("enabled") for config in type_configs):
+                continue
+            if self.get_contest_role(guild, contest_type):
+                continue
+            if self._role_creation_failed_recently(guild.id, contest_type):
+                continue
+
+            role_name = f"{contest_type}参加勢"
+            try:
+                role = await guild.create_role(name=role_name)
+                self.contest_roles.setdefault(guild.id, {})[contest_type] = role.id
+                print(f"ロール {role_name} を作成しました。")
+            except discord.Forbidden:
+                self.failed_role_creations[(guild.id, contest_type)] = time.monotonic()
+                print(f"ロール {role_name} の作成に必要な権限がありません。")
+            except Exception as e:
+                self.failed_role_creations[(guild.id, contest_type)] = time.monotonic()
+                print(f"ロール {role_name} の作成中にエラーが発生しました: {e}")
+
+    def _role_creation_failed_recently(self, guild_id: int, contest_type: str) -> bool:
+        """ロール作成に失敗してから ROLE_CREATION_RETRY_SECONDS 以内かどうか"""
+        failed_at = self.failed_role_creations.get((guild_id, contest_type))
+        if failed_at is None:
+            return False
+        if time.monotonic() - failed_at >= ROLE_CREATION_RETRY_SECONDS:
+            del self.failed_role_creations[(guild_id, contest_type)]
+            return False
+        return True
+
+    def _forget_failed_role_creations(self, guild_id: int) -> bool:
+        """ギルドのロール作成の失敗記録を消し、消したものがあれば True を返す"""
+        keys = [key for key in self.failed_role_creations if key[0] == guild_id]
+        for key in keys:
+            del self.failed_role_creations[key]
+        return bool(keys)
+
+    @tasks.loop(minutes=10)
+    @metrics.timed("loop_tick_seconds", loop="provision_roles_loop")
+    async def provision_roles_loop(self):
+        """リマインダーを設定済みのサーバーの参加勢ロールを用意する
+
+        起動直後に全サーバー分を用意し、その後は作成に失敗してから
+        ROLE_CREATION_RETRY_SECONDS たったロールを作り直す。送信時にはロールを作らない。
+        """
+        for guild_id in list(self.reminders.keys()):
+            try:
+                await self.provision_contest_roles(guild_id)
+            except Exception as e:
+                print(f"参加勢ロールの準備中にエラーが発生しました: {e}, サーバーID: {guild_id}")
+
+    @provision_roles_loop.before_loop
+    async def before_provision_roles_loop(self):
+        await self.bot.wait_until_ready()
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role):
+        contest_type = self._contest_type_from_role_name(role.name)
+        if contest_type is None or role.guild.id not in self.contest_roles:
+            return
+        self.contest_roles[role.guild.id].setdefault(contest_type, role.id)
+        self.failed_role_creations.pop((role.guild.id, contest_type), None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.permissions != after.permissions:
+            # ロールの管理権限が付いたかもしれないので、作成に失敗したロールを作り直す
+            guild = after.guild
+            if guild.me and after in guild.me.roles and after.permissions.manage_roles:
+                if self._forget_failed_role_creations(guild.id):
+                    await self.provision_contest_roles(str(guild.id))
+        if before.name == after.name:
+            return
+        # 名前が変わった場合はそのギルドのキャッシュを作り直す
+        if after.guild.id in self.contest_roles:
+            self._build_role_cache(after.guild)
+        contest_type = self._contest_type_from_role_name(after.name)
+        if contest_type:
+            self.failed_role_creations.pop((after.guild.id, contest_type), None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        roles = self.contest_roles.get(role.guild.id)
+        if roles is None or role.id not in roles.values():
+            return
+        self._build_role_cache(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.contest_roles.pop(guild.id, None)
+        self._forget_failed_role_creations(guild.id)
+
     def get_a_problem_url(self, contest_url: str) -> str:
         """A問題のURLを生成する"""
         return f"{contest_url}/tasks/{contest_url.split('/')[-1]}_a"
 
-    async def send_reminder(
+    def build_reminder_delivery(
         self,
         guild_id: int,
         contest: Dict,
         reminder_time: int,
-    ):
-        """リマインダーを送信する"""
+    ) -> Optional[Delivery]:
+        """リマインダーの送信ジョブを作成する"""
         guild_id_str = str(guild_id)
         if guild_id_str not in self.reminders:
-            return
+            return None
         reminder_config = self.reminders[guild_id_str]
         if contest["type"] not in reminder_config:
-            return
+            return None
 
         contest_type_config = next(
             (
@@ -244,13 +487,13 @@ class Reminder(commands.Cog):
             None,
         )
         if not contest_type_config:
-            return
+            return None
 
         channel_id = int(reminder_config["reminder_channel_id"])
         channel = self.bot.get_channel(channel_id)
         if not channel:
             print(f"チャンネルが見つかりませんでした: {channel_id}")
-            return
+            return None
 
         start_time = datetime.datetime.strptime(
             contest["start_time"], "%Y-%m-%d %H:%M:%S"
@@ -280,40 +523,81 @@ class Reminder(commands.Cog):
             color=discord.Color.blue(),
         )
 
-        role_name = f"{contest['type']}参加勢"
-        role = discord.utils.get(channel.guild.roles, name=role_name)
+        # ロールは設定保存時に用意済みなので、送信時はキャッシュを引くだけ
+        role = self.get_contest_role(channel.guild, contest["type"])
         if role:
             message_content = role.mention
         else:
-            # ロールがない場合、作成を試みる
-            try:
-                role = await channel.guild.create_role(name=role_name)
-                message_content = role.mention
-                print(f"ロール {role_name} を作成しました。")
-            except discord.Forbidden:
-                print(f"ロール {role_name} の作成に必要な権限がありません。")
-                message_content = f"{contest['type']}参加勢はいませんか？"  # ロール作成失敗時にメンションを諦める
-            except Exception as e:
-                print(f"ロール {role_name} の作成中にエラーが発生しました: {e}")
-                message_content = f"{contest['type']}参加勢はいませんか？"  # ロール作成失敗時にメンションを諦める
+            message_content = f"{contest['type']}参加勢はいませんか？"
 
-        try:
-            await channel.send(content=message_content, embed=embed)
-            contest_type_config["sent_reminders"].append(contest["name"])
-            self.save_reminders(self.reminders)
-            print(
-                f"リマインダーを送信しました: {contest['name']} ({reminder_time}分前), サーバーID: {guild_id}"
-            )
+        return Delivery(
+            channel,
+            lambda: channel.send(content=message_content, embed=embed),
+            label=f"リマインダー {contest['name']} ({reminder_time}分前), サーバーID: {guild_id_str}",
+            context=(contest_type_config, contest, reminder_time, guild_id_str),
+        )
 
-        except discord.Forbidden:
-            print(
-                f"リマインダー送信に必要な権限がありません: {channel.name} , サーバーID: {guild_id_str}"
+    async def send_reminders(self, deliveries: List[Delivery]):
+        """リマインダーをまとめて送信し、送信済みとして記録する"""
+        results = await broadcaster.broadcast(deliveries, name="リマインダー")
+        sent_any = False
+        for result in results:
+            contest_type_config, contest, reminder_time, guild_id_str = (
+                result.delivery.context
             )
-        except Exception as e:
-            print(f"リマインダーの送信中にエラーが発生しました: {e}")
-            traceback.print_exc()
+            if result.ok:
+                contest_type_config.setdefault("sent_reminders", []).append(
+                    contest["name"]
+                )
+                sent_any = True
+                print(
+                    f"リマインダーを送信しました: {contest['name']} ({reminder_time}分前), サーバーID: {guild_id_str}"
+                )
+            elif isinstance(result.error, discord.Forbidden):
+                print(
+                    f"リマインダー送信に必要な権限がありません: {result.delivery.channel.name} , サーバーID: {guild_id_str}"
+                )
+        if sent_any:
+            await self.save_reminders_async()
+
+    def _build_due_index(self, contests: List[Dict]):
+        """全ギルド・全コンテストの送信予定時刻を一度だけ展開してソートする"""
+        index = []
+        for contest in contests:
+            try:
+                start_time = datetime.datetime.strptime(
+                    contest["start_time"], "%Y-%m-%d %H:%M:%S"
+                )
+            except (KeyError, ValueError):
+                continue
+            for guild_id, reminder_config in self.reminders.items():
+                for type_config in reminder_config.get(contest["type"]) or []:
+                    reminder_time = type_config["reminder_time"]
+                    if type_config["enabled"] and isinstance(reminder_time, int):
+                        due = start_time - datetime.timedelta(minutes=reminder_time)
+                        index.append((due, start_time, guild_id, reminder_time, contest))
+        index.sort(key=lambda item: item[0])
+        self._due_index = index
+        self._due_times = [item[0] for item in index]
+
+    def _due_items(
+        self,
+        contests: List[Dict],
+        contests_version: int,
+        since: datetime.datetime,
+        until: datetime.datetime,
+    ):
+        """(since, until] に送信予定時刻が入る項目を返す"""
+        key = (contests_version, self._reminders_version)
+        if key != self._due_index_key:
+            self._build_due_index(contests)
+            self._due_index_key = key
+        lo = bisect.bisect_right(self._due_times, since)
+        hi = bisect.bisect_right(self._due_times, until)
+        return self._due_index[lo:hi]
 
     @tasks.loop(minutes=0.5)
+    @metrics.timed("loop_tick_seconds", loop="check_reminders")
     async def check_reminders(self):
         """設定された時間に基づいてリマインダーを送信する"""
         now = datetime.datetime.now()
@@ -324,32 +608,41 @@ class Reminder(commands.Cog):
         contests = contest_data_cog.contests  # ContestData Cogからコンテスト情報を取得
         if not contests:
             return
-        for guild_id, reminder_config in self.reminders.items():
-            for contest in contests:  # 変更: self.contests -> contests
-                start_time = datetime.datetime.strptime(
-                    contest["start_time"], "%Y-%m-%d %H:%M:%S"
+
+        # 前回見た時刻から今までに期限が来たものを送る。停止中に過ぎたものも猶予時間内なら再送する
+        since = now - datetime.timedelta(minutes=1)
+        if self.last_checked is not None:
+            since = max(self.last_checked, now - CATCHUP_GRACE)
+            if since > now:
+                since = now - datetime.timedelta(minutes=1)
+        due_items = self._due_items(
+            contests, contest_data_cog.contests_version, since, now
+        )
+
+        deliveries = []
+        for due, start_time, guild_id, reminder_time, contest in due_items:
+            if start_time <= now:
+                continue  # 既に始まったコンテストのリマインダーは送らない
+            if due < now - datetime.timedelta(minutes=1):
+                print(
+                    f"停止中に送れなかったリマインダーを再送します: {contest['name']} ({reminder_time}分前), サーバーID: {guild_id}"
                 )
-                for contest_type, type_configs in reminder_config.items():
-                    if contest["type"] == contest_type:
-                        for type_config in type_configs:
-                            if type_config["enabled"]:
-                                reminder_time = type_config["reminder_time"]
-                                if isinstance(reminder_time, int):
-                                    reminder_time_delta = datetime.timedelta(
-                                        minutes=reminder_time
-                                    )
-                                    reminder_time_dt = start_time - reminder_time_delta
-                                    if (
-                                        now >= reminder_time_dt
-                                        and now
-                                        < reminder_time_dt
-                                        + datetime.timedelta(minutes=1)
-                                        and contest["name"]
-                                        not in type_config.get("sent_reminders", [])
-                                    ):
-                                        await self.send_reminder(
-                                            int(guild_id), contest, reminder_time
-                                        )
+            type_configs = self.reminders.get(guild_id, {}).get(contest["type"]) or []
+            if any(
+                contest["name"] in type_config.get("sent_reminders", [])
+                for type_config in type_configs
+                if type_config["reminder_time"] == reminder_time
+            ):
+                continue
+            delivery = self.build_reminder_delivery(int(guild_id), contest, reminder_time)
+            if delivery:
+                deliveries.append(delivery)
+        if deliveries:
+            await self.send_reminders(deliveries)
+
+        # 何も送らなかった tick も保存し、再起動後の再送範囲を正しく決められるようにする
+        self.last_checked = now
+        await self.save_reminder_state()
 
     @check_reminders.before_loop
     async def before_check_reminders(self):
@@ -365,7 +658,7 @@ class Reminder(commands.Cog):
             }
             for contest_type in CONTEST_TYPES:
                 self.reminders[guild_id][contest_type] = []
-                self.save_reminders(self.reminders)
+            await self.save_reminders_async()
 
         view = ReminderSettingsView(self, guild_id)
         await interaction.response.send_message(  # interaction.response.send_message に変更
@@ -600,7 +893,7 @@ class ContestTypeSettingsView(View):
                 view=None,  # view を None にしてボタンなどを削除
                 embed=embed,  # Embed を設定
             )
-            self.cog.save_reminders(self.cog.reminders)
+            await self.cog.apply_reminder_config(self.guild_id)
 
     def update_reminder_config(self, reminder_times: List[int]):
         """リマインダー設定を更新する (setで管理)"""
@@ -638,7 +931,7 @@ class ContestTypeSettingsView(View):
                 config["enabled"] = not config["enabled"]
                 if "sent_reminders" not in config:
                     config["sent_reminders"] = []
-        self.cog.save_reminders(self.cog.reminders)
+        await self.cog.apply_reminder_config(self.guild_id)
         is_enabled = self.is_enabled()
         self.children[2].label = "有効" if is_enabled else "無効"
         self.children[2].style = (
@@ -675,7 +968,7 @@ class ContestTypeSettingsView(View):
                 view=None,  # view を None にしてボタンなどを削除  <- こちらのみ残す
                 embed=embed,  # Embed を設定
             )
-            self.cog.save_reminders(self.cog.reminders)
+            await self.cog.apply_reminder_config(self.guild_id)
 
 
 class CustomTimeModal(discord.ui.Modal, title="カスタム通知時間設定"):
@@ -707,7 +1000,7 @@ class CustomTimeModal(discord.ui.Modal, title="カスタム通知時間設定"):
                 view=None,  # view を None にしてボタンなどを削除  <- こちらのみ残す
                 embed=embed,  # Embed を設定
             )
-            self.cog.save_reminders(self.cog.reminders)
+            await self.cog.apply_reminder_config(self.guild_id)
         except ValueError:
             await interaction.response.send_message(
                 "無効な入力です。半角数字で空白区切りで入力してください。",
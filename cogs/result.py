@@ -1,29 +1,47 @@
 # cogs/result.py
 import asyncio
+import copy
 import datetime
-import math
+import hashlib
+import io
 import os
-import re
 import traceback
-import urllib.parse
-from time import sleep
+import uuid
 
 import discord
 import gspread
+import numpy as np
+import pandas as pd
 import requests
 import yaml
 from discord import app_commands
 from discord.ext import commands, tasks
 from google.oauth2.service_account import Credentials
-from pdf2image import convert_from_path
+from pdf2image import convert_from_bytes
 from pdf2image.exceptions import (
     PDFInfoNotInstalledError,
     PDFPageCountError,
     PDFSyntaxError,
 )
-from PIL import Image
 
 from env.config import Config
+from utils.atcoder_session import login
+from utils.backfill import Backfill, parse_contest_ids
+from utils.broadcast import Delivery, broadcaster
+from utils.executor import executor
+from utils.job_queue import JobQueue, RetryPolicy
+from utils.metrics import metrics, requests_hook
+from utils.render_pool import RenderQueueFull, render_pool
+from utils.result_cache import ResultArtifact, ResultCache
+from utils.result_store import ResultStore
+from utils.result_table import (
+    CLUB_AFFILIATION,
+    HEADER,
+    PERFORMANCE_URL,
+    ResultTable,
+    contest_tasks,
+    parse_performance,
+)
 
 config = Config()
 
@@ -35,15 +53,114 @@ ATCODER_PASSWORD = config.atcoder_password
 
 RESULTS_CONFIG_FILE = "asset/results_config.yaml"
 CONTESTS_FILE = "asset/contests.yaml"
+RATING_FOLLOWUPS_FILE = "asset/rating_followups.yaml"
+RESULT_JOBS_FILE = "asset/result_jobs.yaml"
+# レート確定待ちの確認間隔 (秒)。確定していなければ倍にしていく
+RATING_FOLLOWUP_FIRST_DELAY = 10 * 60
+RATING_FOLLOWUP_MAX_DELAY = 6 * 60 * 60
+# これを過ぎても確定しなければ諦める
+RATING_FOLLOWUP_EXPIRY = datetime.timedelta(days=7)
+# 結果画像を保存するフォルダ。空なら保存しない
+RESULT_IMAGE_DIR = config.result_image_dir
+
+result_cache = ResultCache(
+    config.result_cache_dir,
+    pending_ttl=config.result_cache_ttl,
+    max_disk_bytes=config.result_cache_max_mb * 1024 * 1024,
+)
+# 過去の結果を集計するためのデータベース
+result_store = ResultStore(config.result_store_file)
+
+
+def format_number(value):
+    """集計結果の数値を表示用の文字列にする (欠損は "-")"""
+    return "-" if pd.isna(value) else f"{value:.0f}"
+
+
+def render_result_png(pdf_content, num_rows):
+    """結果のPDFをPNGに変換して切り抜き、PNGのバイト列を返す
+
+    ファイルを介さずメモリ上で処理する。描画用のプロセスで実行するので、
+    モジュールのトップレベルに置いている。
+    """
+    # PDF を PNG に変換
+    try:
+        print("変換中…")
+        images = convert_from_bytes(
+            pdf_content,
+            first_page=1,
+            last_page=1,
+            poppler_path="C:/Program Files/poppler-24.08.0/Library/bin",
+        )  # popplerのパスを指定
+        print("変換完了")
+    except (PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError) as e:
+        print(f"PDF変換エラー: {e}")
+        return None
+
+    # 画像の切り抜き
+    try:
+        img = images[0]
+        # 切り抜く高さを計算
+        crop_height = 37.6 * num_rows
+        cropped_img = img.crop((0, 0, img.width, crop_height))
+        buffer = io.BytesIO()
+        cropped_img.save(buffer, "PNG")
+        return buffer.getvalue()
+
+    except Exception as e:
+        print(f"画像切り抜きエラー: {e}")
+        return None
+
+
+def save_result_image(output_dir, contest_id, png):
+    """結果画像をキャッシュ用のフォルダに保存する
+
+    同じコンテストの画像を並行して保存しても衝突しないよう、ファイル名は毎回変える。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    name = f"{contest_id}-{datetime.datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}.png"
+    path = os.path.join(output_dir, name)
+    with open(path + ".tmp", "wb") as f:
+        f.write(png)
+    os.replace(path + ".tmp", path)
+    return path
 
 
 class Contest_result(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.results_config = self.load_results_config()
-        self.contests = self.load_contests()
+        self.results_config = {}
+        self.contests = []
+        # contest_id -> レート確定後に差し替える送信済みの結果
+        self.rating_followups = {}
+        # 結果の生成 (コンテストごと) と送信 (コンテスト・サーバーごと) のジョブ。
+        # 重い生成と軽い送信を別々に再試行する
+        self.result_jobs = JobQueue(
+            RESULT_JOBS_FILE,
+            "contest_result",
+            policies={
+                "generate": RetryPolicy(
+                    base_delay=5 * 60, max_delay=6 * 60 * 60, max_attempts=10
+                ),
+                "send": RetryPolicy(base_delay=60, max_delay=60 * 60, max_attempts=8),
+            },
+        )
+        # contest_id -> 進行中の画像生成。同じコンテストの依頼は1回の生成を共有する
+        self._generations = {}
+        # 1つのシートを使い回すので、書き込みからPDFの出力までは1件ずつ行う
+        self._spreadsheet_lock = asyncio.Lock()
+        # バックフィルは同時に1つだけ実行する
+        self._backfill_lock = asyncio.Lock()
+
+    async def cog_load(self):
+        self.results_config, self.contests, self.rating_followups = await asyncio.gather(
+            asyncio.to_thread(self.load_results_config),
+            asyncio.to_thread(self.load_contests),
+            asyncio.to_thread(self.load_rating_followups),
+        )
+        await asyncio.to_thread(self.result_jobs.load)
         self.check_contest_end.start()
-        self.retry_count = 0  # リトライカウントを初期化
+        self.check_rating_followups.start()
 
     def load_results_config(self):
         """結果送信チャンネル設定をYAMLファイルから読み込む"""
@@ -83,27 +200,32 @@ class Contest_result(commands.Cog):
                 sort_keys=False,
             )
 
-    async def get_rating_color(self, rating):
-        """Rating に応じた色を返す"""
-        if rating < 400:
-            return {"red": 0.5, "green": 0.5, "blue": 0.5}  # 灰色
-        elif rating < 800:
-            return {"red": 0.47, "green": 0.262, "blue": 0.082}  # 茶色
-        elif rating < 1200:
-            return {"red": 0.215, "green": 0.494, "blue": 0.133}  # 緑色
-        elif rating < 1600:
-            return {"red": 0.337, "green": 0.741, "blue": 0.749}  # 水色
-        elif rating < 2000:
-            return {"red": 0, "green": 0, "blue": 0.960}  # 青色
-        elif rating < 2400:
-            return {"red": 0.752, "green": 0.752, "blue": 0.239}  # 黄色
-        elif rating < 2800:
-            return {"red": 0.937, "green": 0.529, "blue": 0.200}  # 橙色
-        else:
-            return {"red": 0.917, "green": 0.200, "blue": 0.137}  # 赤色
+    def load_rating_followups(self):
+        """レート確定待ちの結果をYAMLファイルから読み込む"""
+        if os.path.exists(RATING_FOLLOWUPS_FILE):
+            with open(RATING_FOLLOWUPS_FILE, "r", encoding="utf-8") as f:
+                followups = yaml.safe_load(f)
+                if followups is None:
+                    return {}
+                return followups
+        return {}
+
+    def save_rating_followups(self, followups):
+        """レート確定待ちの結果をYAMLファイルに保存する"""
+        with open(RATING_FOLLOWUPS_FILE, "w", encoding="utf-8") as f:
+            yaml.dump(
+                followups,
+                f,
+                allow_unicode=True,
+                default_flow_style=False,
+                sort_keys=False,
+            )
 
     async def connect_to_spreadsheet(self):
         """Google スプレッドシートに接続する"""
+        return await executor.run_io(self._connect_to_spreadsheet)
+
+    def _connect_to_spreadsheet(self):
         try:
             scopes = [
                 "https://www.googleapis.com/auth/spreadsheets",
@@ -121,64 +243,33 @@ class Contest_result(commands.Cog):
             print(f"Error connecting to spreadsheet: {e}")
             raise e
 
-    async def write_to_spreadsheet(self, worksheet, data, workbook):
+    async def write_to_spreadsheet(self, worksheet, table, workbook):
         """スプレッドシートにデータを書き込む"""
+        await executor.run_io(self._write_to_spreadsheet, worksheet, table, workbook)
+
+    def _write_to_spreadsheet(self, worksheet, table, workbook):
         worksheet.clear()
 
         print("データ書き込み中…")
 
+        # 表示用の文字列はここで初めて作る
+        data = table.rows()
         # ヘッダー行とデータ行をまとめて書き込み
-        worksheet.update(
-            [
-                [
-                    "順位",
-                    "ユーザー",
-                    "得点",
-                    "A",
-                    "B",
-                    "C",
-                    "D",
-                    "E",
-                    "F",
-                    "G",
-                    "perf",
-                    "レート変化",
-                ]
-            ]
-            + data
-        )
-
-        # Rating とパフォに応じてセルの文字色を変更
-        for i, row in enumerate(data):
-            # Rating から色を取得
-            rating_change_str = row[11]
-            try:
-                if rating_change_str != "-":
-                    rating = int(rating_change_str.split("→")[1].split("(")[0].strip())
-                    rating_color = await self.get_rating_color(rating)  # 変数名を変更
-                    if rating_color:
-                        worksheet.format(
-                            f"B{i + 2}",
-                            {"textFormat": {"foregroundColor": rating_color}},
-                        )
-            except (ValueError, IndexError) as e:
-                print(f"Rating の取得中にエラーが発生しました: {e}")
-                continue
+        worksheet.update([HEADER] + data)
 
-            # パフォから色を取得
-            performance = row[10]
-            try:
-                if performance != "-":
-                    performance = int(performance)
-                    performance_color = await self.get_rating_color(performance)
-                    if performance_color:
-                        worksheet.format(
-                            f"K{i + 2}",
-                            {"textFormat": {"foregroundColor": performance_color}},
-                        )  # パフォのセルに色を設定
-            except (ValueError, TypeError) as e:
-                print(f"パフォの取得中にエラーが発生しました: {e}")
-                continue
+        # Rating とパフォに応じてセルの文字色を変更 (色はまとめて判定する)
+        for i, (rating_color, performance_color) in enumerate(
+            zip(table.rating_colors(), table.performance_colors())
+        ):
+            if rating_color:
+                worksheet.format(
+                    f"B{i + 2}", {"textFormat": {"foregroundColor": rating_color}}
+                )
+            if performance_color:
+                worksheet.format(
+                    f"K{i + 2}",
+                    {"textFormat": {"foregroundColor": performance_color}},
+                )  # パフォのセルに色を設定
 
         # penalty 部分だけを赤くする
         start_col = 3  # penalty 部分の開始列 (A=0, B=1, ...)
@@ -249,200 +340,156 @@ class Contest_result(commands.Cog):
 
     def login(self):
         """AtCoder にログインし、セッションを返す"""
-        try:
-            login_url = "https://atcoder.jp/login"
-            session = requests.session()
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }  # User-Agent を追加
-            res = session.get(login_url, headers=headers)  # headers を追加
-            res.raise_for_status()  # HTTPエラーをチェック
-            revel_session = res.cookies.get_dict().get("REVEL_SESSION")
-
-            if not revel_session:
-                raise ValueError("REVEL_SESSION cookie not found")
-
-            revel_session = urllib.parse.unquote(revel_session)
-            csrf_token_match = re.search(r"csrf_token\:(.*)_TS", revel_session)
-            if not csrf_token_match:
-                raise ValueError("csrf_token not found in REVEL_SESSION")
-
-            csrf_token = csrf_token_match.groups()[0].replace("\x00\x00", "")
-            sleep(1)
-            headers = {
-                "content-type": "application/x-www-form-urlencoded",
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            }  # content-type と User-Agent を設定
-            params = {
-                "username": ATCODER_USERNAME,
-                "password": ATCODER_PASSWORD,
-                "csrf_token": csrf_token,
-            }  # params に username, password, csrf_token を設定
-            data = {
-                "continue": "https://atcoder.jp:443/home"
-            }  # data に continue を設定
-            res = session.post(
-                login_url, params=params, data=data, headers=headers
-            )  # params, data, headers を設定
-            res.raise_for_status()  # HTTPエラーをチェック
-            return session
-        except requests.HTTPError as e:  # HTTPError をキャッチ
-            print(f"AtCoderログイン中にHTTPエラーが発生しました: {e}")
-            if e.response is not None:
-                print(f"レスポンスステータスコード: {e.response.status_code}")
-                print(f"レスポンスヘッダー: {e.response.headers}")
-                print(
-                    f"レスポンス内容: {e.response.content.decode('utf-8', errors='ignore')}"
-                )  # レスポンス内容を出力 (decodeとerrors='ignore'を追加)
-            return None
-        except Exception as e:
-            print(f"AtCoderログイン中にエラーが発生しました: {e}")
-            return None
+        return login(ATCODER_USERNAME, ATCODER_PASSWORD)
 
     async def get_task_list(self, contest_id):
         """コンテストIDから問題のリストを生成する"""
-        # contest_number = int(contest_id[3:])  # abcXXX の XXX 部分を数値に変換
-        return [
-            f"{contest_id}_{chr(ord('a') + i)}" for i in range(7)
-        ]  # a から g までの問題
+        return contest_tasks(contest_id)
 
     async def get_contest_performance(self, contest_id):
         """コンテストのパフォーマンスを取得する"""
-        url = f"https://raw.githubusercontent.com/key-moon/ac-predictor-data/refs/heads/master/results/{contest_id}.json"
+        url = PERFORMANCE_URL.format(contest_id=contest_id)
         try:
-            response = requests.get(url)
+            response = await executor.run_io(
+                requests.get, url, hooks={"response": requests_hook}
+            )
             response.raise_for_status()
-            data = response.json()
-
-            performance_data = {}
-            for item in data:
-                performance_data[item["UserScreenName"]] = (
-                    item["Performance"],
-                    item["OldRating"],
-                    item["NewRating"],
-                )
-
-            return performance_data
+            return parse_performance(response.json())
         except requests.RequestException as e:
             print(f"パフォーマンスデータの取得に失敗しました ({contest_id}): {e}")
             return {}
 
     async def get_atcoder_results(self, contest_id):
-        """コンテスト結果を取得する"""
+        """コンテスト結果を取得する
+
+        table (ResultTable), is_rated, ratings_final (パフォーマンスとレートが確定済みか) を返す。
+        """
         try:
-            session = self.login()
+            session = await executor.run_io(self.login)
             if not session:
                 raise ValueError("AtCoder へのログインに失敗しました。")
 
             url = f"https://atcoder.jp/contests/{contest_id}/standings/json"
-            response = session.get(url)
+            response = await executor.run_io(session.get, url)
             response.raise_for_status()
             data = response.json()
 
             # パフォーマンスデータを取得
             performance_data = await self.get_contest_performance(contest_id)
 
-            # IsRated を取得
-            is_rated = data.get("IsRated", True)
-
-            results = []
-            dennoh_rank = 1
-            for row in data["StandingsData"]:
-                affiliation = row.get("Affiliation")
-                if affiliation and "電子電脳技術研究会" in affiliation:
-                    try:
-                        user_name = row["UserScreenName"]
-
-                        if performance_data:
-                            performance, old_rating, new_rating = performance_data.get(
-                                user_name, (None, None, None)
-                            )
-                        else:
-                            performance, old_rating, new_rating = None, None, None
-
-                        if performance is None:
-                            performance = (
-                                "-"  # パフォーマンスが取得できない場合は "-" を設定
-                            )
-                        elif performance <= 400 and is_rated:
-                            true_performance = round(
-                                400 / (math.exp((400 - performance) / 400))
-                            )
-                            performance = true_performance
-
-                        rank = f"{dennoh_rank} ({row['Rank']})"
-                        total_score = row["TotalResult"]["Score"] / 100
-
-                        if old_rating is not None and new_rating is not None:
-                            rating_change = f"{old_rating} → {new_rating} ({new_rating - old_rating})"
-                        else:
-                            rating_change = "-"
-
-                        task_results = row.get("TaskResults", {})
-                        task_data = []
-                        for task in await self.get_task_list(contest_id):
-                            task_result = task_results.get(task)
-                            if task_result:
-                                try:  # task_result の処理中に例外が発生する可能性があるため try-except で囲む
-                                    # count = task_result['Count']
-                                    penalty = task_result["Penalty"]
-                                    failure = task_result.get("Failure", 0)
-                                    if task_result["Score"] >= 1:
-                                        score = task_result["Score"] // 100
-                                        task_data.append(
-                                            f"{score} ({penalty})"
-                                            if penalty > 0
-                                            else f"{score}"
-                                        )
-                                    elif task_result["Score"] == 0:
-                                        task_data.append(f"({failure + penalty})")
-                                    else:
-                                        task_data.append(f"({penalty})")
-                                except (
-                                    KeyError,
-                                    TypeError,
-                                ) as e:  # task_result の処理中に発生する可能性のあるエラーをキャッチ
-                                    print(
-                                        f"Task result 処理中にエラーが発生しました: {e}, task_result: {task_result}"
-                                    )
-                                    task_data.append(
-                                        "-"
-                                    )  # エラーが発生した場合は "-" を追加
-                            else:
-                                task_data.append("-")
-
-                        results.append(
-                            [rank, user_name, total_score]
-                            + task_data
-                            + [performance, rating_change]
-                        )
-                        dennoh_rank += 1
-                    except (
-                        KeyError,
-                        TypeError,
-                    ) as e:  # row の処理中に発生する可能性のあるエラーをキャッチ
-                        print(f"行の処理中にエラーが発生しました: {e}, row: {row}")
-                        continue  # エラーが発生した場合は次の行に進む
-            return results
+            table = ResultTable.from_standings(
+                contest_id,
+                data,
+                await self.get_task_list(contest_id),
+                CLUB_AFFILIATION,
+                performance_data,
+            )
+            return {
+                "table": table,
+                "is_rated": table.is_rated,
+                # ac-predictor-data の結果は公式のレート更新後に公開されるので、
+                # 取得できていればパフォーマンスとレートはもう変わらない
+                "ratings_final": bool(performance_data) or not table.is_rated,
+            }
         except Exception as e:
             print(f"AtCoder results の取得に失敗しました ({contest_id}): {e}")
             return None
 
-    async def generate_contest_result_image(self, contest_id="abc001"):
-        """コンテスト結果の画像を生成する"""
+    async def generate_contest_result_image(self, contest_id="abc001", wait=True):
+        """コンテスト結果の画像を生成し、PNGのバイト列を返す
+
+        wait=False のときは、描画待ちが一杯なら RenderQueueFull を送出する。
+        """
+        artifact = await self.generate_contest_result(contest_id, wait)
+        return artifact.png if artifact else None
+
+    async def generate_contest_result(self, contest_id, wait=True):
+        """コンテスト結果を取得して画像を生成し、ResultArtifact を返す
+
+        キャッシュにあればそれを返す。同じコンテストの生成が進行中なら、
+        新しく生成せずにその結果を待つ。
+        """
+        artifact = await result_cache.get(contest_id)
+        if artifact is not None:
+            return artifact
+        task = self._generations.get(contest_id)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_contest_result(contest_id, wait))
+            self._generations[contest_id] = task
+            task.add_done_callback(lambda _: self._generations.pop(contest_id, None))
+        return await asyncio.shield(task)
 
-        results = await self.get_atcoder_results(contest_id)
-        if not results:
+    async def _generate_contest_result(self, contest_id, wait):
+        fetched = await self.get_atcoder_results(contest_id)
+        if not fetched or not len(fetched["table"]):
             print("なんかバグって数値取得できなかったわ")
             return None
+        table = fetched["table"]
+        try:
+            await executor.run_io(
+                result_store.record_contest,
+                contest_id,
+                table.records(),
+                fetched["is_rated"],
+                fetched["ratings_final"],
+                self.contest_held_at(contest_id),
+                serial_key=result_store.path,
+            )
+        except Exception as e:
+            print(f"結果の記録に失敗しました ({contest_id}): {e}")
+
+        png = await self.render_result_table(table, wait)
+        if png is None:
+            return None
+        artifact = ResultArtifact(
+            contest_id,
+            fetched["ratings_final"],
+            table.to_dict(),
+            png,
+            {"is_rated": fetched["is_rated"]},
+        )
+        await result_cache.put(artifact)
+        return artifact
+
+    def contest_held_at(self, contest_id):
+        """コンテストの終了日時を返す (分からなければ None)"""
+        for contest in self.contests:
+            if contest["url"].split("/")[-1] == contest_id:
+                return contest["end_time"]
+        return None
 
+    async def render_result_table(self, table, wait=True):
+        """結果の表から画像を描画し、PNGのバイト列を返す"""
+        contest_id = table.contest_id
+        async with self._spreadsheet_lock:
+            pdf_content = await self.export_result_pdf(contest_id, table)
+        if pdf_content is None:
+            return None
+
+        # PDFの変換と切り抜きは描画用のプロセスで行う。同じ内容のPDFの描画だけを共有し、
+        # レート確定前と確定後の描画が重なっても古い画像を受け取らないようにする
+        pdf_digest = hashlib.blake2b(pdf_content, digest_size=16).hexdigest()
+        png = await render_pool.render(
+            (contest_id, pdf_digest), render_result_png, pdf_content, len(table), wait=wait
+        )
+        if png is None:
+            return None
+        if RESULT_IMAGE_DIR:
+            try:
+                await executor.run_io(save_result_image, RESULT_IMAGE_DIR, contest_id, png)
+            except OSError as e:
+                print(f"結果画像の保存に失敗しました ({contest_id}): {e}")
+        return png
+
+    async def export_result_pdf(self, contest_id, table):
+        """結果をスプレッドシートに書き込み、PDFとして出力する"""
         # スプレッドシートに書き込み
         print("接続中…")
         worksheet, workbook = await self.connect_to_spreadsheet()  # await を追加
-        await self.write_to_spreadsheet(worksheet, results, workbook)
+        await self.write_to_spreadsheet(worksheet, table, workbook)
 
         # 参加人数を取得
-        num_participants = len(results) + 1  # ヘッダー行も含める
+        num_participants = len(table) + 1  # ヘッダー行も含める
 
         # PDFとして出力 (URLを直接指定, rangeパラメータを動的に変更)
         pdf_url = (
@@ -455,84 +502,221 @@ class Contest_result(commands.Cog):
             f"&right_margin=0.00&left_margin=0.00&bottom_margin=0.00&top_margin=0.00"
         )
         try:
-            response = requests.get(pdf_url)
+            response = await executor.run_io(
+                requests.get, pdf_url, hooks={"response": requests_hook}
+            )
             response.raise_for_status()
         except requests.RequestException as e:
             print(f"PDFダウンロードに失敗しました ({contest_id}): {e}")
             return None
+        return response.content
 
-        # 保存先フォルダのパス
-        output_dir = "pdf_and_png"  # Atcotify_v2 フォルダの中に作成する場合
+    def build_result_delivery(self, name, contest_id, png, guild_id):
+        """コンテスト結果の送信ジョブを作成する"""
+        channel_id = self.results_config.get(str(guild_id))
+        if not channel_id:
+            print(f"サーバー {guild_id} の結果送信チャンネルが設定されていません。")
+            return None
+        channel = self.bot.get_channel(int(channel_id))
+        if not channel:
+            print(f"結果送信チャンネルが見つかりません: {channel_id}")
+            return None
+        return Delivery(
+            channel,
+            # discord.File は送信ごとに読み切られるので毎回作り直す
+            lambda: channel.send(
+                file=discord.File(io.BytesIO(png), filename=f"{contest_id}.png")
+            ),  # 画像のみ送信
+            label=f"{name} のコンテスト結果, サーバーID: {guild_id}",
+        )
 
-        # フォルダが存在しない場合に作成
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+    def enqueue_contest_result(self, contest):
+        """コンテスト結果の生成ジョブを登録する"""
+        contest_id = contest["url"].split("/")[-1]
+        self.result_jobs.add(
+            "generate",
+            f"generate:{contest_id}",
+            {"contest_id": contest_id, "name": contest["name"]},
+        )
 
-        pdf_path = os.path.join(output_dir, f"{contest_id}.pdf")
-        with open(pdf_path, "wb") as f:
-            f.write(response.content)
+    async def run_result_jobs(self):
+        """実行時刻になった生成・送信ジョブを処理する"""
+        jobs = self.result_jobs.due()
+        if not jobs:
+            return
+        for job in jobs:
+            if job.kind == "generate":
+                await self.run_generate_job(job)
+        # 生成に成功したコンテストの送信ジョブもここで拾う
+        await self.run_send_jobs(self.result_jobs.due("send"))
+        await self.result_jobs.save()
 
-        # PDF を PNG に変換
+    async def run_generate_job(self, job):
+        """結果画像を一度だけ生成し、送信先のサーバーごとに送信ジョブを登録する"""
+        contest_id = job.payload["contest_id"]
         try:
-            print("変換中…")
-            images = convert_from_path(
-                pdf_path, poppler_path="C:/Program Files/poppler-24.08.0/Library/bin"
-            )  # popplerのパスを指定
-            print("変換完了")
-            png_path = os.path.join(
-                output_dir, f"{contest_id}.png"
-            )  # pdf_and_pngフォルダの中に保存
-            images[0].save(png_path, "PNG")
-
-        except (PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError) as e:
-            print(f"PDF変換エラー: {e}")
-            return None
+            artifact = await self.generate_contest_result(contest_id)
+            error = "結果画像の生成に失敗しました"
+        except Exception as e:
+            artifact = None
+            error = e
+        if not artifact:
+            print(f"{job.payload['name']} のコンテスト結果画像の生成に失敗しました。")
+            metrics.counter(
+                "result_generate_failures_total", "コンテスト結果の生成に失敗した回数"
+            ).inc()
+            self.result_jobs.fail(job, error)
+            return
+        for guild_id in self.results_config.keys():
+            self.result_jobs.add(
+                "send",
+                f"send:{contest_id}:{guild_id}",
+                {
+                    "contest_id": contest_id,
+                    "name": job.payload["name"],
+                    "guild_id": str(guild_id),
+                },
+            )
+        self.result_jobs.succeed(job)
+
+    async def run_send_jobs(self, jobs):
+        """送信ジョブをまとめて送信する。失敗した送信先だけが後で再試行される"""
+        deliveries = []
+        for job in jobs:
+            contest_id = job.payload["contest_id"]
+            guild_id = job.payload["guild_id"]
+            if guild_id not in self.results_config:
+                # 送信先の設定が消された
+                self.result_jobs.succeed(job)
+                continue
+            # 他のサーバーと同じ画像を送るため、期限切れの確定前の結果も使う
+            artifact = await result_cache.get(contest_id, allow_stale=True)
+            if artifact is None:
+                # 再起動などでキャッシュから消えた。同じコンテストの送信先で生成を共有する
+                try:
+                    artifact = await self.generate_contest_result(contest_id)
+                except Exception as e:
+                    print(f"コンテスト結果の再生成中にエラーが発生しました: {e}")
+                if artifact is None:
+                    self.result_jobs.fail(job, "結果画像の生成に失敗しました")
+                    continue
+            delivery = self.build_result_delivery(
+                job.payload["name"], contest_id, artifact.png, guild_id
+            )
+            if delivery is None:
+                self.result_jobs.fail(job, "結果送信チャンネルが見つかりません")
+                continue
+            delivery.context = (job, artifact)
+            deliveries.append(delivery)
 
-        # 画像の切り抜き
+        results = await broadcaster.broadcast(deliveries, name="コンテスト結果")
+        followups = {}
+        for result in results:
+            job, artifact = result.delivery.context
+            if not result.ok:
+                self.result_jobs.fail(job, result.error)
+                continue
+            self.result_jobs.succeed(job)
+            if not artifact.ratings_final:
+                followups.setdefault(
+                    artifact.contest_id, (job.payload["name"], artifact, [])
+                )[2].append(result)
+        for name, artifact, sent in followups.values():
+            await self.schedule_rating_followup(name, artifact, sent)
+
+    async def schedule_rating_followup(self, name, artifact, results):
+        """レート確定後に、送信した結果画像を差し替える予定を登録する"""
+        messages = [
+            {"channel_id": result.value.channel.id, "message_id": result.value.id}
+            for result in results
+            if result.ok and isinstance(result.value, discord.Message)
+        ]
+        if not messages:
+            return
+        followup = self.rating_followups.get(artifact.contest_id)
+        if followup is None:
+            now = datetime.datetime.now()
+            next_check = now + datetime.timedelta(seconds=RATING_FOLLOWUP_FIRST_DELAY)
+            followup = self.rating_followups[artifact.contest_id] = {
+                "name": name,
+                "table": artifact.table,
+                "messages": [],
+                "created_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+                "next_check": next_check.strftime("%Y-%m-%d %H:%M:%S"),
+                "delay": RATING_FOLLOWUP_FIRST_DELAY,
+            }
+            print(f"{name} のレート確定後に結果を更新します。")
+        # 送信をやり直したサーバーの分は後から追加される
+        followup["messages"].extend(messages)
+        await executor.run_io(
+            self.save_rating_followups,
+            copy.deepcopy(self.rating_followups),
+            serial_key=RATING_FOLLOWUPS_FILE,
+        )
+
+    async def performance_published(self, contest_id):
+        """確定したパフォーマンスのファイルが公開されているかを HEAD で確認する"""
         try:
-            img = Image.open(png_path)
-            # 行数を取得
-            num_rows = len(results)
-            # 切り抜く高さを計算
-            crop_height = 37.6 * num_rows
-            cropped_img = img.crop((0, 0, img.width, crop_height))
-            cropped_img.save(png_path)
-            return png_path
+            response = await executor.run_io(
+                requests.head,
+                PERFORMANCE_URL.format(contest_id=contest_id),
+                hooks={"response": requests_hook},
+                timeout=10,
+            )
+        except requests.RequestException as e:
+            print(f"パフォーマンスデータの確認に失敗しました ({contest_id}): {e}")
+            return False
+        return response.status_code == 200
 
+    async def finalize_contest_result(self, contest_id, followup):
+        """パフォーマンスとレートの列だけを更新して画像を描き直し、送信済みの画像を差し替える"""
+        performance_data = await self.get_contest_performance(contest_id)
+        if not performance_data:
+            return False
+        table = ResultTable.from_dict(followup["table"])
+        table.apply_performance(performance_data)
+        try:
+            await executor.run_io(
+                result_store.record_contest,
+                contest_id,
+                table.records(),
+                table.is_rated,
+                True,
+                serial_key=result_store.path,
+            )
         except Exception as e:
-            print(f"画像切り抜きエラー: {e}")
-            return None
-
-    async def send_contest_result(self, contest, guild_id):
-        """コンテスト結果を送信する"""
-        contest_id = contest["url"].split("/")[-1]
-        image_path = await self.generate_contest_result_image(contest_id)
-        if image_path:
-            try:
-                channel_id = self.results_config.get(str(guild_id))
-                if channel_id:
-                    channel = self.bot.get_channel(int(channel_id))
-                    if channel:
-                        with open(image_path, "rb") as f:
-                            image_file = discord.File(f, filename=f"{contest_id}.png")
-                        await channel.send(file=image_file)  # 画像のみ送信
-                        print(f"{contest['name']} のコンテスト結果を送信しました。")
-                        self.retry_count = 0  # リトライカウントをリセット
-                        return True
-                    else:
-                        print(f"結果送信チャンネルが見つかりません: {channel_id}")
-                        return False
-                else:
-                    print(
-                        f"サーバー {guild_id} の結果送信チャンネルが設定されていません。"
-                    )
-                    return False
-            except Exception as e:
-                print(f"コンテスト結果送信中にエラーが発生しました: {e}")
-                return False
-        else:
-            print(f"{contest['name']} のコンテスト結果画像の生成に失敗しました。")
+            print(f"確定したレートの記録に失敗しました ({contest_id}): {e}")
+        png = await self.render_result_table(table)
+        if png is None:
             return False
+        await result_cache.put(
+            ResultArtifact(
+                contest_id, True, table.to_dict(), png, {"is_rated": table.is_rated}
+            )
+        )
+
+        deliveries = []
+        for message in followup["messages"]:
+            channel = self.bot.get_channel(message["channel_id"])
+            if not channel:
+                print(f"結果送信チャンネルが見つかりません: {message['channel_id']}")
+                continue
+            partial = channel.get_partial_message(message["message_id"])
+            deliveries.append(
+                Delivery(
+                    channel,
+                    # discord.File は送信ごとに読み切られるので毎回作り直す
+                    lambda partial=partial: partial.edit(
+                        attachments=[
+                            discord.File(io.BytesIO(png), filename=f"{contest_id}.png")
+                        ]
+                    ),
+                    label=f"{followup['name']} のコンテスト結果の更新, チャンネルID: {channel.id}",
+                )
+            )
+        await broadcaster.broadcast(deliveries, name="コンテスト結果の更新")
+        print(f"{followup['name']} のコンテスト結果をレート確定後の内容に更新しました。")
+        return True
 
     @app_commands.command(
         name="result---contest_result", description="コンテスト結果を表示します"
@@ -544,13 +728,21 @@ class Contest_result(commands.Cog):
         await interaction.response.defer()  # defer を先に呼び出す
         await asyncio.sleep(2)  # defer 後に少し待機 # sleep時間を1秒から2秒に延長
 
-        image_path = await self.generate_contest_result_image(contest_id)
-        if image_path:
+        try:
+            png = await self.generate_contest_result_image(contest_id, wait=False)
+        except RenderQueueFull:
+            embed = discord.Embed(
+                title="混雑中",
+                description="結果画像の生成待ちが多いため、しばらくしてからもう一度お試しください。",
+                color=discord.Color.red(),
+            )  # 赤色
+            await interaction.followup.send(embed=embed)
+            return
+        if png:
             try:
-                with open(image_path, "rb") as f:
-                    image_file = discord.File(
-                        f, filename=f"{contest_id}.png"
-                    )  # ファイル名を指定
+                image_file = discord.File(
+                    io.BytesIO(png), filename=f"{contest_id}.png"
+                )  # ファイル名を指定
                 await interaction.followup.send(file=image_file)  # 画像のみ送信
                 embed = discord.Embed(
                     title=f"{contest_id} のコンテスト結果", color=discord.Color.orange()
@@ -573,6 +765,196 @@ class Contest_result(commands.Cog):
             )  # 赤色
             await interaction.followup.send(embed=embed)
 
+    @app_commands.command(
+        name="result---member_history",
+        description="部員の最近のコンテスト成績を表示します",
+    )
+    @app_commands.describe(
+        user_name="AtCoder ID", count="表示するコンテスト数 (既定: 10)"
+    )
+    async def member_history_command(
+        self,
+        interaction: discord.Interaction,
+        user_name: str,
+        count: app_commands.Range[int, 1, 50] = 10,
+    ):
+        history = await executor.run_io(result_store.member_history, user_name, count)
+        if history.empty:
+            embed = discord.Embed(
+                title="エラー",
+                description=f"{user_name} の記録が見つかりませんでした。",
+                color=discord.Color.red(),
+            )  # 赤色
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        lines = [
+            f"`{row.contest_id}` {row.club_rank}位 ({row.rank}位) "
+            f"perf {format_number(row.performance)} "
+            f"rating {format_number(row.new_rating)}"
+            for row in history.itertuples()
+        ]
+        embed = discord.Embed(
+            title=f"{user_name} の直近{len(history)}回の成績",
+            description="\n".join(lines)[:4096],
+            color=discord.Color.orange(),
+        )
+        performance = history["performance"].dropna().to_numpy(dtype=float)
+        if len(performance):
+            embed.add_field(
+                name="パフォーマンス",
+                value=f"平均 {performance.mean():.0f} / 最高 {performance.max():.0f}",
+                inline=False,
+            )
+        if len(performance) >= 2:
+            # 回数に対するパフォーマンスの回帰直線の傾き
+            slope = np.polyfit(np.arange(len(performance)), performance, 1)[0]
+            embed.add_field(name="傾向", value=f"{slope:+.1f} / 回", inline=False)
+        rated = history.dropna(subset=["old_rating", "new_rating"])
+        if not rated.empty:
+            change = rated["new_rating"].iloc[-1] - rated["old_rating"].iloc[0]
+            embed.add_field(
+                name="レート",
+                value=f"{rated['old_rating'].iloc[0]:.0f} → "
+                f"{rated['new_rating'].iloc[-1]:.0f} ({change:+.0f})",
+                inline=False,
+            )
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(
+        name="result---club_average",
+        description="直近のコンテストでの部員の平均パフォーマンスを表示します",
+    )
+    @app_commands.describe(count="集計するコンテスト数 (既定: 10)")
+    async def club_average_command(
+        self,
+        interaction: discord.Interaction,
+        count: app_commands.Range[int, 1, 50] = 10,
+    ):
+        summary = await executor.run_io(result_store.club_performance, count)
+        if summary.empty:
+            embed = discord.Embed(
+                title="エラー",
+                description="記録されたコンテスト結果がありません。",
+                color=discord.Color.red(),
+            )  # 赤色
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        lines = [
+            f"`{row.contest_id}` {row.participants}人 "
+            f"平均 {format_number(row.mean_performance)} "
+            f"最高 {format_number(row.max_performance)}"
+            for row in summary.itertuples()
+        ]
+        embed = discord.Embed(
+            title=f"直近{len(summary)}回の部員のパフォーマンス",
+            description="\n".join(lines)[:4096],
+            color=discord.Color.orange(),
+        )
+        embed.add_field(
+            name="全体",
+            value=f"平均 {format_number(summary['mean_performance'].mean())} / "
+            f"参加 {summary['participants'].mean():.1f}人",
+            inline=False,
+        )
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(
+        name="result---backfill",
+        description="過去のコンテスト結果をまとめて結果データベースに記録します",
+    )
+    @app_commands.describe(
+        contests="コンテストの指定 (例: abc350-abc360, arc170)",
+        contest_type="種類を省略した番号 (例: 350-360) に使うコンテストの種類",
+        restart="前回の続きからではなく最初からやり直す",
+    )
+    @app_commands.choices(
+        contest_type=[
+            app_commands.Choice(name="ABC", value="abc"),
+            app_commands.Choice(name="ARC", value="arc"),
+            app_commands.Choice(name="AGC", value="agc"),
+        ]
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def backfill_command(
+        self,
+        interaction: discord.Interaction,
+        contests: str,
+        contest_type: str = "abc",
+        restart: bool = False,
+    ):
+        try:
+            contest_ids = parse_contest_ids(contests, [contest_type])
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        if not contest_ids:
+            await interaction.response.send_message(
+                "対象のコンテストがありません", ephemeral=True
+            )
+            return
+        if self._backfill_lock.locked():
+            await interaction.response.send_message(
+                "別のバックフィルを実行中です", ephemeral=True
+            )
+            return
+
+        await interaction.response.send_message(
+            f"バックフィルを開始します (0/{len(contest_ids)})"
+        )
+        loop = asyncio.get_running_loop()
+        last_update = loop.time()
+
+        async def progress(state, contest_id, ok):
+            nonlocal last_update
+            # メッセージの編集は数秒に1回にする
+            if loop.time() - last_update < 3 and state.finished < state.total:
+                return
+            last_update = loop.time()
+            try:
+                await interaction.edit_original_response(
+                    content=f"バックフィル中… {state.finished}/{state.total} "
+                    f"({contest_id}: {'完了' if ok else '失敗'})"
+                )
+            except discord.HTTPException as e:
+                # 操作のトークンが切れても、バックフィル自体は続ける
+                print(f"バックフィルの進捗を更新できませんでした: {e}")
+
+        async with self._backfill_lock:
+            backfill = Backfill(result_store, self.login)
+            try:
+                result = await backfill.run(contest_ids, progress, restart)
+            except Exception as e:
+                print(f"バックフィル中にエラーが発生しました: {e}")
+                traceback.print_exc()
+                embed = discord.Embed(
+                    title="エラー",
+                    description=f"バックフィルに失敗しました: {e}",
+                    color=discord.Color.red(),
+                )  # 赤色
+                await interaction.edit_original_response(content=None, embed=embed)
+                return
+
+        embed = discord.Embed(
+            title="バックフィル完了",
+            description=f"{result.done}/{result.total}件を記録しました"
+            f" (前回までに記録済み: {result.skipped}件, {result.elapsed:.0f}秒)",
+            color=discord.Color.orange() if result.failed else discord.Color.green(),
+        )
+        if result.failed:
+            embed.add_field(
+                name=f"失敗 ({len(result.failed)}件, 同じ指定で再実行すると再試行します)",
+                value="\n".join(
+                    f"`{contest_id}`: {error}" for contest_id, error in result.failed.items()
+                )[:1024],
+                inline=False,
+            )
+        try:
+            await interaction.edit_original_response(content=None, embed=embed)
+        except discord.HTTPException:
+            await interaction.channel.send(embed=embed)
+
     @app_commands.command(
         name="result---set_channel",
         description="コンテスト結果を送信するチャンネルを設定",
@@ -586,38 +968,78 @@ class Contest_result(commands.Cog):
         )
 
     @tasks.loop(minutes=1)
+    @metrics.timed("loop_tick_seconds", loop="check_contest_end")
     async def check_contest_end(self):
         """コンテスト終了時刻をチェックし、結果を自動送信する"""
         now = datetime.datetime.now()
-        updated_contests = []
+        changed = False
         for contest in self.contests:
             end_time = datetime.datetime.strptime(
                 contest["end_time"], "%Y-%m-%d %H:%M:%S"
             )
             if end_time <= now and not contest.get("result_sent", False):
-                guild_ids = self.results_config.keys()
-                sent_to_any_guild = False
-                for guild_id in guild_ids:
-                    if await self.send_contest_result(contest, guild_id):
-                        sent_to_any_guild = True
-                if sent_to_any_guild:
-                    contest["result_sent"] = True
-                    print(f"{contest['name']} のコンテスト結果の自動送信処理完了。")
-                else:
-                    print(f"{contest['name']} のコンテスト結果の自動送信に失敗。")
-                    self.retry_count += 1  # リトライカウントを増加
-                    if self.retry_count >= 10:
-                        print("リトライ回数が10回に達しました。自動送信を中止します。")
-                        break  # リトライ回数が10回に達したらループを抜ける
-            updated_contests.append(contest)
-        if updated_contests != self.contests:
-            self.contests = updated_contests
-            self.save_contests(self.contests)
+                # 生成と送信、失敗時の再試行はジョブキューに任せる
+                self.enqueue_contest_result(contest)
+                contest["result_sent"] = True
+                changed = True
+                print(f"{contest['name']} のコンテスト結果の自動送信を登録しました。")
+        if changed:
+            # ジョブを先に保存し、送信済みの印だけが残ることのないようにする
+            await self.result_jobs.save()
+            # 書き込み中に self.contests が変わっても影響しないよう複製を渡す
+            await executor.run_io(
+                self.save_contests, copy.deepcopy(self.contests), serial_key=CONTESTS_FILE
+            )
+        await self.run_result_jobs()
 
     @check_contest_end.before_loop
     async def before_check_contest_end(self):
         await self.bot.wait_until_ready()
 
+    @tasks.loop(minutes=1)
+    @metrics.timed("loop_tick_seconds", loop="check_rating_followups")
+    async def check_rating_followups(self):
+        """レート確定待ちの結果を確認し、確定していれば送信済みの画像を差し替える"""
+        now = datetime.datetime.now()
+        changed = False
+        for contest_id, followup in list(self.rating_followups.items()):
+            next_check = datetime.datetime.strptime(
+                followup["next_check"], "%Y-%m-%d %H:%M:%S"
+            )
+            if next_check > now:
+                continue
+            changed = True
+            try:
+                if await self.performance_published(contest_id):
+                    if await self.finalize_contest_result(contest_id, followup):
+                        del self.rating_followups[contest_id]
+                        continue
+            except Exception as e:
+                # ループを止めず、他のコンテストの確認と次回の再試行を続ける
+                print(f"{followup['name']} のコンテスト結果の更新中にエラーが発生しました: {e}")
+                traceback.print_exc()
+            created_at = datetime.datetime.strptime(
+                followup["created_at"], "%Y-%m-%d %H:%M:%S"
+            )
+            if now - created_at > RATING_FOLLOWUP_EXPIRY:
+                print(f"{followup['name']} のレートが確定しないため、結果の更新を中止します。")
+                del self.rating_followups[contest_id]
+                continue
+            # まだ確定していない。確認間隔を倍にして待つ
+            followup["delay"] = min(followup["delay"] * 2, RATING_FOLLOWUP_MAX_DELAY)
+            next_check = now + datetime.timedelta(seconds=followup["delay"])
+            followup["next_check"] = next_check.strftime("%Y-%m-%d %H:%M:%S")
+        if changed:
+            await executor.run_io(
+                self.save_rating_followups,
+                copy.deepcopy(self.rating_followups),
+                serial_key=RATING_FOLLOWUPS_FILE,
+            )
+
+    @check_rating_followups.before_loop
+    async def before_check_rating_followups(self):
+        await self.bot.wait_until_ready()
+
 
 class ResultChannelSelectView(discord.ui.View):  # ChannelSelect 用の View を作成
     def __init__(self, cog: Contest_result, guild_id: str):
@@ -8,6 +8,8 @@ from discord import app_commands
 from discord.ext import commands, tasks
 from discord.ui import Button, ChannelSelect, Select, View
 
+from utils.metrics import metrics
+
 from .contest_data import ContestData  # ContestData Cog をインポート
 
 THREADS_FILE = "asset/threads.yaml"
@@ -17,8 +19,11 @@ CONTEST_TYPES = ["ABC", "ARC", "AGC", "AHC"]
 class Threads(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.threads_config = {}
+
+    async def cog_load(self):
+        self.threads_config = await asyncio.to_thread(self.load_threads_config)
         self.check_contests_and_create_threads.start()
-        self.threads_config = self.load_threads_config()
 
     def load_threads_config(self):
         """スレッド設定をYAMLファイルから読み込む"""
@@ -40,6 +45,7 @@ class Threads(commands.Cog):
             )
 
     @tasks.loop(minutes=1)
+    @metrics.timed("loop_tick_seconds", loop="check_contests_and_create_threads")
     async def check_contests_and_create_threads(self):
         """コンテストをチェックし、スレッドを作成する"""
         now = datetime.datetime.now()
@@ -111,9 +117,9 @@ class Threads(commands.Cog):
 
                         # スレッド作成済みフラグを立てる
                         contest["threads_created"] = True
-                        contest_data_cog.save_contests(
+                        await contest_data_cog.save_contests_async(
                             contests
-                        )  # ContestData Cog の save_contests を呼び出す
+                        )  # ContestData Cog の save_contests_async を呼び出す
 
                     except discord.Forbidden:
                         print(
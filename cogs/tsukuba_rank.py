@@ -1,219 +1,214 @@
+import datetime
 import os
-from io import StringIO
 import json # 追加
 
 import discord
-import pandas as pd
 import requests
 import yaml
 from discord import app_commands
-from discord.ext import commands, tasks # tasks を追加
+from discord.ext import commands
 
-import calculate_hash
 from env.config import Config
+from utils.ajl_rankings import (
+    CONTEST_TYPES,
+    DEFAULT_SCHOOL,
+    SCORE_COLUMN,
+    SCHOOL_COLUMN,
+    school_ranking_url,
+)
+from utils.ajl_snapshots import RankingRow
+from utils.broadcast import Delivery, broadcaster
+from utils.executor import executor
 
-# TODO: 15分ごとにスクレイピングして更新があれば送信するようにする(studentも)
-# TODO: 前回実行時と同じ場合に前々回順位が表示されない問題
+from .ajl_data import tracked_schools
 
 # 環境変数から設定を読み込む
 config = Config()
 SEASON = config.season
 YEAR = config.year
 
-# 学校名略称yamlを読み込む
-with open("asset/school_abbreviations.yaml", encoding="utf-8") as f:
-    school_abbreviations = yaml.safe_load(f)
-
-# HTMLファイル保存ディレクトリを '../html/' に設定
-html_dir = "html/"
-
+# 以前の前回・前々回の順位を保存していたファイル (スナップショットへの移行にだけ使う)
 TSUKUBA_RANK_FILE = "asset/tsukuba_rank.yaml"
-AJL_RANKING_BASE_URL = (
-    f"https://img.atcoder.jp/ajl{YEAR}{{}}/school_rankings_grades_1to3_{{}}.html"
-)
 BOT_SETTINGS_FILE = "bot_settings.json" # 追加
 
 
+def migrate_tsukuba_rank_file(store, filename):
+    """以前の YAML に残っている前々回・前回の順位を、最初のスナップショットとして記録する"""
+    if not os.path.exists(filename):
+        return
+    with open(filename, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    taken_at = datetime.datetime.fromtimestamp(os.path.getmtime(filename)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    for contest_type, values in data.items():
+        page = school_ranking_url(YEAR, SEASON, contest_type)
+        if not values or store.has_page(page):
+            continue
+        for prefix in ("previous", "last"):
+            rank = values.get(f"{prefix}_rank")
+            if rank is None:
+                continue
+            row = RankingRow(
+                DEFAULT_SCHOOL, int(rank), values.get(f"{prefix}_score"), DEFAULT_SCHOOL
+            )
+            store.record(page, f"legacy-{prefix}", [row], taken_at=taken_at)
+
+
 class Tsukuba_rank(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.check_tsukuba_rank_loop.start() # ループ処理を開始
-
-    def cog_unload(self):
-        self.check_tsukuba_rank_loop.cancel() # コグがアンロードされるときにループをキャンセル
 
-    async def save_tsukuba_rank(self, filename, data):
-        """筑波大学附属中学校の順位とスコアをYAMLファイルに保存する"""
-        with open(filename, "w", encoding="utf-8") as f:
-            yaml.dump(
-                data, f, allow_unicode=True, default_flow_style=False, sort_keys=False
-            )
+    @property
+    def ajl(self):
+        """順位表を取得・共有する AJLData cog"""
+        return self.bot.get_cog("AJLData")
+
+    async def cog_load(self):
+        snapshots = self.ajl.snapshots
+        await executor.run_io(
+            migrate_tsukuba_rank_file,
+            snapshots,
+            TSUKUBA_RANK_FILE,
+            serial_key=snapshots.path,
+        )
+
+    def school_description(self, page, school, previous, heading):
+        """学校別の順位表での school の順位とスコアの説明文を作る"""
+        position = page.position(school)
+        current = page.row(position)
+
+        # 順位とスコアの比較のための説明文生成
+        description = f"## {self.ajl.abbreviation(school)}\n" if heading else ""
+        if previous is not None:
+            description += f"# {previous.rank}位→**||{current.rank}||位**\n"
+        else:
+            description += f"# **||{current.rank}||位**\n"
+
+        # 上の学校とのスコア差を計算
+        above_row = page.above(position)
+        if above_row is not None:
+            above_school_abbr = self.ajl.abbreviation(above_row[SCHOOL_COLUMN])
+            score_diff = int(above_row[SCORE_COLUMN]) - current.score
+            description += f"> **{above_school_abbr}**まであと**{score_diff}**点！"
+        else:
+            description += "> 現在トップです！"
 
-    async def load_tsukuba_rank(self, filename):
-        """筑波大学附属中学校の順位とスコアをYAMLファイルから読み込む"""
-        if os.path.exists(filename):
-            with open(filename, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f)
-            return data
+        # スコア変動
+        if previous is not None and previous.score is not None:
+            score_change = current.score - previous.score
+            description += f"\n# {current.score}点\n> 前回より**{score_change}点**増えました！"
         else:
-            return {
-                "A": {
-                    "previous_rank": None,
-                    "previous_score": None,
-                    "last_rank": None,
-                    "last_score": None,
-                },
-                "H": {
-                    "previous_rank": None,
-                    "previous_score": None,
-                    "last_rank": None,
-                    "last_score": None,
-                },
-            }
-
-    async def get_tsukuba_rank_data(self):
-        """筑波大学附属中学校の順位データを取得する"""
-        # SEASON に応じて URL の末尾を決定
-        season_suffix = "winter" if SEASON == "WINTER" else "summer"
-
-        # 前回のハッシュ値を取得（ファイルが存在しない場合はNone）
-        try:
-            previous_html_hash_school = calculate_hash.calculate_hash(
-                os.path.join(html_dir, f"ajl_ranking_{season_suffix}_A.html")
-            )
-        except FileNotFoundError:
-            previous_html_hash_school = None
-        try:
-            previous_html_hash_school_h = calculate_hash.calculate_hash(
-                os.path.join(html_dir, f"ajl_ranking_{season_suffix}_H.html")
-            )
-        except FileNotFoundError:
-            previous_html_hash_school_h = None
+            description += f"\n# {current.score}点"
+        return description
 
+    async def get_tsukuba_rank_data(self, schools=(DEFAULT_SCHOOL,), pages=None):
+        """追跡している学校の順位データを取得する
+
+        順位表は AJLData が取得してスナップショットとして記録したものを使い、
+        内容が変わる前のスナップショットと比べる。変更がなければ、
+        最後に変わったときの比較を表示する。pages (URL -> RankingPage) を
+        渡すと、取得し直さずにそのページを使う。
+        """
         embeds = []
-        updated_data = await self.load_tsukuba_rank(TSUKUBA_RANK_FILE)
-        changed = False
+        urls = [school_ranking_url(YEAR, SEASON, contest_type) for contest_type in CONTEST_TYPES]
+        if pages is None:
+            pages = dict(zip(urls, await self.ajl.get_pages(urls)))
 
         # コンテスト種別ごとに処理
-        for contest_type in ["A", "H"]:
-            url = AJL_RANKING_BASE_URL.format(season_suffix, contest_type)
-            response = requests.get(url)
-            response.raise_for_status()
-            response.encoding = "utf-8"
-            html = response.text
-
-            # HTMLファイルを保存
-            html_file_path = os.path.join(
-                html_dir, f"ajl_ranking_{season_suffix}_{contest_type}.html"
+        for (contest_type, title), url in zip(CONTEST_TYPES.items(), urls):
+            page = pages.get(url)
+            if page is None:
+                continue
+            found = [school for school in schools if page.position(school) is not None]
+            if not found:
+                continue
+            previous = await self.ajl.previous_rows(page, found)
+            description = "\n".join(
+                self.school_description(
+                    page, school, previous.get(school), heading=len(schools) > 1
+                )
+                for school in found
             )
-            with open(html_file_path, "w", encoding="utf-8") as f:
-                f.write(html)
+            embed = discord.Embed(
+                title=title,
+                description=description,
+                color=discord.Color.blue(),
+                url=page.url,
+            )
+            embeds.append(embed)
 
-            # ハッシュ値を計算
-            current_html_hash = calculate_hash.calculate_hash(html_file_path)
+        return embeds
 
-            # 前回のハッシュ値と比較
-            if contest_type == "A":
-                previous_hash = previous_html_hash_school
-            else:
-                previous_hash = previous_html_hash_school_h
-
-            df = pd.read_html(StringIO(html), encoding="utf-8")[0]
-            df = df[df["学校名"] != "学校名"]
-            tsukuba_row = df[df["学校名"] == "筑波大学附属中学校"]
-
-            if not tsukuba_row.empty:
-                tsukuba_rank_index = tsukuba_row.index[0] # インデックス名を変更
-                current_rank = int(tsukuba_row.iloc[0, 0])
-                current_score = int(tsukuba_row.iloc[0, 3])
-
-                # 前回のデータを取得
-                previous_data = await self.load_tsukuba_rank(TSUKUBA_RANK_FILE)
-                previous_rank = previous_data[contest_type]["previous_rank"]
-                previous_score = previous_data[contest_type]["previous_score"]
-                last_rank = previous_data[contest_type]["last_rank"]
-                last_score = previous_data[contest_type]["last_score"]
-
-                # 順位とスコアの比較のための説明文生成
-                description = "# "
-                if current_html_hash != previous_hash or previous_rank is None:
-                    if previous_rank is not None:
-                        description += f"{last_rank}位→**||{current_rank}||位**\n"
-                    else:
-                        description += f"**||{current_rank}||位**\n"
-                else:
-                    if previous_rank is not None:
-                        description += (
-                            f"{previous_rank}位→**||{current_rank}||位**\n"
-                        )
-                    else:
-                        description += f"**||{current_rank}||位**\n"
-
-                # 上の学校とのスコア差を計算
-                if tsukuba_rank_index > 0: # 変数名を変更
-                    above_row = df.iloc[tsukuba_rank_index - 1] # 変数名を変更
-                    above_school = above_row["学校名"]
-                    above_school_abbr = school_abbreviations.get(
-                        above_school, above_school
-                    )
-                    above_score = int(above_row["スコア"])
-                    score_diff = above_score - current_score
-                    description += (
-                        f"> **{above_school_abbr}**まであと**{score_diff}**点！"
-                    )
-                else:
-                    description += "> 現在トップです！"
-
-                # スコア変動
-                score_change = 0
-                if previous_score is not None and last_score is not None:
-                    if current_html_hash != previous_hash:
-                        score_change = current_score - last_score
-                    else:
-                        score_change = current_score - previous_score
-                    description += f"\n# {current_score}点\n> 前回より**{score_change}点**増えました！"
+    async def get_tsukuba_rank_history(self, days, schools=(DEFAULT_SCHOOL,)):
+        """保存済みのスナップショットから、days 日前からの順位とスコアの変化を作る"""
+        snapshots = self.ajl.snapshots
+        since = datetime.datetime.now() - datetime.timedelta(days=days)
+        embeds = []
+        for contest_type, title in CONTEST_TYPES.items():
+            url = school_ranking_url(YEAR, SEASON, contest_type)
+            latest = await executor.run_io(snapshots.latest, url)
+            if latest is None:
+                continue
+            rows = await executor.run_io(snapshots.rows, latest.id, list(schools))
+            base = await executor.run_io(snapshots.as_of, url, since)
+            base_rows = (
+                await executor.run_io(snapshots.rows, base.id, list(schools))
+                if base is not None
+                else {}
+            )
+            description = ""
+            for school in schools:
+                current = rows.get(school)
+                if current is None:
+                    continue
+                if len(schools) > 1:
+                    description += f"## {self.ajl.abbreviation(school)}\n"
+                description += f"# {current.rank}位 / {current.score}点\n"
+                base_row = base_rows.get(school)
+                if base_row is not None:
+                    description += f"> {base.taken_at} 時点: {base_row.rank}位"
+                    if base_row.score is not None:
+                        description += f" / {base_row.score}点"
+                        description += f"\n> スコア **{current.score - base_row.score:+d}**点"
+                    description += f"\n> 順位 **{base_row.rank - current.rank:+d}**\n"
                 else:
-                    description += f"\n# {current_score}点"
-
-                # Embedを作成
-                embed_url = f"https://img.atcoder.jp/ajl{YEAR}{season_suffix}/school_rankings_grades_1to3_{contest_type}.html"
-                embed = discord.Embed(
-                    title="アルゴリズム"
-                    if contest_type == "A"
-                    else "ヒューリスティック",
+                    description += f"> {days}日前の記録はありません\n"
+            if not description:
+                continue
+            description += f"-# 最終更新: {latest.taken_at}"
+            embeds.append(
+                discord.Embed(
+                    title=title,
                     description=description,
                     color=discord.Color.blue(),
-                    url=embed_url,
+                    url=url,
                 )
-                embeds.append(embed)
-
-
-                # HTMLに更新があった場合、順位・スコアの変更にかかわらず更新する
-                if current_html_hash != previous_hash:
-                    updated_data[contest_type]["previous_rank"] = last_rank
-                    updated_data[contest_type]["previous_score"] = last_score
-                    updated_data[contest_type]["last_rank"] = current_rank
-                    updated_data[contest_type]["last_score"] = current_score
-                    changed = True
-        
-        if changed:
-            await self.save_tsukuba_rank(TSUKUBA_RANK_FILE, updated_data)
-        
-        return embeds, changed
+            )
+        return embeds
+
+    async def guild_schools(self, guild_id):
+        """サーバーで追跡している学校"""
+        try:
+            settings = await self.ajl.load_settings()
+        except FileNotFoundError:
+            settings = {}
+        return tuple(tracked_schools(settings, guild_id))
 
     @app_commands.command(
         name="tsukuba_rank", # 元に戻す
-        description="現在のAJLの筑波大学附属中学校の順位を表示します",
+        description="現在のAJLの追跡している学校 (既定: 筑波大学附属中学校) の順位を表示します",
     )
     async def tsukuba_rank(self, interaction: discord.Interaction): # メソッド名を元に戻す
         try:
             await interaction.response.defer()  # レスポンスを遅らせても大丈夫にする
-            embeds, _ = await self.get_tsukuba_rank_data() # changed を無視
+            schools = await self.guild_schools(interaction.guild_id)
+            embeds = await self.get_tsukuba_rank_data(schools)
 
             if embeds:
                 await interaction.followup.send(embeds=embeds)
             else:
-                await interaction.followup.send("筑波大学附属中学校のデータが見つかりませんでした。")
+                await interaction.followup.send("追跡している学校のデータが見つかりませんでした。")
 
         except requests.RequestException as e: # 変更
             print(f"Error fetching data: {e}")
@@ -224,49 +219,76 @@ class Tsukuba_rank(commands.Cog):
             print(f"An unexpected error occurred: {e}")
             await interaction.followup.send("予期せぬエラーが発生しました。")
 
-    @tasks.loop(minutes=15)
-    async def check_tsukuba_rank_loop(self):
-        """15分ごとに筑波大学附属中学校の順位を確認し、変更があれば通知する"""
-        print("Checking Tsukuba Rank...")
+    @app_commands.command(
+        name="tsukuba_rank---history",
+        description="保存済みの記録から、指定した日数前からの学校の順位とスコアの変化を表示します",
+    )
+    @app_commands.describe(days="何日前と比べるか")
+    async def tsukuba_rank_history(
+        self,
+        interaction: discord.Interaction,
+        days: app_commands.Range[int, 1, 365] = 7,
+    ):
+        await interaction.response.defer()
         try:
-            # Call get_tsukuba_rank_data before the loop
-            embeds, changed = await self.get_tsukuba_rank_data()
+            schools = await self.guild_schools(interaction.guild_id)
+            embeds = await self.get_tsukuba_rank_history(days, schools)
+        except Exception as e:
+            print(f"Error in tsukuba_rank_history: {e}")
+            await interaction.followup.send("予期せぬエラーが発生しました。")
+            return
+        if embeds:
+            await interaction.followup.send(embeds=embeds)
+        else:
+            await interaction.followup.send("追跡している学校の記録がまだありません。")
 
-            with open(BOT_SETTINGS_FILE, "r") as f:
-                settings = json.load(f)
-            
-            guild_ids = [guild.id for guild in self.bot.guilds]
-
-            for guild_id in guild_ids:
-                guild_settings = settings.get(str(guild_id))
-                if guild_settings:
-                    channel_id = guild_settings.get("tsukuba_rank_channel_id")
-                    if channel_id:
-                        channel = self.bot.get_channel(int(channel_id))
-                        if channel:
-                            # Use stored embeds and changed values
-                            if changed and embeds:
-                                await channel.send(embeds=embeds)
-                                print(f"Tsukuba Rank updated and sent to guild {guild_id}.")
-                            elif not embeds:
-                                print(f"Tsukuba Rank data not found for guild {guild_id}.")
-                            else:
-                                print(f"No changes in Tsukuba Rank for guild {guild_id}.")
-                        else:
-                            print(f"Channel with ID {channel_id} not found in guild {guild_id}.")
-                    # else: # チャンネルIDが設定されていない場合、何もしない
-                    #     print(f"Tsukuba rank channel not set for guild {guild_id}.") 
-                # else: # サーバーの設定が存在しない場合、何もしない
-                #    print(f"Settings not found for guild {guild_id}.")
+    @commands.Cog.listener()
+    async def on_ajl_update(self, update):
+        """AJLData が順位表を取得するたびに呼ばれ、学校別の順位表に変更があれば通知する"""
+        try:
+            urls = [school_ranking_url(YEAR, SEASON, contest_type) for contest_type in CONTEST_TYPES]
+            if not update.any_changed(urls):
+                print("No changes in Tsukuba Rank.")
+                return
+            settings = update.settings
+
+            # 追跡する学校が同じサーバーには同じ Embed を送る (ページは取得し直さない)
+            data_by_schools = {}
+            deliveries = []
+            for guild in self.bot.guilds:
+                guild_id = guild.id
+                channel_id = settings.get(str(guild_id), {}).get("tsukuba_rank_channel_id")
+                if not channel_id:
+                    continue
+                channel = self.bot.get_channel(int(channel_id))
+                if not channel:
+                    print(f"Channel with ID {channel_id} not found in guild {guild_id}.")
+                    continue
+                schools = tuple(tracked_schools(settings, guild_id))
+                if schools not in data_by_schools:
+                    data_by_schools[schools] = await self.get_tsukuba_rank_data(
+                        schools, update.pages
+                    )
+                embeds = data_by_schools[schools]
+                if not embeds:
+                    print(f"Tsukuba Rank data not found for guild {guild_id}.")
+                    continue
+                deliveries.append(
+                    Delivery(
+                        channel,
+                        lambda channel=channel, embeds=embeds: channel.send(embeds=embeds),
+                        label=f"Tsukuba Rank guild {guild_id}",
+                        context=guild_id,
+                    )
+                )
+
+            results = await broadcaster.broadcast(deliveries, name="Tsukuba Rank")
+            for result in results:
+                if result.ok:
+                    print(f"Tsukuba Rank updated and sent to guild {result.delivery.context}.")
 
-        except FileNotFoundError:
-            print(f"{BOT_SETTINGS_FILE} not found.")
         except Exception as e:
-            print(f"Error in check_tsukuba_rank_loop: {e}")
-    
-    @check_tsukuba_rank_loop.before_loop
-    async def before_check_tsukuba_rank_loop(self):
-        await self.bot.wait_until_ready()
+            print(f"Error in Tsukuba Rank on_ajl_update: {e}")
 
     @app_commands.command(
         name="tsukuba_rank---set_ch",
@@ -1,157 +1,106 @@
+import datetime
 import os
-from io import StringIO
 import json # 追加
 
 import discord
-import pandas as pd
 import requests
 import yaml
 from discord import app_commands
-from discord.ext import commands, tasks # tasks を追加
+from discord.ext import commands
 
-import calculate_hash
 from env.config import Config
+from utils.ajl_rankings import (
+    CONTEST_TYPES,
+    DEFAULT_SCHOOL,
+    SCHOOL_COLUMN,
+    SCORE_COLUMN,
+    USER_COLUMN,
+    grade_ranking_url,
+    grades,
+    school_ranking_url,
+)
+from utils.ajl_snapshots import RankingRow
+from utils.broadcast import Delivery, broadcaster
+from utils.executor import executor
+
+from .ajl_data import tracked_schools, tracked_users
 
 # 環境変数から設定を読み込む
 config = Config()
 SEASON = config.season
 YEAR = config.year
 
-# 学校名略称を読み込む
-with open("asset/school_abbreviations.yaml", encoding="utf-8") as f:
-    school_abbreviations = yaml.safe_load(f)
-
-# 筑波大学附属中学校の生徒の前回の順位を保存するファイル名
+# 以前の生徒の前回・前々回の順位を保存していたファイル (スナップショットへの移行にだけ使う)
 TSUKUBA_STUDENT_RANK_FILE = "./asset/tsukuba_student_rank.yaml"
+BOT_SETTINGS_FILE = "bot_settings.json" # 追加
 
-# HTMLファイル保存ディレクトリを設定
-html_dir = "html/"
 
-# ランキングページのベースURL
-GRADE_A_BASE_URL = f"https://img.atcoder.jp/ajl{YEAR}{{}}/grade_{{}}_rankings_A_score.html"
-GRADE_H_BASE_URL = f"https://img.atcoder.jp/ajl{YEAR}{{}}/grade_{{}}_rankings_H_score.html"
-BOT_SETTINGS_FILE = "bot_settings.json" # 追加
+def migrate_tsukuba_student_rank_file(store, filename):
+    """以前の YAML に残っている前々回 (P_) ・前回 (L_) の順位を、最初のスナップショットとして記録する"""
+    if not os.path.exists(filename):
+        return
+    with open(filename, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    taken_at = datetime.datetime.fromtimestamp(os.path.getmtime(filename)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    for contest_type in CONTEST_TYPES:
+        for grade in range(1, 4):
+            page = grade_ranking_url(YEAR, SEASON, contest_type, grade)
+            if store.has_page(page):
+                continue
+            for prefix in ("P_", "L_"):
+                users = (data.get(prefix + contest_type) or {}).get(f"grade{grade}")
+                if not users:
+                    continue
+                rows = [
+                    RankingRow(user["name"], int(user["rank"]), None, DEFAULT_SCHOOL)
+                    for user in users
+                ]
+                store.record(page, f"legacy-{prefix}", rows, taken_at=taken_at)
 
 
 class Tsukuba_student_rank(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.check_tsukuba_student_rank_loop.start() # ループ処理を開始
-
-    def cog_unload(self):
-        self.check_tsukuba_student_rank_loop.cancel() # コグがアンロードされるときにループをキャンセル
-
-    async def save_tsukuba_student_rank(self, ranks_dict, filename):
-        """筑波大学附属中学校の生徒の順位とユーザIDをYAMLファイルに保存する"""
-        with open(filename, "w", encoding="utf-8") as f:
-            yaml.dump(
-                ranks_dict,
-                f,
-                allow_unicode=True,
-                default_flow_style=False,
-                sort_keys=False,
-            )
 
-    async def load_tsukuba_student_rank(self, filename):
-        """筑波大学附属中学校の生徒の順位とユーザIDをYAMLファイルから読み込む"""
-        try:
-            with open(filename, "r", encoding="utf-8") as f:
-                ranks_dict = yaml.safe_load(f)
-                if ranks_dict is not None:
-                    # 必要なキーがあるか確認し、なければ初期化する
-                    required_keys = ["A", "H", "P_A", "P_H", "L_A", "L_H"]
-                    for key in required_keys:
-                        if key not in ranks_dict:
-                            ranks_dict[key] = {f"grade{i + 1}": [] for i in range(3)}
-                    return ranks_dict
-                else:
-                    return {
-                        "A": {f"grade{i + 1}": [] for i in range(3)},
-                        "H": {f"grade{i + 1}": [] for i in range(3)},
-                        "P_A": {f"grade{i + 1}": [] for i in range(3)},
-                        "P_H": {f"grade{i + 1}": [] for i in range(3)},
-                        "L_A": {f"grade{i + 1}": [] for i in range(3)},
-                        "L_H": {f"grade{i + 1}": [] for i in range(3)},
-                    }
-
-        except (FileNotFoundError, yaml.YAMLError, TypeError, KeyError) as e:
-            print(f"YAMLファイルの読み込みエラー: {e}")
-            return {
-                "A": {f"grade{i + 1}": [] for i in range(3)},
-                "H": {f"grade{i + 1}": [] for i in range(3)},
-                "P_A": {f"grade{i + 1}": [] for i in range(3)},
-                "P_H": {f"grade{i + 1}": [] for i in range(3)},
-                "L_A": {f"grade{i + 1}": [] for i in range(3)},
-                "L_H": {f"grade{i + 1}": [] for i in range(3)},
-            }
-
-    async def get_student_rank(self, html, school_name):
-        """HTMLから指定された学校の生徒の順位とユーザー名をリストとして取得する"""
-        df = pd.read_html(StringIO(html), encoding="utf-8")[0]
-
-        # 学校名で検索
-        student_rows = df[df["学校名"] == school_name]
-        results = []
-        for _, row in student_rows.iterrows():
-            results.append((row["順位"], row["ユーザID"]))
-        return results
-
-    async def get_rank_info(
-        self, user_id, df, saved_ranks, contest_type, grade, html_changed
-    ):
+    @property
+    def ajl(self):
+        """順位表を取得・共有する AJLData cog"""
+        return self.bot.get_cog("AJLData")
+
+    async def cog_load(self):
+        snapshots = self.ajl.snapshots
+        await executor.run_io(
+            migrate_tsukuba_student_rank_file,
+            snapshots,
+            TSUKUBA_STUDENT_RANK_FILE,
+            serial_key=snapshots.path,
+        )
+
+    def get_rank_info(self, page, user_id, previous_rank, is_new_participant):
         """順位比較のための情報を取得する"""
         rank_info = ""
-        tsukuba_row = df[df["ユーザID"] == user_id].index[0]
-
-        # 現在の順位を取得
-        rank = df[df["ユーザID"] == user_id]["順位"].iloc[0]
-
-        # 過去の順位情報を取得
-        previous_rank_key = "P_" + contest_type
-        last_rank_key = "L_" + contest_type
-        previous_rank_for_user = None
-        last_rank_for_user = None
-
-        # 過去のデータを検索
-        if saved_ranks[last_rank_key] and f"grade{grade}" in saved_ranks[last_rank_key]:
-            for prev_user_data in saved_ranks[last_rank_key][f"grade{grade}"]:
-                if prev_user_data["name"] == user_id:
-                    last_rank_for_user = prev_user_data["rank"]
-                    break
-
-        if (
-            saved_ranks[previous_rank_key]
-            and f"grade{grade}" in saved_ranks[previous_rank_key]
-        ):
-            for prev_user_data in saved_ranks[previous_rank_key][f"grade{grade}"]:
-                if prev_user_data["name"] == user_id:
-                    previous_rank_for_user = prev_user_data["rank"]
-                    break
-
-        # HTMLに変更があった場合は最新のデータとlast_rankを比較
-        if html_changed:
-            if last_rank_for_user is not None:
-                rank_info += f" {last_rank_for_user}位 → **{rank}**位"
-            else:
-                rank_info += f" 初参加 → **{rank}**位"
-        # 変更がなかった場合はprevious_rankと比較
+        position = page.position(user_id)
+        current = page.row(position)
+
+        # 内容が変わる前のスナップショットの順位と比較
+        if previous_rank is not None:
+            rank_info += f" {previous_rank}位 → **{current.rank}**位"
+        elif is_new_participant:
+            rank_info += f" 初参加 → **{current.rank}**位"
         else:
-            if previous_rank_for_user is not None:
-                rank_info += f" {previous_rank_for_user}位 → **{rank}**位"
-            else:
-                rank_info += f" 初参加 → **{rank}**位"
+            rank_info += f" 圏外 → **{current.rank}**位"
 
-        if tsukuba_row > 0:
-            above_row = df.iloc[tsukuba_row - 1]
-            above_school = above_row["学校名"]
-            if above_school in school_abbreviations:
-                above_school = school_abbreviations[above_school]
+        above_row = page.above(position)
+        if above_row is not None:
+            above_school = above_row[SCHOOL_COLUMN]
+            if above_school in self.ajl.school_abbreviations:
+                above_school = self.ajl.school_abbreviations[above_school]
             elif above_school.endswith("中学校"):
                 above_school = above_school[:-3]
-            above_user = above_row["ユーザID"]
-            score_diff = int(above_row["スコア"]) - int(
-                df[df["ユーザID"] == user_id]["スコア"].iloc[0]
-            )
+            above_user = above_row[USER_COLUMN]
+            score_diff = int(above_row[SCORE_COLUMN]) - current.score
             rank_info += (
                 f"\n>  _{above_school}_ **{above_user}** まであと **{score_diff}**点！"
             )
@@ -160,193 +109,91 @@ class Tsukuba_student_rank(commands.Cog):
 
         return rank_info
 
-    async def process_grade_ranks(
-        self, contest_type, season_suffix, saved_ranks, html_changed
-    ):
-        """各学年の順位を取得し、Embed用のdescriptionを作成する"""
+    async def process_grade_ranks(self, contest_type, schools, users, pages=None):
+        """各学年の順位を取得し、Embed用のdescriptionを返す
+
+        pages (URL -> RankingPage) を渡すと、取得し直さずにそのページを使う。
+        """
         description = ""
         new_participants = []
-        base_url = GRADE_A_BASE_URL if contest_type == "A" else GRADE_H_BASE_URL
-        grade_ranks_all = []
-
-        for grade in range(1, 4):
-            # 冬季の3年生は処理しない
-            if grade == 3 and SEASON == "WINTER":
-                grade_ranks_all.append([])
+        urls = [
+            grade_ranking_url(YEAR, SEASON, contest_type, grade) for grade in grades(SEASON)
+        ]
+        if pages is None:
+            pages = dict(zip(urls, await self.ajl.get_pages(urls)))
+
+        for grade, url in zip(grades(SEASON), urls):
+            page = pages.get(url)
+            if page is None:
+                continue
+            user_ids = [row.key for row in page.tracked_rows(schools, users)]
+            if not user_ids:
                 continue
 
-            # HTMLファイルパスを設定
-            html_file_path = os.path.join(
-                html_dir, f"grade_{grade}_rankings_{contest_type}_{season_suffix}.html"
-            )
-
-            # HTMLをダウンロードして保存
-            response = requests.get(base_url.format(season_suffix, grade))
-            response.raise_for_status()
-            response.encoding = "utf-8"
-            html = response.text
-
-            with open(html_file_path, "w", encoding="utf-8") as f:
-                f.write(html)
-
-            grade_ranks = await self.get_student_rank(html, "筑波大学附属中学校")
-            grade_ranks_all.append(grade_ranks)
-
-            if grade_ranks:
-                description += f"## 中{grade}\n"
-                df = pd.read_html(StringIO(html), encoding="utf-8")[0]
-                df = df[df["学校名"] != "学校名"]
-
-                for rank, user_id in grade_ranks:
-                    rank_info = await self.get_rank_info(
-                        user_id, df, saved_ranks, contest_type, grade, html_changed
-                    )
-
-                    description += f"\n### **{user_id}**\n> {rank_info}\n"
-
-                    # 新規参加者かどうかを判定
-                    is_new_participant = True
-                    if (
-                        saved_ranks["L_" + contest_type]
-                        and f"grade{grade}" in saved_ranks["L_" + contest_type]
-                    ):
-                        for prev_user_data in saved_ranks["L_" + contest_type][
-                            f"grade{grade}"
-                        ]:
-                            if prev_user_data["name"] == user_id:
-                                is_new_participant = False
-                                break
-
-                    if (
-                        is_new_participant
-                        and saved_ranks["P_" + contest_type]
-                        and f"grade{grade}" in saved_ranks["P_" + contest_type]
-                    ):
-                        for prev_user_data in saved_ranks["P_" + contest_type][
-                            f"grade{grade}"
-                        ]:
-                            if prev_user_data["name"] == user_id:
-                                is_new_participant = False
-                                break
-
-                    if is_new_participant:
-                        new_participants.append(user_id)
+            previous_rows = await self.ajl.previous_rows(page, user_ids)
+            # これまでのどのスナップショットにも載っていなければ新規参加者
+            seen = await self.ajl.seen_before(page, user_ids)
+
+            description += f"## 中{grade}\n"
+            for user_id in user_ids:
+                previous_row = previous_rows.get(user_id)
+                rank_info = self.get_rank_info(
+                    page,
+                    user_id,
+                    previous_row.rank if previous_row is not None else None,
+                    user_id not in seen,
+                )
+                description += f"\n### **{user_id}**\n> {rank_info}\n"
+                if user_id not in seen:
+                    new_participants.append(user_id)
 
         if new_participants:
             description += "\n:tada: 新規参加者 :tada:\n"
             for user_id in new_participants:
                 description += f"- **{user_id}**\n"
 
-        return description, grade_ranks_all
+        return description
 
-    async def get_tsukuba_student_rank_data(self):
-        """筑波大学附属中学校の生徒の順位データを取得する"""
-        season_suffix = "winter" if SEASON == "WINTER" else "summer"
-        html_changed = {"A": False, "H": False}
+    async def get_tsukuba_student_rank_data(
+        self, schools=(DEFAULT_SCHOOL,), users=(), pages=None
+    ):
+        """追跡している学校の生徒とユーザーの順位データを取得する"""
         embeds = []
-        changed_flag = False # 変更があったかどうかを示すフラグ
 
-        # 前回のハッシュ値を確認するコンテスト種類と学年
-        check_contest = "A"
-        check_grade = 1
-
-        # 前回のハッシュ値を取得
-        html_file_path = os.path.join(
-            html_dir,
-            f"grade_{check_grade}_rankings_{check_contest}_{season_suffix}.html",
-        )
-        try:
-            previous_html_hash = calculate_hash.calculate_hash(html_file_path)
-        except FileNotFoundError:
-            previous_html_hash = None
-
-        # 最新のHTMLをダウンロード
-        response = requests.get(GRADE_A_BASE_URL.format(season_suffix, check_grade))
-        response.raise_for_status()
-        response.encoding = "utf-8"
-        html = response.text
-
-        # HTMLをファイルに保存
-        with open(html_file_path, "w", encoding="utf-8") as f:
-            f.write(html)
-
-        # 現在のHTMLのハッシュ値を取得
-        current_html_hash = calculate_hash.calculate_hash(html_file_path)
-
-        # ハッシュ値を比較して変更を検出
-        if current_html_hash != previous_html_hash:
-            html_changed["A"] = True
-            html_changed["H"] = True
-            changed_flag = True # 変更があったことを記録
-
-        # 前回の順位を読み込み
-        saved_ranks = await self.load_tsukuba_student_rank(
-            TSUKUBA_STUDENT_RANK_FILE
-        )
-
-        # Aコンテストの処理
-        description_a, grade_ranks_a = await self.process_grade_ranks(
-            "A", season_suffix, saved_ranks, html_changed["A"]
-        )
-        if description_a: # description が空でない場合のみ Embed を作成
-            url_a = f"https://img.atcoder.jp/ajl{YEAR}{season_suffix}/school_rankings_grades_1to3_A.html"
-            embed_a = discord.Embed(
-                title="アルゴリズム",
-                description=description_a,
-                color=discord.Color.blue(),
-                url=url_a,
+        for contest_type, title in CONTEST_TYPES.items():
+            description = await self.process_grade_ranks(
+                contest_type, schools, users, pages
             )
-            embeds.append(embed_a)
+            if description: # description が空でない場合のみ Embed を作成
+                embed = discord.Embed(
+                    title=title,
+                    description=description,
+                    color=discord.Color.blue(),
+                    url=school_ranking_url(YEAR, SEASON, contest_type),
+                )
+                embeds.append(embed)
 
-        # Hコンテストの処理
-        description_h, grade_ranks_h = await self.process_grade_ranks(
-            "H", season_suffix, saved_ranks, html_changed["H"]
-        )
-        if description_h: # description が空でない場合のみ Embed を作成
-            url_h = f"https://img.atcoder.jp/ajl{YEAR}{season_suffix}/school_rankings_grades_1to3_H.html"
-            embed_h = discord.Embed(
-                title="ヒューリスティック",
-                description=description_h,
-                color=discord.Color.blue(),
-                url=url_h,
-            )
-            embeds.append(embed_h)
-
-        # 新しい順位を保存
-        if html_changed["A"] or html_changed["H"]:
-            # P_A, P_H に L_A, L_H の内容をコピー
-            saved_ranks["P_A"] = saved_ranks["L_A"].copy()
-            saved_ranks["P_H"] = saved_ranks["L_H"].copy()
-
-            # L_A, L_H に現在の順位を保存
-            for i, grade_rank_list in enumerate(grade_ranks_a):
-                saved_ranks["L_A"][f"grade{i + 1}"] = [
-                    {"name": user_id, "rank": rank}
-                    for rank, user_id in grade_rank_list
-                ]
-            for i, grade_rank_list in enumerate(grade_ranks_h):
-                saved_ranks["L_H"][f"grade{i + 1}"] = [
-                    {"name": user_id, "rank": rank}
-                    for rank, user_id in grade_rank_list
-                ]
-
-            await self.save_tsukuba_student_rank(
-                saved_ranks, TSUKUBA_STUDENT_RANK_FILE
-            )
-        return embeds, changed_flag
+        return embeds
 
     @app_commands.command(
         name="tsukuba_student_rank",
-        description="筑波大学附属中学校の生徒の順位を表示します",
+        description="追跡している学校 (既定: 筑波大学附属中学校) の生徒とユーザーの順位を表示します",
     )
     async def tsukuba_student_rank_command(self, interaction: discord.Interaction):
         await interaction.response.defer()
         try:
-            embeds, _ = await self.get_tsukuba_student_rank_data()
+            try:
+                settings = await self.ajl.load_settings()
+            except FileNotFoundError:
+                settings = {}
+            embeds = await self.get_tsukuba_student_rank_data(
+                tracked_schools(settings, interaction.guild_id),
+                tracked_users(settings, interaction.guild_id),
+            )
             if embeds:
                 await interaction.followup.send(embeds=embeds)
             else:
-                await interaction.followup.send("筑波大学附属中学校の生徒データが見つかりませんでした。")
+                await interaction.followup.send("追跡している学校の生徒データが見つかりませんでした。")
 
         except requests.RequestException as e:
             print(f"Error fetching student data: {e}")
@@ -357,49 +204,62 @@ class Tsukuba_student_rank(commands.Cog):
             print(f"An unexpected error occurred in student rank: {e}")
             await interaction.followup.send("予期せぬエラーが発生しました。")
 
-    @tasks.loop(minutes=15)
-    async def check_tsukuba_student_rank_loop(self):
-        """15分ごとに筑波大学附属中学校の生徒の順位を確認し、変更があれば通知する"""
-        print("Checking Tsukuba Student Rank...")
+    @commands.Cog.listener()
+    async def on_ajl_update(self, update):
+        """AJLData が順位表を取得するたびに呼ばれ、学年別の順位表に変更があれば通知する"""
         try:
-            # Call get_tsukuba_student_rank_data before the loop
-            embeds, changed = await self.get_tsukuba_student_rank_data()
+            urls = [
+                grade_ranking_url(YEAR, SEASON, contest_type, grade)
+                for contest_type in CONTEST_TYPES
+                for grade in grades(SEASON)
+            ]
+            if not update.any_changed(urls):
+                print("No changes in Tsukuba Student Rank.")
+                return
+            settings = update.settings
+
+            # 追跡する学校とユーザーが同じサーバーには同じ Embed を送る (ページは取得し直さない)
+            data_by_tracked = {}
+            deliveries = []
+            for guild in self.bot.guilds:
+                guild_id = guild.id
+                channel_id = settings.get(str(guild_id), {}).get(
+                    "tsukuba_student_rank_channel_id"
+                )
+                if not channel_id:
+                    continue
+                channel = self.bot.get_channel(int(channel_id))
+                if not channel:
+                    print(f"Channel with ID {channel_id} not found in guild {guild_id} for student rank.")
+                    continue
+                tracked = (
+                    tuple(tracked_schools(settings, guild_id)),
+                    tuple(tracked_users(settings, guild_id)),
+                )
+                if tracked not in data_by_tracked:
+                    data_by_tracked[tracked] = await self.get_tsukuba_student_rank_data(
+                        *tracked, pages=update.pages
+                    )
+                embeds = data_by_tracked[tracked]
+                if not embeds:
+                    print(f"Tsukuba Student Rank data not found for guild {guild_id}.")
+                    continue
+                deliveries.append(
+                    Delivery(
+                        channel,
+                        lambda channel=channel, embeds=embeds: channel.send(embeds=embeds),
+                        label=f"Tsukuba Student Rank guild {guild_id}",
+                        context=guild_id,
+                    )
+                )
 
-            with open(BOT_SETTINGS_FILE, "r") as f:
-                settings = json.load(f)
+            results = await broadcaster.broadcast(deliveries, name="Tsukuba Student Rank")
+            for result in results:
+                if result.ok:
+                    print(f"Tsukuba Student Rank updated and sent to guild {result.delivery.context}.")
 
-            guild_ids = [guild.id for guild in self.bot.guilds]
-
-            for guild_id in guild_ids:
-                guild_settings = settings.get(str(guild_id))
-                if guild_settings:
-                    channel_id = guild_settings.get("tsukuba_student_rank_channel_id")
-                    if channel_id:
-                        channel = self.bot.get_channel(int(channel_id))
-                        if channel:
-                            # Use stored embeds and changed values
-                            if changed and embeds:
-                                await channel.send(embeds=embeds)
-                                print(f"Tsukuba Student Rank updated and sent to guild {guild_id}.")
-                            elif not embeds:
-                                print(f"Tsukuba Student Rank data not found for guild {guild_id}.")
-                            else:
-                                print(f"No changes in Tsukuba Student Rank for guild {guild_id}.")
-                        else:
-                            print(f"Channel with ID {channel_id} not found in guild {guild_id} for student rank.")
-                    # else:
-                    #     print(f"Tsukuba student rank channel not set for guild {guild_id}.")
-                # else:
-                #     print(f"Settings not found for guild {guild_id} for student rank.")
-
-        except FileNotFoundError:
-            print(f"{BOT_SETTINGS_FILE} not found for student rank.")
         except Exception as e:
-            print(f"Error in check_tsukuba_student_rank_loop: {e}")
-
-    @check_tsukuba_student_rank_loop.before_loop
-    async def before_check_tsukuba_student_rank_loop(self):
-        await self.bot.wait_until_ready()
+            print(f"Error in Tsukuba Student Rank on_ajl_update: {e}")
 
     @app_commands.command(
         name="tsukuba_student_rank---set_ch",
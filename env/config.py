@@ -40,4 +40,77 @@ class Config:
     
     @property
     def year(self) -> str:
-        return str(self.config["YEAR"]["YEAR"])
\ No newline at end of file
+        return str(self.config["YEAR"]["YEAR"])
+
+    @property
+    def reminder_catchup_grace_minutes(self) -> int:
+        return self.config.getint(
+            "REMINDER", "CATCHUP_GRACE_MINUTES", fallback=30
+        )
+
+    @property
+    def metrics_host(self) -> str:
+        return self.config.get("METRICS", "HOST", fallback="127.0.0.1")
+
+    @property
+    def metrics_port(self) -> int:
+        # 0 にするとメトリクスのHTTPエンドポイントを無効にする
+        return self.config.getint("METRICS", "PORT", fallback=9464)
+
+    @property
+    def watchdog_threshold_ms(self) -> int:
+        # 0 にするとイベントループの監視を無効にする
+        return self.config.getint("METRICS", "WATCHDOG_THRESHOLD_MS", fallback=250)
+
+    @property
+    def executor_io_workers(self) -> int:
+        return self.config.getint("EXECUTOR", "IO_WORKERS", fallback=8)
+
+    @property
+    def executor_cpu_workers(self) -> int:
+        # 0 にするとプロセスプールを使わず、CPU処理もスレッドプールで実行する
+        return self.config.getint("EXECUTOR", "CPU_WORKERS", fallback=0)
+
+    @property
+    def result_image_dir(self) -> str:
+        # 空にすると結果画像をディスクに保存しない
+        return self.config.get("RESULT", "IMAGE_DIR", fallback="")
+
+    @property
+    def result_cache_dir(self) -> str:
+        return self.config.get("RESULT", "CACHE_DIR", fallback="asset/result_cache")
+
+    @property
+    def result_store_file(self) -> str:
+        return self.config.get("RESULT", "STORE_FILE", fallback="asset/results.db")
+
+    @property
+    def result_cache_ttl(self) -> int:
+        # レート確定前の結果を使い回す秒数
+        return self.config.getint("RESULT", "CACHE_TTL_SECONDS", fallback=600)
+
+    @property
+    def result_cache_max_mb(self) -> int:
+        return self.config.getint("RESULT", "CACHE_MAX_MB", fallback=64)
+
+    @property
+    def ajl_snapshot_file(self) -> str:
+        return self.config.get("AJL", "SNAPSHOT_FILE", fallback="asset/ajl_snapshots.db")
+
+    @property
+    def ajl_store_full_rows(self) -> bool:
+        # 有効にすると、通知対象の行だけでなく順位表全体を圧縮して保存する
+        return self.config.getboolean("AJL", "STORE_FULL_ROWS", fallback=False)
+
+    @property
+    def ajl_html_archive(self) -> bool:
+        # 有効にすると、内容が変わったページを html/ に gzip で保存する
+        return self.config.getboolean("AJL", "HTML_ARCHIVE", fallback=False)
+
+    @property
+    def render_workers(self) -> int:
+        return self.config.getint("RENDER", "WORKERS", fallback=2)
+
+    @property
+    def render_queue_size(self) -> int:
+        return self.config.getint("RENDER", "QUEUE_SIZE", fallback=8)
@@ -1,11 +1,20 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
 import traceback
 
 import discord
 from discord.ext import commands
 
 from env.config import Config
+from utils.executor import executor
+from utils.metrics import metrics
+from utils.render_pool import render_pool
 
 INITIAL_EXTENSIONS = [
+    "cogs.ajl_data",
     "cogs.tsukuba_rank",
     "cogs.tsukuba_student_rank",
     "cogs.help",
@@ -14,27 +23,95 @@ INITIAL_EXTENSIONS = [
     "cogs.threads",
     "cogs.contest_data",
     "cogs.affiliated_police",
+    "cogs.metrics",
 ]
 
+# 各拡張が必要とする Gateway Intents
+# guilds: ギルド・チャンネル・ロールのキャッシュとロール作成/更新/削除イベント
+# guild_messages / message_content: メッセージ本文を読むリスナーとプレフィックスコマンド
+EXTENSION_INTENTS = {
+    "cogs.ajl_data": [],
+    "cogs.tsukuba_rank": ["guilds"],
+    "cogs.tsukuba_student_rank": ["guilds"],
+    "cogs.help": [],
+    "cogs.reminder": ["guilds"],
+    "cogs.result": ["guilds"],
+    "cogs.threads": ["guilds"],
+    "cogs.contest_data": [],
+    "cogs.affiliated_police": ["guilds", "guild_messages", "message_content"],
+    "cogs.metrics": ["guilds"],
+    "jishaku": ["guilds", "guild_messages", "dm_messages", "message_content"],
+}
+
+# 読み込み時に他の拡張の cog を必要とする拡張。それ以外は並行して読み込む
+EXTENSION_DEPENDENCIES = {
+    "cogs.tsukuba_rank": ["cogs.ajl_data"],
+    "cogs.tsukuba_student_rank": ["cogs.ajl_data"],
+    "cogs.reminder": ["cogs.contest_data"],
+    "cogs.threads": ["cogs.contest_data"],
+}
+
+COMMAND_TREE_HASH_FILE = "asset/command_tree_hash.txt"
+
 config = Config()
 
 TOKEN = config.token
+executor.configure(config.executor_io_workers, config.executor_cpu_workers)
+render_pool.configure(config.render_workers, config.render_queue_size)
+
+
+def build_intents():
+    """読み込む拡張が必要とする Intents だけを有効にする"""
+    intents = discord.Intents.none()
+    print("Intents:")
+    for extension in INITIAL_EXTENSIONS + ["jishaku"]:
+        required = EXTENSION_INTENTS.get(extension, [])
+        for name in required:
+            setattr(intents, name, True)
+        print(f"  {extension}: {', '.join(required) if required else '(なし)'}")
+    enabled = [name for name, value in intents if value]
+    print(f"  => {', '.join(enabled)}\n")
+    return intents
 
-intents = discord.Intents.all()
+
+intents = build_intents()
 activity = discord.Activity(name="起動中", type=discord.ActivityType.playing)
 
-bot = commands.Bot(command_prefix="/", intents=intents, activity=activity)
+# メンバー・プレゼンスは使わないのでキャッシュしない。メッセージも保持しない
+bot = commands.Bot(
+    command_prefix="/",
+    intents=intents,
+    activity=activity,
+    member_cache_flags=discord.MemberCacheFlags.none(),
+    max_messages=None,
+    chunk_guilds_at_startup=False,
+)
+# 拡張ごとの読み込み時間 (秒)
+bot.extension_load_times = {}
+
+
+# 拡張の読み込みとコマンド同期はプロセスごとに一度だけ行う
+_initialized = False
 
 
 @bot.event
 async def on_ready():
+    global _initialized
     await bot.change_presence(
         activity=discord.Activity(
             name=str(len(bot.guilds)) + "サーバー", type=discord.ActivityType.competing
         )
     )
+    if _initialized:
+        # 再接続時の on_ready。拡張やタスクループを二重に登録しない
+        print("再接続しました")
+        return
+    _initialized = True
+
     try:
+        start = time.perf_counter()
         await bot.load_extension("jishaku")
+        bot.extension_load_times["jishaku"] = time.perf_counter() - start
         print("jishakuを読み込みました\n")
     except Exception as e:
         print(
@@ -52,9 +129,7 @@ async def on_ready():
         )
 
     try:
-        print("スラッシュコマンドを同期中...")
-        synced = await bot.tree.sync()
-        print("スラッシュコマンドを同期しました: ", len(synced))
+        await sync_command_tree()
         print("-----------")
         print("起動しました")
         print("-----------")
@@ -65,8 +140,58 @@ async def on_ready():
         )
 
 
+def command_tree_fingerprint(tree):
+    """コマンドツリーの内容から、登録順に依存しないハッシュを計算する"""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda command: (command.get("type", 1), command["name"]),
+    )
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def load_command_tree_hash():
+    try:
+        with open(COMMAND_TREE_HASH_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def save_command_tree_hash(fingerprint):
+    os.makedirs(os.path.dirname(COMMAND_TREE_HASH_FILE), exist_ok=True)
+    with open(COMMAND_TREE_HASH_FILE, "w", encoding="utf-8") as f:
+        f.write(fingerprint + "\n")
+
+
+async def sync_command_tree():
+    """コマンドツリーが前回の同期から変わっているときだけ同期する"""
+    fingerprint = command_tree_fingerprint(bot.tree)
+    if fingerprint == load_command_tree_hash():
+        print("スラッシュコマンドに変更がないため同期を省略しました\n")
+        return
+    print("スラッシュコマンドを同期中...")
+    synced = await bot.tree.sync()
+    # 同期に成功したときだけ保存し、失敗した場合は次回の起動で再試行する
+    save_command_tree_hash(fingerprint)
+    print("スラッシュコマンドを同期しました: ", len(synced))
+
+
 async def load_extension():
-    for cog in INITIAL_EXTENSIONS:
+    """依存関係のない拡張を並行して読み込み、拡張ごとの所要時間を記録する
+
+    並行して読み込んでも、cog_load の中でブロッキングするとイベントループ全体が
+    止まり、他の拡張の読み込みも待たされる。そのため各 cog は cog_load での
+    ファイルの読み込みなどを asyncio.to_thread や executor でスレッドに逃がす。
+    """
+    started = time.perf_counter()
+    tasks = {}
+
+    async def load(cog):
+        for dependency in EXTENSION_DEPENDENCIES.get(cog, []):
+            if dependency in tasks:
+                await tasks[dependency]
+        start = time.perf_counter()
         try:
             await bot.load_extension(cog)
             print(f"{cog}を読み込みました")
@@ -75,11 +200,38 @@ async def load_extension():
                 f"{cog}の読み込み中にエラーが発生しました: ",
                 "".join(traceback.format_exception(e)),
             )
+        finally:
+            bot.extension_load_times[cog] = time.perf_counter() - start
+
+    for cog in INITIAL_EXTENSIONS:
+        tasks[cog] = asyncio.create_task(load(cog))
+    await asyncio.gather(*tasks.values())
+    print(f"拡張の読み込み時間: {time.perf_counter() - started:.2f}秒")
+
+
+@bot.command(name="load_times")
+@commands.is_owner()
+async def load_times(ctx):
+    """拡張ごとの読み込み時間を表示する"""
+    if not bot.extension_load_times:
+        await ctx.send("読み込み時間の記録がありません")
+        return
+    lines = [
+        f"{seconds * 1000:9.1f} ms  {cog}"
+        for cog, seconds in sorted(
+            bot.extension_load_times.items(), key=lambda item: item[1], reverse=True
+        )
+    ]
+    await ctx.send("```\n" + "\n".join(lines) + "\n```")
 
 
 @bot.tree.error
 async def on_error(interaction, error):
     await discord.app_commands.CommandTree.on_error(bot.tree, interaction, error)
+    command = interaction.command.qualified_name if interaction.command else "unknown"
+    metrics.counter("app_command_errors_total", "スラッシュコマンドのエラー数").inc(
+        command=command
+    )
     err = "".join(traceback.format_exception(error))
     embed = discord.Embed(description=f"```py\n{err}\n```"[:4095])
     if interaction.response.is_done():
@@ -89,3 +241,5 @@ async def on_error(interaction, error):
 
 
 bot.run(token=TOKEN)
+executor.shutdown()
+render_pool.shutdown()
@@ -0,0 +1,95 @@
+"""AJL の順位表の履歴 (AJLSnapshotStore) の動作テスト"""
+
+import datetime
+
+import pytest
+
+from utils.ajl_snapshots import AJLSnapshotStore, RankingRow
+
+PAGE = "https://example.com/ajl/school"
+
+
+def row(key, rank, score=None, school="筑波大学附属中学校"):
+    return RankingRow(key, rank, score, school)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AJLSnapshotStore(str(tmp_path / "db" / "ajl_snapshots.db"))
+
+
+def test_record_only_when_content_changes(store):
+    first, added = store.record(PAGE, "h1", [row("alice", 3)])
+    assert added
+    same, added = store.record(PAGE, "h1", [row("alice", 3)])
+    assert (same, added) == (first, False)
+    second, added = store.record(PAGE, "h2", [row("alice", 2)])
+
+    assert added and second > first
+    assert store.latest(PAGE).id == second
+    assert store.latest_by_page() == {PAGE: (second, "h2")}
+    assert store.has_page(PAGE)
+    assert not store.has_page("https://example.com/other")
+
+
+def test_previous_and_rows(store):
+    first, _ = store.record(PAGE, "h1", [row("alice", 3, 300), row("bob", 5, 100)])
+    second, _ = store.record(PAGE, "h2", [row("alice", 1, 500)])
+
+    assert store.previous(PAGE, second).id == first
+    assert store.previous(PAGE, first) is None
+    assert store.rows(first) == {
+        "alice": row("alice", 3, 300),
+        "bob": row("bob", 5, 100),
+    }
+    assert store.rows(first, ["bob", "carol"]) == {"bob": row("bob", 5, 100)}
+    assert store.rows(first, []) == {}
+
+
+def test_unchanged_content_adds_newly_tracked_rows(store):
+    snapshot_id, _ = store.record(PAGE, "h1", [row("alice", 3)])
+    store.record(PAGE, "h1", [row("alice", 3), row("bob", 5)])
+
+    assert set(store.rows(snapshot_id)) == {"alice", "bob"}
+
+
+def test_previous_rows_are_backfilled(store):
+    """追跡を始めたばかりの行を、変わる前のスナップショットに書き足してから追加する"""
+    first, _ = store.record(PAGE, "h1", [row("alice", 3)])
+    second, _ = store.record(
+        PAGE, "h2", [row("alice", 2), row("bob", 4)], previous=("h1", [row("bob", 6)])
+    )
+    # 最新のスナップショットの内容と違う previous は使わない
+    store.record(PAGE, "h3", [row("bob", 1)], previous=("h1", [row("carol", 9)]))
+
+    assert store.rows(first, ["bob"]) == {"bob": row("bob", 6)}
+    assert "carol" not in store.rows(second)
+
+
+def test_as_of(store):
+    first, _ = store.record(PAGE, "h1", [row("alice", 3)], taken_at="2025-01-01 12:00:00")
+    second, _ = store.record(PAGE, "h2", [row("alice", 2)], taken_at="2025-01-03 12:00:00")
+
+    assert store.as_of(PAGE, datetime.datetime(2024, 12, 31)) is None
+    assert store.as_of(PAGE, datetime.datetime(2025, 1, 1, 12)).id == first
+    assert store.as_of(PAGE, datetime.datetime(2025, 1, 2)).id == first
+    assert store.as_of(PAGE, datetime.datetime(2025, 1, 3, 12)).id == second
+
+
+def test_seen_before(store):
+    store.record(PAGE, "h1", [row("alice", 3)])
+    store.record("https://example.com/other", "h1", [row("bob", 3)])
+    latest, _ = store.record(PAGE, "h2", [row("alice", 2), row("bob", 4)])
+
+    assert store.seen_before(PAGE, latest, ["alice", "bob"]) == {"alice"}
+    assert store.seen_before(PAGE, latest, []) == set()
+
+
+def test_full_rows(tmp_path):
+    store = AJLSnapshotStore(str(tmp_path / "ajl_snapshots.db"), keep_full_rows=True)
+    table = [["順位", "ユーザ"], ["1", "alice"]]
+    with_table, _ = store.record(PAGE, "h1", [row("alice", 1)], full_rows=table)
+    without_table, _ = store.record(PAGE, "h2", [row("alice", 1)])
+
+    assert store.full_rows(with_table) == table
+    assert store.full_rows(without_table) is None
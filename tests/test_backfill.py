@@ -0,0 +1,33 @@
+"""過去の結果の取り込み (parse_contest_ids) の動作テスト"""
+
+import pytest
+
+from utils.backfill import parse_contest_ids
+
+
+def test_ranges_and_single_contests():
+    assert parse_contest_ids("abc350-abc352,arc170") == ["abc350", "abc351", "abc352", "arc170"]
+    assert parse_contest_ids("abc350-352") == ["abc350", "abc351", "abc352"]
+
+
+def test_bare_numbers_expand_for_each_contest_type():
+    assert parse_contest_ids("350-351", contest_types=("abc", "arc")) == [
+        "abc350",
+        "abc351",
+        "arc350",
+        "arc351",
+    ]
+
+
+def test_zero_padding_is_kept():
+    assert parse_contest_ids("abc009-abc010") == ["abc009", "abc010"]
+
+
+def test_spaces_case_and_duplicates():
+    assert parse_contest_ids(" ABC350, abc350-abc351 ,,") == ["abc350", "abc351"]
+
+
+@pytest.mark.parametrize("spec", ["abc350-arc351", "abc", "abc350-", "abc-350"])
+def test_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        parse_contest_ids(spec)
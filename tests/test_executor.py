@@ -0,0 +1,79 @@
+"""共有の実行サービス (ExecutorService) の動作テスト"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.executor import ExecutorService
+
+
+@pytest.fixture
+def service():
+    service = ExecutorService(io_workers=4)
+    yield service
+    service.shutdown()
+
+
+def test_run_io_runs_off_the_loop(service):
+    async def main():
+        return await service.run_io(threading.get_ident)
+
+    assert asyncio.run(main()) != threading.get_ident()
+
+
+def test_serial_key_keeps_call_order(service):
+    """同じキーの処理は、前の処理が遅くても呼び出し順に実行される"""
+    order = []
+
+    def write(name, seconds):
+        time.sleep(seconds)
+        order.append(name)
+
+    async def main():
+        await asyncio.gather(
+            service.run_io(write, "first", 0.05, serial_key="file"),
+            service.run_io(write, "second", 0.0, serial_key="file"),
+            service.run_io(write, "third", 0.0, serial_key="file"),
+        )
+
+    asyncio.run(main())
+
+    assert order == ["first", "second", "third"]
+
+
+def test_serial_key_waits_for_cancelled_work(service):
+    """呼び出し側がキャンセルされても、実行中の処理が終わるまで次の処理は始まらない"""
+    events = []
+
+    def write(name, seconds):
+        events.append(f"{name} start")
+        time.sleep(seconds)
+        events.append(f"{name} end")
+
+    async def main():
+        first = asyncio.ensure_future(service.run_io(write, "first", 0.1, serial_key="file"))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        await service.run_io(write, "second", 0.0, serial_key="file")
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+
+    assert events == ["first start", "first end", "second start", "second end"]
+
+
+def test_exceptions_reach_the_caller(service):
+    def fail():
+        raise ValueError("失敗")
+
+    async def main():
+        with pytest.raises(ValueError):
+            await service.run_io(fail, serial_key="file")
+        # 失敗しても同じキーの次の処理は動く
+        return await service.run_io(lambda: "ok", serial_key="file")
+
+    assert asyncio.run(main()) == "ok"
+    assert service.in_flight == {"io": 0, "cpu": 0}
@@ -0,0 +1,88 @@
+"""ジョブキュー (JobQueue, RetryPolicy) の動作テスト"""
+
+import asyncio
+import datetime
+
+import pytest
+
+from utils.job_queue import TIME_FORMAT, JobQueue, RetryPolicy
+
+
+def test_backoff_doubles_until_max_delay():
+    policy = RetryPolicy(base_delay=10, max_delay=50, jitter=0)
+
+    assert [policy.delay(attempts) for attempts in range(1, 6)] == [10, 20, 40, 50, 50]
+
+
+def test_backoff_jitter_stays_in_range():
+    policy = RetryPolicy(base_delay=100, jitter=0.2)
+
+    delays = [policy.delay(1) for _ in range(200)]
+
+    assert all(80 <= delay <= 120 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_failed_job_is_retried_later(tmp_path):
+    queue = JobQueue(
+        str(tmp_path / "jobs.yaml"),
+        "test",
+        policies={"send": RetryPolicy(base_delay=60, jitter=0)},
+    )
+    job = queue.add("send", "abc350:1", {"channel_id": 1})
+
+    assert queue.due("send") == [job]
+    queue.fail(job, "timeout")
+
+    assert job.attempts == 1
+    assert job.last_error == "timeout"
+    assert queue.due() == []
+    next_run = datetime.datetime.strptime(job.next_run, TIME_FORMAT)
+    assert next_run > datetime.datetime.now() + datetime.timedelta(seconds=55)
+
+
+def test_add_returns_existing_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.yaml"), "test")
+    job = queue.add("send", "abc350:1", {"channel_id": 1})
+
+    assert queue.add("send", "abc350:1", {"channel_id": 2}) is job
+    assert job.payload == {"channel_id": 1}
+
+
+def fail_until_dead(queue, key):
+    job = queue.add("send", key, {})
+    while key in queue:
+        queue.fail(job, f"{key} failed")
+
+
+@pytest.mark.parametrize("max_dead_letters", [0, 1, 3])
+def test_dead_letters_are_capped(tmp_path, max_dead_letters):
+    queue = JobQueue(
+        str(tmp_path / "jobs.yaml"),
+        "test",
+        policies={"send": RetryPolicy(max_attempts=2)},
+        max_dead_letters=max_dead_letters,
+    )
+    for i in range(5):
+        fail_until_dead(queue, f"job{i}")
+
+    expected = [f"job{i}" for i in range(5)][5 - max_dead_letters :] if max_dead_letters else []
+    assert [dead["key"] for dead in queue.dead_letters] == expected
+    assert all(dead["attempts"] == 2 for dead in queue.dead_letters)
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "jobs.yaml")
+    queue = JobQueue(path, "test", policies={"send": RetryPolicy(max_attempts=1)})
+    queue.add("send", "pending", {"channel_id": 1})
+    fail_until_dead(queue, "dead1")
+    fail_until_dead(queue, "dead2")
+    asyncio.run(queue.save())
+
+    # 保存した件数より上限が小さければ、新しいものだけを読み込む
+    loaded = JobQueue(path, "test", max_dead_letters=1)
+    loaded.load()
+
+    assert list(loaded.jobs) == ["pending"]
+    assert loaded.jobs["pending"].payload == {"channel_id": 1}
+    assert [dead["key"] for dead in loaded.dead_letters] == ["dead2"]
@@ -0,0 +1,48 @@
+"""KeywordMatcher の動作テスト"""
+
+from utils.keyword_matcher import KeywordMatcher
+
+
+def naive_find_all(keywords, text):
+    return sorted(
+        (start, keyword)
+        for keyword in keywords
+        for start in range(len(text))
+        if text.startswith(keyword, start)
+    )
+
+
+def test_overlapping_keywords():
+    """重なり合うキーワードや、他のキーワードを含むキーワードもすべて見つける"""
+    keywords = ["he", "she", "his", "hers"]
+    matcher = KeywordMatcher(keywords)
+
+    assert sorted(matcher.find_all("ushers")) == [(1, "she"), (2, "he"), (2, "hers")]
+    assert sorted(matcher.find_all("ahishers")) == naive_find_all(keywords, "ahishers")
+
+
+def test_matches_are_reported_in_text_order():
+    """一致は終わる位置の順に返る"""
+    matcher = KeywordMatcher(["筑波", "筑波大学", "附属"])
+
+    matches = matcher.find_all("筑波大学附属中学校")
+
+    assert matches == [(0, "筑波"), (0, "筑波大学"), (4, "附属")]
+
+
+def test_best_match_prefers_earlier_keyword():
+    """重なっていても、並び順が先のキーワードを優先する"""
+    matcher = KeywordMatcher(["附属", "大学附属", "大学"])
+
+    assert matcher.keywords[matcher.best_match("筑波大学附属")] == "附属"
+    assert matcher.keywords[matcher.best_match("筑波大学")] == "大学"
+    assert matcher.best_match("筑波") is None
+
+
+def test_duplicate_and_empty_keywords_are_dropped():
+    """重複と空文字列は除き、最初に現れた順序を保つ"""
+    matcher = KeywordMatcher(["b", "", "a", "b"])
+
+    assert matcher.keywords == ["b", "a"]
+    assert len(matcher) == 2
+    assert matcher.find_all("") == []
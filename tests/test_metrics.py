@@ -0,0 +1,72 @@
+"""メトリクスの登録先 (MetricsRegistry) の動作テスト"""
+
+import asyncio
+
+import pytest
+
+from utils.metrics import MetricsRegistry, percentile
+
+
+def test_same_name_returns_same_metric():
+    registry = MetricsRegistry()
+    counter = registry.counter("sends_total", "送信数")
+
+    assert registry.counter("sends_total") is counter
+    with pytest.raises(TypeError):
+        registry.gauge("sends_total")
+
+
+def test_counter_keeps_values_per_label():
+    registry = MetricsRegistry()
+    counter = registry.counter("sends_total")
+    counter.inc(result="ok")
+    counter.inc(2, result="ok")
+    counter.inc(result="failed")
+
+    assert counter.get(result="ok") == 3
+    assert counter.get(result="failed") == 1
+    assert counter.get(result="retried") == 0
+
+
+def test_render_prometheus():
+    registry = MetricsRegistry()
+    registry.counter("sends_total", "送信数").inc(channel='a"b')
+    registry.gauge("guilds", "サーバー数").set_function(lambda: 3)
+    timer = registry.timer("tick_seconds")
+    for seconds in (1, 2, 3):
+        timer.observe(seconds)
+
+    lines = registry.render_prometheus().splitlines()
+
+    assert lines[:3] == ["# HELP guilds サーバー数", "# TYPE guilds gauge", "guilds 3"]
+    assert 'sends_total{channel="a\\"b"} 1' in lines
+    assert "# TYPE tick_seconds summary" in lines
+    assert 'tick_seconds{quantile="0.5"} 2' in lines
+    assert "tick_seconds_sum 6.0" in lines
+    assert "tick_seconds_count 3" in lines
+
+
+def test_timed_counts_errors():
+    registry = MetricsRegistry()
+
+    @registry.timed("loop_seconds", loop="reminder")
+    async def tick(fail):
+        if fail:
+            raise RuntimeError("失敗")
+
+    asyncio.run(tick(False))
+    with pytest.raises(RuntimeError):
+        asyncio.run(tick(True))
+
+    summary = registry.timer("loop_seconds").summary()
+    assert summary[(("loop", "reminder"),)]["count"] == 2
+    assert registry.counter("loop_errors_total").get(loop="reminder") == 1
+
+
+def test_percentile():
+    values = [5, 1, 4, 2, 3]
+
+    assert percentile(values, 0) == 1
+    assert percentile(values, 50) == 3
+    assert percentile(values, 100) == 5
+    assert percentile([], 50) == 0.0
@@ -0,0 +1,115 @@
+"""警察ルール (RuleFile, RuleSet, CooldownMap) の動作テスト"""
+
+import os
+
+from utils.police_rules import CooldownMap, RuleFile, parse_rule_set
+
+RULES = """
+default_cooldown: 30
+rules:
+  - id: fuzoku
+    corrections:
+      付属: 附属
+    response: "{keyword}ではなく{correct}です"
+  - id: tsukuba
+    keywords: [筑波]
+    response: "{keyword}!"
+    cooldown: 5
+"""
+
+
+def write_rules(path, text, mtime):
+    path.write_text(text, encoding="utf-8")
+    # 同じ秒のうちに書き直しても更新として扱われるよう、更新時刻を明示する
+    os.utime(path, (mtime, mtime))
+
+
+def test_rule_file_reloads_only_on_change(tmp_path):
+    path = tmp_path / "police_rules.yaml"
+    write_rules(path, RULES, 1000)
+    rule_file = RuleFile(str(path))
+
+    assert rule_file.reload()
+    assert rule_file.rule_set.rule_ids == ["fuzoku", "tsukuba"]
+    # 更新時刻が同じなら読み直さない
+    assert not rule_file.reload()
+    # 保存し直されただけで内容が同じなら組み立て直さない
+    write_rules(path, RULES, 2000)
+    assert not rule_file.reload()
+
+    write_rules(path, RULES.replace("筑波", "つくば"), 3000)
+    assert rule_file.reload()
+    rule, keyword = rule_file.rule_set.match("つくば")
+    assert (rule.id, keyword) == ("tsukuba", "つくば")
+
+
+def test_rule_file_keeps_rules_on_broken_yaml(tmp_path):
+    path = tmp_path / "police_rules.yaml"
+    write_rules(path, RULES, 1000)
+    rule_file = RuleFile(str(path))
+    rule_file.reload()
+
+    write_rules(path, "rules: [", 2000)
+
+    assert not rule_file.reload()
+    assert rule_file.rule_set.rule_ids == ["fuzoku", "tsukuba"]
+
+
+def test_rule_file_without_file(tmp_path):
+    rule_file = RuleFile(str(tmp_path / "missing.yaml"))
+
+    assert not rule_file.reload()
+    assert rule_file.rule_set.match("付属") is None
+
+
+def test_rule_set_match_and_render():
+    rule_set = parse_rule_set(
+        {
+            "default_cooldown": 30,
+            "rules": [
+                {"id": "fuzoku", "corrections": {"付属": "附属"}, "response": "{correct}"},
+                {"id": "tsukuba", "keywords": ["筑波"], "response": "{keyword}", "cooldown": 5},
+                {"id": "empty", "keywords": [], "response": "無視される"},
+            ],
+        }
+    )
+
+    assert rule_set.rule_ids == ["fuzoku", "tsukuba"]
+    assert [rule.cooldown for rule in rule_set.rules] == [30, 5]
+    # 先に書かれたルールを優先する
+    rule, keyword = rule_set.match("筑波大学付属")
+    assert rule.id == "fuzoku"
+    assert rule.render(keyword) == "附属"
+    # 無効にしたルールは飛ばす
+    rule, keyword = rule_set.match("筑波大学付属", disabled_rules=["fuzoku"])
+    assert rule.render(keyword) == "筑波"
+
+
+def test_cooldown_expires_at_boundary():
+    cooldowns = CooldownMap()
+    cooldowns.start("key", 10, now=100)
+
+    assert cooldowns.active("key", now=100)
+    assert cooldowns.active("key", now=109.999)
+    # 期限ちょうどで切れる
+    assert not cooldowns.active("key", now=110)
+    assert len(cooldowns) == 0
+
+
+def test_cooldown_ignores_non_positive_seconds():
+    cooldowns = CooldownMap()
+    cooldowns.start("key", 0, now=100)
+
+    assert not cooldowns.active("key", now=100)
+    assert len(cooldowns) == 0
+
+
+def test_cooldown_purges_expired_keys():
+    cooldowns = CooldownMap(purge_threshold=2)
+    cooldowns.start("a", 1, now=0)
+    cooldowns.start("b", 1, now=0)
+    # 閾値を超えたところで期限切れの a と b を掃除する
+    cooldowns.start("c", 10, now=5)
+
+    assert len(cooldowns) == 1
+    assert cooldowns.active("c", now=5)
@@ -0,0 +1,100 @@
+"""結果キャッシュ (ResultCache) の動作テスト"""
+
+import asyncio
+import os
+import time
+
+from utils.result_cache import ResultArtifact, ResultCache
+
+
+def artifact(contest_id, ratings_final, png=b"png", age=0.0):
+    return ResultArtifact(
+        contest_id, ratings_final, {"contest_id": contest_id}, png, created_at=time.time() - age
+    )
+
+
+def test_pending_results_expire_unless_stale_allowed(tmp_path):
+    async def main():
+        cache = ResultCache(str(tmp_path), pending_ttl=60)
+        await cache.put(artifact("abc350", False, age=120))
+        expired = await cache.get("abc350")
+        stale = await cache.get("abc350", allow_stale=True)
+        # 期限切れでも、読み出しでは消さない
+        stale_again = await cache.get("abc350", allow_stale=True)
+        return expired, stale, stale_again
+
+    expired, stale, stale_again = asyncio.run(main())
+
+    assert expired is None
+    assert stale.png == b"png" and not stale.ratings_final
+    assert stale_again is not None
+
+
+def test_pending_results_survive_restart(tmp_path):
+    """再起動後の送信のやり直しでも、確定前の同じ画像を返す"""
+
+    async def main():
+        await ResultCache(str(tmp_path)).put(artifact("abc350", False, png=b"pending"))
+        return await ResultCache(str(tmp_path)).get("abc350", allow_stale=True)
+
+    restored = asyncio.run(main())
+
+    assert restored.png == b"pending"
+    assert not restored.ratings_final
+
+
+def test_final_result_replaces_pending(tmp_path):
+    async def main():
+        cache = ResultCache(str(tmp_path))
+        await cache.put(artifact("abc350", False, png=b"pending"))
+        await cache.put(artifact("abc350", True, png=b"final"))
+        return await ResultCache(str(tmp_path)).get("abc350", allow_stale=True)
+
+    restored = asyncio.run(main())
+
+    assert restored.png == b"final"
+    assert restored.ratings_final
+    assert sorted(os.listdir(tmp_path)) == ["abc350.json", "abc350.png"]
+
+
+def test_pending_results_are_dropped_after_stale_keep(tmp_path):
+    async def main():
+        cache = ResultCache(str(tmp_path), stale_keep=60)
+        await cache.put(artifact("abc350", False, age=120))
+        return await ResultCache(str(tmp_path), stale_keep=60).get(
+            "abc350", allow_stale=True
+        )
+
+    assert asyncio.run(main()) is None
+
+
+def test_disk_eviction_keeps_recently_used(tmp_path):
+    """メモリから返した結果もファイルの更新時刻が進み、ディスクから消されにくくなる"""
+
+    async def main():
+        cache = ResultCache(str(tmp_path), max_disk_bytes=10**6)
+        for contest_id in ("abc001", "abc002", "abc003"):
+            await cache.put(artifact(contest_id, True, png=b"x" * 1000))
+        # 古い更新時刻にしておき、abc001 だけを使う
+        for name in os.listdir(tmp_path):
+            os.utime(tmp_path / name, (1000, 1000))
+        await cache.get("abc001")
+        # 合計サイズを超えさせて、最近使われていないものを消させる
+        cache.max_disk_bytes = 3000
+        await cache.put(artifact("abc004", True, png=b"x" * 1000))
+
+    asyncio.run(main())
+
+    remaining = {name.split(".")[0] for name in os.listdir(tmp_path)}
+    assert "abc001" in remaining and "abc004" in remaining
+    assert len(remaining) == 2
+
+
+def test_unsafe_contest_ids_stay_in_memory(tmp_path):
+    async def main():
+        cache = ResultCache(str(tmp_path))
+        await cache.put(artifact("../abc350", True))
+        return await cache.get("../abc350")
+
+    assert asyncio.run(main()) is not None
+    assert not tmp_path.exists() or os.listdir(tmp_path) == []
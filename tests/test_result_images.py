@@ -0,0 +1,32 @@
+"""結果画像の保存 (save_result_image) の動作テスト"""
+
+import pytest
+
+# cogs.result はスプレッドシートとPDF変換のライブラリを読み込む
+pytest.importorskip("gspread")
+pytest.importorskip("pdf2image")
+
+from cogs.result import save_result_image  # noqa: E402
+
+
+def test_save_result_image_never_overwrites(tmp_path):
+    """同じコンテストの画像を続けて保存しても、別のファイルになる"""
+    first = save_result_image(str(tmp_path), "abc350", b"first")
+    second = save_result_image(str(tmp_path), "abc350", b"second")
+
+    assert first != second
+    with open(first, "rb") as f:
+        assert f.read() == b"first"
+    with open(second, "rb") as f:
+        assert f.read() == b"second"
+    # 書きかけの一時ファイルは残らない
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == [".png", ".png"]
+
+
+def test_save_result_image_creates_directory(tmp_path):
+    output_dir = tmp_path / "images"
+
+    path = save_result_image(str(output_dir), "abc350", b"png")
+
+    assert output_dir.is_dir()
+    assert path.startswith(str(output_dir))
@@ -0,0 +1,103 @@
+"""結果のデータベース (ResultStore) の動作テスト"""
+
+import sqlite3
+
+import pytest
+
+from utils.result_store import ResultStore
+
+
+def record(user_name, club_rank, performance, tasks=None):
+    return {
+        "user_name": user_name,
+        "club_rank": club_rank,
+        "rank": club_rank * 100,
+        "score": 1000.0 - club_rank * 100,
+        "performance": performance,
+        "old_rating": None,
+        "new_rating": None,
+        "tasks": tasks or {},
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "db" / "results.db"))
+
+
+def test_record_contest_replaces_previous_rows(store):
+    store.record_contest(
+        "abc350",
+        [record("alice", 1, 1200, {"abc350_a": (1.0, 0, 0)}), record("bob", 2, 800)],
+        is_rated=True,
+        ratings_final=False,
+    )
+    store.record_contest(
+        "abc350", [record("alice", 1, 1300)], is_rated=True, ratings_final=True
+    )
+
+    connection = sqlite3.connect(store.path)
+    try:
+        assert connection.execute(
+            "SELECT user_name, performance FROM results"
+        ).fetchall() == [("alice", 1300)]
+        assert connection.execute("SELECT COUNT(*) FROM task_results").fetchone() == (0,)
+        assert connection.execute(
+            "SELECT ratings_final FROM contests WHERE contest_id = 'abc350'"
+        ).fetchone() == (1,)
+    finally:
+        connection.close()
+
+
+def test_member_history_is_oldest_first(store):
+    for contest_id, held_at, performance in [
+        ("abc352", "2024-05-04 21:00:00", 1300),
+        ("abc350", "2024-04-20 21:00:00", 1100),
+        ("abc351", "2024-04-27 21:00:00", 1200),
+    ]:
+        store.record_contest(
+            contest_id, [record("alice", 1, performance)], True, True, held_at=held_at
+        )
+
+    history = store.member_history("alice", limit=2)
+
+    assert history["contest_id"].tolist() == ["abc351", "abc352"]
+    assert history["performance"].tolist() == [1200, 1300]
+    assert store.member_history("carol", limit=2).empty
+
+
+def test_held_at_is_kept_when_re_recorded_without_it(store):
+    store.record_contest(
+        "abc350", [record("alice", 1, 1100)], True, False, held_at="2024-04-20 21:00:00"
+    )
+    store.record_contest(
+        "abc351", [record("alice", 1, 1200)], True, True, held_at="2024-04-27 21:00:00"
+    )
+    # レート確定後の記録し直しでは開催日時を渡さない
+    store.record_contest("abc350", [record("alice", 1, 1150)], True, True)
+
+    history = store.member_history("alice", limit=5)
+
+    assert history["contest_id"].tolist() == ["abc350", "abc351"]
+
+
+def test_club_performance(store):
+    store.record_contest(
+        "abc350",
+        [record("alice", 1, 1200), record("bob", 2, 800), record("carol", 3, None)],
+        True,
+        True,
+        held_at="2024-04-20 21:00:00",
+    )
+    store.record_contest(
+        "abc351", [record("alice", 1, 1000)], True, True, held_at="2024-04-27 21:00:00"
+    )
+
+    summary = store.club_performance(limit=5)
+
+    assert summary["contest_id"].tolist() == ["abc350", "abc351"]
+    assert summary["participants"].tolist() == [3, 1]
+    # パフォーマンスのない部員は平均に含めない
+    assert summary["mean_performance"].tolist() == [1000, 1000]
+    assert summary["max_performance"].tolist() == [1200, 1000]
+    assert store.club_performance(limit=1)["contest_id"].tolist() == ["abc351"]
@@ -0,0 +1,107 @@
+"""コンテスト結果の表 (ResultTable) の動作テスト"""
+
+import math
+
+import numpy as np
+
+from utils.result_table import (
+    BAND_COLORS,
+    ResultTable,
+    color_bands,
+    contest_tasks,
+    rating_to_color,
+    true_performance,
+)
+
+TASKS = contest_tasks("abc350")[:2]
+
+
+def test_color_band_edges():
+    """帯の境目のレートは上の帯に入る"""
+    ratings = [0, 399, 400, 799, 800, 1199, 1200, 1599, 1600, 1999, 2000, 2399, 2400, 2799, 2800]
+
+    assert color_bands(ratings).tolist() == [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 7]
+    assert color_bands([np.nan, -100, 4000]).tolist() == [-1, 0, 7]
+    assert rating_to_color(1599) == BAND_COLORS[3]
+    assert rating_to_color(1600) == BAND_COLORS[4]
+
+
+def test_true_performance():
+    performance = np.array([np.nan, 0, 400, 401, 1500])
+
+    corrected = true_performance(performance, is_rated=True)
+
+    assert math.isnan(corrected[0])
+    assert corrected[1:].tolist() == [round(400 / math.e), 400, 401, 1500]
+    # レート対象外のコンテストでは補正しない
+    assert true_performance(performance, is_rated=False)[1] == 0
+
+
+def standings():
+    return {
+        "IsRated": True,
+        "StandingsData": [
+            {
+                "UserScreenName": "alice",
+                "Affiliation": "筑波大学附属中学校 電子電脳技術研究会",
+                "Rank": 12,
+                "TotalResult": {"Score": 30000},
+                "TaskResults": {
+                    "abc350_a": {"Score": 10000, "Penalty": 0, "Failure": 0},
+                    "abc350_b": {"Score": 20000, "Penalty": 2, "Failure": 1},
+                },
+            },
+            {
+                "UserScreenName": "outsider",
+                "Affiliation": "other",
+                "Rank": 1,
+                "TotalResult": {"Score": 30000},
+                "TaskResults": {},
+            },
+            {
+                "UserScreenName": "bob",
+                "Affiliation": "電子電脳技術研究会",
+                "Rank": 345,
+                "TotalResult": {"Score": 0},
+                "TaskResults": {"abc350_a": {"Score": 0, "Penalty": 1, "Failure": 2}},
+            },
+        ],
+    }
+
+
+def test_from_standings_and_rows():
+    table = ResultTable.from_standings(
+        "abc350",
+        standings(),
+        TASKS,
+        "電子電脳技術研究会",
+        {"alice": (1650, 1500, 1580), "bob": (200, 100, 90)},
+    )
+
+    assert table.user_names == ["alice", "bob"]
+    assert table.rows() == [
+        ["1 (12)", "alice", 300.0, "100", "200 (2)", 1650, "1500 → 1580 (80)"],
+        ["2 (345)", "bob", 0.0, "(3)", "-", round(400 / math.exp(0.5)), "100 → 90 (-10)"],
+    ]
+    assert table.rating_colors() == [BAND_COLORS[3], BAND_COLORS[0]]
+    assert table.performance_colors() == [BAND_COLORS[4], BAND_COLORS[0]]
+
+
+def test_missing_performance():
+    table = ResultTable.from_standings("abc350", standings(), TASKS, "電子電脳技術研究会")
+
+    assert table.rows()[0][-2:] == ["-", "-"]
+    assert table.rating_colors() == [None, None]
+    assert table.records()[0]["performance"] is None
+
+
+def test_to_dict_round_trip():
+    table = ResultTable.from_standings(
+        "abc350", standings(), TASKS, "電子電脳技術研究会", {"alice": (1650, 1500, 1580)}
+    )
+
+    restored = ResultTable.from_dict(table.to_dict())
+
+    assert restored.rows() == table.rows()
+    assert restored.records() == table.records()
+    assert restored.records()[1]["tasks"] == {"abc350_a": (0.0, 1, 2)}
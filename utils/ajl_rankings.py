@@ -0,0 +1,140 @@
+from io import StringIO
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from utils.ajl_snapshots import RankingRow
+
+SCHOOL_RANKING_URL = (
+    "https://img.atcoder.jp/ajl{year}{season}/school_rankings_grades_1to3_{contest_type}.html"
+)
+GRADE_RANKING_URL = (
+    "https://img.atcoder.jp/ajl{year}{season}/grade_{grade}_rankings_{contest_type}_score.html"
+)
+CONTEST_TYPES = {"A": "アルゴリズム", "H": "ヒューリスティック"}
+# 学校の追跡を設定していないサーバーで使う学校
+DEFAULT_SCHOOL = "筑波大学附属中学校"
+
+SCHOOL_COLUMN = "学校名"
+USER_COLUMN = "ユーザID"
+RANK_COLUMN = "順位"
+SCORE_COLUMN = "スコア"
+
+
+def season_suffix(season: str) -> str:
+    return "winter" if season == "WINTER" else "summer"
+
+
+def grades(season: str) -> List[int]:
+    """順位表がある学年 (冬季は中3を除く)"""
+    return [1, 2] if season == "WINTER" else [1, 2, 3]
+
+
+def school_ranking_url(year: str, season: str, contest_type: str) -> str:
+    return SCHOOL_RANKING_URL.format(
+        year=year, season=season_suffix(season), contest_type=contest_type
+    )
+
+
+def grade_ranking_url(year: str, season: str, contest_type: str, grade: int) -> str:
+    return GRADE_RANKING_URL.format(
+        year=year, season=season_suffix(season), contest_type=contest_type, grade=grade
+    )
+
+
+def read_ranking_table(html):
+    """ランキングページのHTMLから表を読み込む (プロセスプールでも実行できる)"""
+    return pd.read_html(StringIO(html), encoding="utf-8")[0]
+
+
+class RankingPage:
+    """パース済みの AJL の順位表と、学校名・ユーザIDから行の位置を引く索引
+
+    学校別の順位表 (ユーザIDの列がない) では行の key は学校名、
+    学年別の順位表では key はユーザIDになる。
+    """
+
+    def __init__(self, url: str, df: pd.DataFrame, content_hash: str):
+        # 途中に挟まる見出しの行を除き、行の位置で前後を引けるようにする
+        df = df[df[SCHOOL_COLUMN] != SCHOOL_COLUMN].reset_index(drop=True)
+        self.url = url
+        self.df = df
+        self.content_hash = content_hash
+        self.is_student_page = USER_COLUMN in df.columns
+        self.schools: Dict[str, List[int]] = {
+            school: positions.tolist()
+            for school, positions in df.groupby(SCHOOL_COLUMN, sort=False).indices.items()
+        }
+        self.users: Dict[str, int] = (
+            {user_id: i for i, user_id in enumerate(df[USER_COLUMN])}
+            if self.is_student_page
+            else {}
+        )
+        # スナップショットとして記録したときに AJLData が設定する
+        self.snapshot_id: Optional[int] = None
+        self.fetched_at = 0.0
+        self.fetched_bytes = 0
+
+    @classmethod
+    def parse(cls, url: str, html: str, content_hash: str) -> "RankingPage":
+        """HTMLを読み込んで索引を作る (プロセスプールでも実行できる)"""
+        return cls(url, read_ranking_table(html), content_hash)
+
+    def row(self, position: int) -> RankingRow:
+        record = self.df.iloc[position]
+        school = record[SCHOOL_COLUMN]
+        return RankingRow(
+            record[USER_COLUMN] if self.is_student_page else school,
+            int(record[RANK_COLUMN]),
+            int(record[SCORE_COLUMN]),
+            school,
+        )
+
+    def position(self, key: str) -> Optional[int]:
+        """key の行の位置 (学校別の順位表では、その学校の最初の行)"""
+        if self.is_student_page:
+            return self.users.get(key)
+        positions = self.schools.get(key)
+        return positions[0] if positions else None
+
+    def above(self, position: int) -> Optional[pd.Series]:
+        """1つ上の行 (先頭なら None)"""
+        return self.df.iloc[position - 1] if position > 0 else None
+
+    def tracked_positions(
+        self, schools: Iterable[str], users: Iterable[str] = ()
+    ) -> List[int]:
+        """schools の行と users の行の位置を、順位表の順に返す"""
+        positions = set()
+        for school in schools:
+            positions.update(self.schools.get(school, ()))
+        for user_id in users:
+            if user_id in self.users:
+                positions.add(self.users[user_id])
+        return sorted(positions)
+
+    def tracked_rows(
+        self, schools: Iterable[str], users: Iterable[str] = ()
+    ) -> List[RankingRow]:
+        return [self.row(position) for position in self.tracked_positions(schools, users)]
+
+
+class AJLUpdate:
+    """AJLData が順位表を一巡取得するたびに ajl_update イベントで送る内容"""
+
+    def __init__(
+        self, pages: Dict[str, RankingPage], settings: Dict[str, Any], changed: Set[str]
+    ):
+        # 取得に成功したページ (失敗したページは含まない)
+        self.pages = pages
+        # 取得時に読み込んだ bot_settings.json (各 cog はこれで通知先を決める)
+        self.settings = settings
+        # 前回の ajl_update のあとに新しいスナップショットが記録されたページ
+        self.changed = changed
+
+    @property
+    def fetched_bytes(self) -> int:
+        return sum(page.fetched_bytes for page in self.pages.values())
+
+    def any_changed(self, urls: Iterable[str]) -> bool:
+        return any(url in self.changed for url in urls)
@@ -0,0 +1,244 @@
+import datetime
+import json
+import os
+import sqlite3
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    page TEXT NOT NULL,
+    taken_at TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    full_rows BLOB
+);
+CREATE INDEX IF NOT EXISTS snapshots_page ON snapshots (page, id);
+CREATE INDEX IF NOT EXISTS snapshots_page_time ON snapshots (page, taken_at);
+CREATE TABLE IF NOT EXISTS snapshot_rows (
+    snapshot_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    score INTEGER,
+    school TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, key)
+);
+CREATE INDEX IF NOT EXISTS snapshot_rows_key ON snapshot_rows (key, snapshot_id);
+"""
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class RankingRow(NamedTuple):
+    """順位表の1行。key は学校別の表なら学校名、個人の表ならユーザID"""
+
+    key: str
+    rank: int
+    score: Optional[int]
+    school: str
+
+
+def table_to_rows(df) -> List[list]:
+    """順位表の DataFrame を、見出しを先頭にした文字列のリストにする (表全体の保存用)"""
+    return [[str(column) for column in df.columns]] + df.astype(str).values.tolist()
+
+
+class Snapshot(NamedTuple):
+    id: int
+    page: str
+    taken_at: str
+
+
+class AJLSnapshotStore:
+    """AJL の順位表を取得するたびに追記していく SQLite のデータベース
+
+    ページ (URL) ごとに、内容が変わったときだけスナップショットを追加する。
+    各スナップショットには通知に使う行 (対象の学校とその生徒) だけを保存し、
+    keep_full_rows=True なら表全体も圧縮して残す。任意の過去のスナップショットとの
+    差分は (snapshot_id, key) の索引で引く。メソッドはブロッキングするので、
+    executor.run_io から呼ぶこと (書き込みは serial_key=path で直列にする)。
+    """
+
+    def __init__(self, path: str, keep_full_rows: bool = False):
+        self.path = path
+        self.keep_full_rows = keep_full_rows
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        if not self._initialized:
+            connection.executescript(SCHEMA)
+            self._initialized = True
+        return connection
+
+    def record(
+        self,
+        page: str,
+        content_hash: str,
+        rows: Iterable[RankingRow],
+        full_rows: Optional[List[list]] = None,
+        taken_at: Optional[str] = None,
+        previous: Optional[Tuple[str, Iterable[RankingRow]]] = None,
+    ) -> Tuple[int, bool]:
+        """スナップショットを追加し、(スナップショットのID, 追加したか) を返す
+
+        最新のスナップショットと内容 (content_hash) が同じなら追加せず、そのIDを返す。
+        そのとき rows のうち最新のスナップショットにない行だけを書き足す。
+        previous には変わる前の内容の (content_hash, 行) を渡す。最新のスナップショットが
+        その内容なら、追跡を始めたばかりでまだ記録していない行をそこに書き足してから追加する。
+        """
+        connection = self._connect()
+        try:
+            with connection:
+                latest = connection.execute(
+                    "SELECT id, content_hash FROM snapshots WHERE page = ?"
+                    " ORDER BY id DESC LIMIT 1",
+                    (page,),
+                ).fetchone()
+                if latest is not None and latest[1] == content_hash:
+                    # 追跡を始めたばかりの行は、最新のスナップショットに足しておく
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO snapshot_rows VALUES (?, ?, ?, ?, ?)",
+                        [(latest[0], *row) for row in rows],
+                    )
+                    return latest[0], False
+                if latest is not None and previous is not None and latest[1] == previous[0]:
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO snapshot_rows VALUES (?, ?, ?, ?, ?)",
+                        [(latest[0], *row) for row in previous[1]],
+                    )
+                blob = None
+                if self.keep_full_rows and full_rows is not None:
+                    blob = zlib.compress(
+                        json.dumps(full_rows, ensure_ascii=False).encode("utf-8")
+                    )
+                cursor = connection.execute(
+                    "INSERT INTO snapshots (page, taken_at, content_hash, full_rows)"
+                    " VALUES (?, ?, ?, ?)",
+                    (
+                        page,
+                        taken_at or datetime.datetime.now().strftime(TIME_FORMAT),
+                        content_hash,
+                        blob,
+                    ),
+                )
+                snapshot_id = cursor.lastrowid
+                connection.executemany(
+                    "INSERT OR REPLACE INTO snapshot_rows VALUES (?, ?, ?, ?, ?)",
+                    [(snapshot_id, *row) for row in rows],
+                )
+                return snapshot_id, True
+        finally:
+            connection.close()
+
+    def has_page(self, page: str) -> bool:
+        connection = self._connect()
+        try:
+            return (
+                connection.execute(
+                    "SELECT 1 FROM snapshots WHERE page = ? LIMIT 1", (page,)
+                ).fetchone()
+                is not None
+            )
+        finally:
+            connection.close()
+
+    def latest_by_page(self) -> Dict[str, Tuple[int, str]]:
+        """ページごとの最新のスナップショットの (ID, content_hash)"""
+        connection = self._connect()
+        try:
+            return {
+                page: (snapshot_id, content_hash)
+                for snapshot_id, page, content_hash in connection.execute(
+                    "SELECT id, page, content_hash FROM snapshots WHERE id IN"
+                    " (SELECT MAX(id) FROM snapshots GROUP BY page)"
+                )
+            }
+        finally:
+            connection.close()
+
+    def latest(self, page: str) -> Optional[Snapshot]:
+        """ページの最新のスナップショット"""
+        return self._snapshot(
+            "SELECT id, page, taken_at FROM snapshots WHERE page = ?"
+            " ORDER BY id DESC LIMIT 1",
+            (page,),
+        )
+
+    def previous(self, page: str, snapshot_id: int) -> Optional[Snapshot]:
+        """snapshot_id の1つ前のスナップショット (内容が変わる前の順位表)"""
+        return self._snapshot(
+            "SELECT id, page, taken_at FROM snapshots WHERE page = ? AND id < ?"
+            " ORDER BY id DESC LIMIT 1",
+            (page, snapshot_id),
+        )
+
+    def as_of(self, page: str, when: datetime.datetime) -> Optional[Snapshot]:
+        """when の時点で最新だったスナップショット"""
+        return self._snapshot(
+            "SELECT id, page, taken_at FROM snapshots WHERE page = ? AND taken_at <= ?"
+            " ORDER BY taken_at DESC, id DESC LIMIT 1",
+            (page, when.strftime(TIME_FORMAT)),
+        )
+
+    def _snapshot(self, query: str, params: tuple) -> Optional[Snapshot]:
+        connection = self._connect()
+        try:
+            row = connection.execute(query, params).fetchone()
+        finally:
+            connection.close()
+        return Snapshot(*row) if row else None
+
+    def rows(
+        self, snapshot_id: int, keys: Optional[Sequence[str]] = None
+    ) -> Dict[str, RankingRow]:
+        """スナップショットの行を key ごとに返す (keys を指定するとその行だけ)"""
+        query = "SELECT key, rank, score, school FROM snapshot_rows WHERE snapshot_id = ?"
+        params: list = [snapshot_id]
+        if keys is not None:
+            if not keys:
+                return {}
+            query += f" AND key IN ({', '.join('?' * len(keys))})"
+            params.extend(keys)
+        connection = self._connect()
+        try:
+            return {
+                row[0]: RankingRow(*row) for row in connection.execute(query, params)
+            }
+        finally:
+            connection.close()
+
+    def seen_before(self, page: str, snapshot_id: int, keys: Sequence[str]) -> Set[str]:
+        """keys のうち、snapshot_id より前のスナップショットに載っていたもの"""
+        if not keys:
+            return set()
+        connection = self._connect()
+        try:
+            return {
+                row[0]
+                for row in connection.execute(
+                    "SELECT DISTINCT r.key FROM snapshot_rows r"
+                    " JOIN snapshots s ON s.id = r.snapshot_id"
+                    f" WHERE s.page = ? AND s.id < ? AND r.key IN ({', '.join('?' * len(keys))})",
+                    [page, snapshot_id, *keys],
+                )
+            }
+        finally:
+            connection.close()
+
+    def full_rows(self, snapshot_id: int) -> Optional[List[list]]:
+        """表全体を保存していればそれを返す"""
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT full_rows FROM snapshots WHERE id = ?", (snapshot_id,)
+            ).fetchone()
+        finally:
+            connection.close()
+        if not row or row[0] is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
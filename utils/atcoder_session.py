@@ -0,0 +1,61 @@
+import re
+import urllib.parse
+from time import sleep
+
+import requests
+
+from utils.metrics import requests_hook
+
+
+def login(username, password):
+    """AtCoder にログインし、セッションを返す (失敗したら None)"""
+    try:
+        login_url = "https://atcoder.jp/login"
+        session = requests.session()
+        session.hooks["response"].append(requests_hook)
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+        }  # User-Agent を追加
+        res = session.get(login_url, headers=headers)  # headers を追加
+        res.raise_for_status()  # HTTPエラーをチェック
+        revel_session = res.cookies.get_dict().get("REVEL_SESSION")
+
+        if not revel_session:
+            raise ValueError("REVEL_SESSION cookie not found")
+
+        revel_session = urllib.parse.unquote(revel_session)
+        csrf_token_match = re.search(r"csrf_token\:(.*)_TS", revel_session)
+        if not csrf_token_match:
+            raise ValueError("csrf_token not found in REVEL_SESSION")
+
+        csrf_token = csrf_token_match.groups()[0].replace("\x00\x00", "")
+        sleep(1)
+        headers = {
+            "content-type": "application/x-www-form-urlencoded",
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+        }  # content-type と User-Agent を設定
+        params = {
+            "username": username,
+            "password": password,
+            "csrf_token": csrf_token,
+        }  # params に username, password, csrf_token を設定
+        data = {
+            "continue": "https://atcoder.jp:443/home"
+        }  # data に continue を設定
+        res = session.post(
+            login_url, params=params, data=data, headers=headers
+        )  # params, data, headers を設定
+        res.raise_for_status()  # HTTPエラーをチェック
+        return session
+    except requests.HTTPError as e:  # HTTPError をキャッチ
+        print(f"AtCoderログイン中にHTTPエラーが発生しました: {e}")
+        if e.response is not None:
+            print(f"レスポンスステータスコード: {e.response.status_code}")
+            print(f"レスポンスヘッダー: {e.response.headers}")
+            print(
+                f"レスポンス内容: {e.response.content.decode('utf-8', errors='ignore')}"
+            )  # レスポンス内容を出力 (decodeとerrors='ignore'を追加)
+        return None
+    except Exception as e:
+        print(f"AtCoderログイン中にエラーが発生しました: {e}")
+        return None
@@ -0,0 +1,273 @@
+import asyncio
+import datetime
+import os
+import re
+import time
+import urllib.parse
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import requests
+import yaml
+
+from utils.executor import executor
+from utils.metrics import metrics, requests_hook
+from utils.result_store import ResultStore
+from utils.result_table import (
+    CLUB_AFFILIATION,
+    PERFORMANCE_URL,
+    ResultTable,
+    contest_tasks,
+    parse_performance,
+)
+
+BACKFILL_STATE_FILE = "asset/backfill_state.yaml"
+STANDINGS_URL = "https://atcoder.jp/contests/{contest_id}/standings/json"
+# コンテストの開催日時の一覧 (結果データベースでの並び順に使う)
+CONTEST_INFO_URL = "https://kenkoooo.com/atcoder/resources/contests.json"
+# ホストごとの1秒あたりのリクエスト数の上限
+HOST_RATES = {
+    "atcoder.jp": 1.0,
+    "raw.githubusercontent.com": 5.0,
+    "kenkoooo.com": 1.0,
+}
+DEFAULT_CONCURRENCY = 4
+JST = datetime.timezone(datetime.timedelta(hours=9))
+
+_RANGE = re.compile(r"([a-z]*)(\d+)(?:-([a-z]*)(\d+))?")
+
+
+def parse_contest_ids(spec: str, contest_types: Iterable[str] = ("abc",)) -> List[str]:
+    """"abc350-abc360,arc170" のような指定をコンテストIDの一覧にする
+
+    種類を省略した番号 ("350-360") は contest_types のそれぞれについて展開する。
+    """
+    contest_ids: List[str] = []
+    for item in spec.replace(" ", "").lower().split(","):
+        if not item:
+            continue
+        match = _RANGE.fullmatch(item)
+        if not match:
+            raise ValueError(f"コンテストの指定が読み取れません: {item}")
+        prefix, first, end_prefix, last = match.groups()
+        if end_prefix and prefix and end_prefix != prefix:
+            raise ValueError(f"範囲の前後でコンテストの種類が違います: {item}")
+        prefixes = [prefix or end_prefix] if prefix or end_prefix else list(contest_types)
+        numbers = range(int(first), int(last or first) + 1)
+        width = len(first)
+        for contest_type in prefixes:
+            for number in numbers:
+                contest_id = f"{contest_type}{number:0{width}d}"
+                if contest_id not in contest_ids:
+                    contest_ids.append(contest_id)
+    return contest_ids
+
+
+class HostRateLimiter:
+    """ホストごとにリクエストの開始間隔を一定以上に保つ"""
+
+    def __init__(self, rates: Dict[str, float], default_rate: float = 1.0):
+        self.rates = rates
+        self.default_rate = default_rate
+        self._next_slot: Dict[str, float] = {}
+
+    async def acquire(self, url: str):
+        host = urllib.parse.urlsplit(url).hostname or ""
+        rate = self.rates.get(host, self.default_rate)
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot.get(host, 0.0))
+        self._next_slot[host] = slot + 1 / rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class BackfillProgress:
+    """バックフィルの進み具合"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        # 前回までに終わっていたもの
+        self.skipped = 0
+        self.failed: Dict[str, str] = {}
+        self.started = time.monotonic()
+
+    @property
+    def finished(self) -> int:
+        return self.done + len(self.failed)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+class Backfill:
+    """過去のコンテストの順位表とパフォーマンスを取得し、結果データベースに記録する
+
+    1つの AtCoder のセッションを使い回し、ホストごとのレート制限を守りながら
+    複数のコンテストを並行して取得する。終わったコンテストは状態ファイルに記録し、
+    同じ指定で実行し直すと、中断したところから再開する。
+    """
+
+    def __init__(
+        self,
+        store: ResultStore,
+        login: Callable[[], Optional[requests.Session]],
+        state_file: str = BACKFILL_STATE_FILE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rates: Optional[Dict[str, float]] = None,
+    ):
+        self.store = store
+        self.login = login
+        self.state_file = state_file
+        self.concurrency = concurrency
+        self.limiter = HostRateLimiter(HOST_RATES if rates is None else rates)
+        self._session: Optional[requests.Session] = None
+        self._contests = metrics.counter(
+            "backfill_contests_total", "バックフィルで処理したコンテスト数"
+        )
+
+    def load_state(self) -> Dict[str, Any]:
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = yaml.safe_load(f)
+                if state is not None:
+                    return state
+        return {}
+
+    def _save_state(self, state: Dict[str, Any]):
+        with open(self.state_file, "w", encoding="utf-8") as f:
+            yaml.dump(
+                state, f, allow_unicode=True, default_flow_style=False, sort_keys=False
+            )
+
+    async def save_state(self, state: Dict[str, Any]):
+        snapshot = {
+            "contest_ids": list(state["contest_ids"]),
+            "done": list(state["done"]),
+            "failed": dict(state["failed"]),
+            "started_at": state["started_at"],
+        }
+        await executor.run_io(self._save_state, snapshot, serial_key=self.state_file)
+
+    async def _get(self, url: str, session=None) -> requests.Response:
+        await self.limiter.acquire(url)
+        get = session.get if session is not None else requests.get
+        return await executor.run_io(
+            get, url, hooks={"response": requests_hook}, timeout=30
+        )
+
+    async def fetch_held_at(self) -> Dict[str, str]:
+        """コンテストIDごとの終了日時 (日本時間) を返す。取得できなければ空"""
+        try:
+            response = await self._get(CONTEST_INFO_URL)
+            response.raise_for_status()
+            contests = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"コンテストの開催日時の取得に失敗しました: {e}")
+            return {}
+        held_at = {}
+        for contest in contests:
+            try:
+                end = contest["start_epoch_second"] + contest["duration_second"]
+                contest_id = contest["id"]
+            except (KeyError, TypeError):
+                continue
+            held_at[contest_id] = datetime.datetime.fromtimestamp(end, JST).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+        return held_at
+
+    async def backfill_contest(self, contest_id: str, held_at: Optional[str]):
+        """1つのコンテストの結果を取得して記録する"""
+        standings, performance = await asyncio.gather(
+            self._get(STANDINGS_URL.format(contest_id=contest_id), self._session),
+            self._get(PERFORMANCE_URL.format(contest_id=contest_id)),
+        )
+        standings.raise_for_status()
+        # パフォーマンスのファイルがないのは Unrated かレート更新前
+        performance_data = (
+            parse_performance(performance.json()) if performance.status_code == 200 else {}
+        )
+        table = await executor.run_cpu(
+            ResultTable.from_standings,
+            contest_id,
+            standings.json(),
+            contest_tasks(contest_id),
+            CLUB_AFFILIATION,
+            performance_data,
+        )
+        await executor.run_io(
+            self.store.record_contest,
+            contest_id,
+            table.records(),
+            table.is_rated,
+            bool(performance_data) or not table.is_rated,
+            held_at,
+            serial_key=self.store.path,
+        )
+
+    async def run(
+        self,
+        contest_ids: List[str],
+        progress: Optional[Callable[[BackfillProgress, str, bool], Any]] = None,
+        restart: bool = False,
+    ) -> BackfillProgress:
+        """contest_ids の結果を記録する。前回と同じ指定なら終わったものは飛ばす
+
+        progress(進捗, コンテストID, 成功したか) はコンテストが1つ終わるたびに呼ばれる
+        (コルーチン関数でもよい)。
+        """
+        state = await executor.run_io(self.load_state)
+        if restart or state.get("contest_ids") != contest_ids:
+            state = {
+                "contest_ids": contest_ids,
+                "done": [],
+                "failed": {},
+                "started_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        done = set(state["done"])
+        state["failed"] = {}
+        pending = [contest_id for contest_id in contest_ids if contest_id not in done]
+        result = BackfillProgress(len(contest_ids))
+        result.skipped = result.done = len(contest_ids) - len(pending)
+        if done:
+            print(f"前回の続きから再開します ({len(done)}件は記録済み)")
+        if not pending:
+            return result
+
+        self._session = await executor.run_io(self.login)
+        if self._session is None:
+            raise RuntimeError("AtCoder へのログインに失敗しました")
+        held_at = await self.fetch_held_at()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(contest_id: str):
+            async with semaphore:
+                try:
+                    await self.backfill_contest(contest_id, held_at.get(contest_id))
+                    ok = True
+                except Exception as e:
+                    ok = False
+                    result.failed[contest_id] = state["failed"][contest_id] = str(e)
+                    print(f"バックフィルに失敗しました ({contest_id}): {e}")
+            if ok:
+                result.done += 1
+                state["done"].append(contest_id)
+            self._contests.inc(result="ok" if ok else "failed")
+            await self.save_state(state)
+            if progress is not None:
+                returned = progress(result, contest_id, ok)
+                if asyncio.iscoroutine(returned):
+                    await returned
+
+        try:
+            await asyncio.gather(*(run_one(contest_id) for contest_id in pending))
+        finally:
+            self._session.close()
+            self._session = None
+        print(
+            f"バックフィル完了: {result.done}/{result.total}件 "
+            f"(失敗{len(result.failed)}件, {result.elapsed:.1f}秒)"
+        )
+        return result
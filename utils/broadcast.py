@@ -0,0 +1,197 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import discord
+
+from utils.metrics import metrics, percentile
+
+# Discordのグローバルレート制限 (50リクエスト/秒) に余裕を持たせた値
+DEFAULT_GLOBAL_RATE = 40
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_MAX_RETRIES = 3
+
+
+class Delivery:
+    """1つのチャンネルへの送信ジョブ"""
+
+    def __init__(
+        self,
+        channel: discord.abc.Messageable,
+        send: Callable[[], Awaitable[Any]],
+        label: str = "",
+        context: Any = None,
+    ):
+        self.channel = channel
+        self.send = send
+        self.label = label
+        # 呼び出し元が結果と紐付けたい任意のデータ
+        self.context = context
+
+
+class DeliveryResult:
+    """送信ジョブの結果"""
+
+    def __init__(
+        self,
+        delivery: Delivery,
+        ok: bool,
+        value: Any = None,
+        error: Optional[BaseException] = None,
+        latency: float = 0.0,
+    ):
+        self.delivery = delivery
+        self.ok = ok
+        self.value = value
+        self.error = error
+        self.latency = latency
+
+
+class _RateLimiter:
+    """リクエスト開始間隔を一定以上に保つ簡易リミッター"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class Broadcaster:
+    """複数チャンネルへの送信を並行して行うサービス
+
+    チャンネルごとに順序を保ったまま、上限付きのワーカー数で並行送信する。
+    Discordのメッセージ送信はチャンネル単位のレート制限バケットなので、
+    同一チャンネルへの送信は直列化し、全体はグローバル制限以下に抑える。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        global_rate: float = DEFAULT_GLOBAL_RATE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        latency_window: int = 2048,
+    ):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self._limiter = _RateLimiter(global_rate)
+        self._workers = asyncio.Semaphore(max_workers)
+        self._channel_locks: Dict[int, asyncio.Lock] = {}
+        self.latencies: deque = deque(maxlen=latency_window)
+        self.last_broadcast: Dict[str, Any] = {}
+        self._sends = metrics.counter("discord_sends_total", "Discordへの送信数")
+        self._retries = metrics.counter(
+            "discord_send_retries_total", "Discordへの送信の再試行数"
+        )
+        self._send_seconds = metrics.timer(
+            "discord_send_seconds", "Discordへの送信1件の所要時間 (キュー待ちを除く)"
+        )
+
+    def _channel_lock(self, channel_id: int) -> asyncio.Lock:
+        lock = self._channel_locks.get(channel_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._channel_locks[channel_id] = lock
+        return lock
+
+    async def _deliver(self, delivery: Delivery, started: float) -> DeliveryResult:
+        """1件を送信する。失敗はこの送信先だけに閉じ込める"""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._retries.inc()
+            await self._limiter.acquire()
+            send_started = time.perf_counter()
+            try:
+                value = await delivery.send()
+                latency = time.perf_counter() - started
+                self._send_seconds.observe(time.perf_counter() - send_started)
+                self._sends.inc(result="ok")
+                self.latencies.append(latency)
+                return DeliveryResult(delivery, True, value=value, latency=latency)
+            except discord.RateLimited as e:
+                # discord.py の待機上限を超えるレート制限。指示された時間だけ待つ
+                error = e
+                if attempt < self.max_retries:
+                    await asyncio.sleep(e.retry_after)
+                    continue
+            except discord.HTTPException as e:
+                error = e
+                if e.status >= 500 and attempt < self.max_retries:
+                    await asyncio.sleep(2**attempt)
+                    continue
+            except Exception as e:
+                error = e
+            break
+
+        latency = time.perf_counter() - started
+        self._sends.inc(result="failed")
+        print(f"配信に失敗しました ({delivery.label}): {error}")
+        return DeliveryResult(delivery, False, error=error, latency=latency)
+
+    async def broadcast(
+        self, deliveries: Sequence[Delivery], name: str = "broadcast"
+    ) -> List[DeliveryResult]:
+        """送信ジョブをまとめて並行送信し、入力と同じ順序で結果を返す"""
+        if not deliveries:
+            return []
+
+        started = time.perf_counter()
+        results: List[Optional[DeliveryResult]] = [None] * len(deliveries)
+        groups: Dict[int, List[int]] = {}
+        for index, delivery in enumerate(deliveries):
+            groups.setdefault(delivery.channel.id, []).append(index)
+
+        async def run_channel(channel_id: int, indexes: List[int]):
+            async with self._channel_lock(channel_id):
+                async with self._workers:
+                    for index in indexes:
+                        results[index] = await self._deliver(deliveries[index], started)
+
+        await asyncio.gather(
+            *(run_channel(channel_id, indexes) for channel_id, indexes in groups.items())
+        )
+
+        elapsed = time.perf_counter() - started
+        latencies = [result.latency for result in results]
+        succeeded = sum(1 for result in results if result.ok)
+        self.last_broadcast = {
+            "name": name,
+            "targets": len(deliveries),
+            "succeeded": succeeded,
+            "failed": len(deliveries) - succeeded,
+            "elapsed": elapsed,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        }
+        print(
+            f"{name}: {len(deliveries)}件中{succeeded}件送信 "
+            f"({elapsed:.2f}秒, p50={self.last_broadcast['p50']:.2f}秒, "
+            f"p95={self.last_broadcast['p95']:.2f}秒)"
+        )
+        return results
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        """直近の配信遅延のパーセンタイルを返す"""
+        latencies = list(self.latencies)
+        return {
+            "count": len(latencies),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        }
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,170 @@
+import asyncio
+import concurrent.futures
+import functools
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.metrics import metrics
+
+DEFAULT_IO_WORKERS = 8
+# 0 のときはプロセスプールを使わず、CPU処理もスレッドプールで実行する
+DEFAULT_CPU_WORKERS = 0
+
+
+class ExecutorService:
+    """ブロッキング処理をイベントループの外で実行する共有サービス
+
+    I/O待ちが主な処理 (requests, gspread, ファイル書き込みなど) はスレッドプールで、
+    CPUを使う処理 (PDFの変換、HTMLの解析など) は任意でプロセスプールで実行する。
+    種類ごとに同時実行数を制限し、呼び出し側がキャンセルされても、実行中の処理が
+    終わるまでは枠を解放しない (本当に動いている数だけを数える)。
+    """
+
+    def __init__(
+        self,
+        io_workers: int = DEFAULT_IO_WORKERS,
+        cpu_workers: int = DEFAULT_CPU_WORKERS,
+    ):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self._threads: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._processes: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        # セマフォとロックはイベントループごとに作り直す
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._serial_locks: Dict[Hashable, asyncio.Lock] = {}
+        self.in_flight = {"io": 0, "cpu": 0}
+        self._seconds = metrics.timer(
+            "executor_task_seconds", "スレッド/プロセスプールで実行した処理の所要時間"
+        )
+        self._wait_seconds = metrics.timer(
+            "executor_wait_seconds", "スレッド/プロセスプールの空き待ち時間"
+        )
+        gauge = metrics.gauge("executor_in_flight", "スレッド/プロセスプールで実行中の処理数")
+        for kind in self.in_flight:
+            gauge.set_function(functools.partial(self.in_flight.get, kind), pool=kind)
+
+    def configure(self, io_workers: int, cpu_workers: int):
+        """プールを作る前に並列数を変更する"""
+        if self._threads is not None or self._processes is not None:
+            raise RuntimeError("プールの作成後は並列数を変更できません")
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+
+    def _pool(self, kind: str) -> concurrent.futures.Executor:
+        if kind == "cpu" and self.cpu_workers > 0:
+            if self._processes is None:
+                self._processes = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.cpu_workers
+                )
+            return self._processes
+        if self._threads is None:
+            self._threads = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.io_workers, thread_name_prefix="atcotify-io"
+            )
+        return self._threads
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._limits = {}
+            self._serial_locks = {}
+
+    def _limit(self, kind: str) -> asyncio.Semaphore:
+        self._bind_loop()
+        semaphore = self._limits.get(kind)
+        if semaphore is None:
+            size = self.io_workers
+            if kind == "cpu" and self.cpu_workers > 0:
+                size = self.cpu_workers
+            semaphore = self._limits[kind] = asyncio.Semaphore(size)
+        return semaphore
+
+    async def _run(self, kind: str, function: Callable, args, kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        semaphore = self._limit(kind)
+        waited = time.perf_counter()
+        await semaphore.acquire()
+        self._wait_seconds.observe(time.perf_counter() - waited, pool=kind)
+        self.in_flight[kind] += 1
+        started = time.perf_counter()
+        name = getattr(function, "__qualname__", repr(function))
+
+        def release(_):
+            # プールのスレッドから呼ばれるので、ループ上で枠を返す
+            loop.call_soon_threadsafe(self._release, kind, semaphore, name, started)
+
+        try:
+            future = self._pool(kind).submit(functools.partial(function, *args, **kwargs))
+        except BaseException:
+            self._release(kind, semaphore, name, started)
+            raise
+        future.add_done_callback(release)
+        # 呼び出し側がキャンセルされると、まだ始まっていない処理は取り消される。
+        # 実行中の処理は止められないので、終わったときに枠が返る
+        return await asyncio.wrap_future(future)
+
+    def _release(self, kind: str, semaphore: asyncio.Semaphore, name: str, started: float):
+        self.in_flight[kind] -= 1
+        semaphore.release()
+        self._seconds.observe(time.perf_counter() - started, pool=kind, function=name)
+
+    async def run_io(
+        self, function: Callable, *args, serial_key: Hashable = None, **kwargs
+    ) -> Any:
+        """I/O待ちが主なブロッキング処理をスレッドプールで実行する
+
+        serial_key を指定すると、同じキーの処理は呼び出し順に1つずつ実行される
+        (同じファイルへの書き込みが前後しないようにするため)。
+        """
+        if serial_key is None:
+            return await self._run("io", function, args, kwargs)
+        self._bind_loop()
+        lock = self._serial_locks.get(serial_key)
+        if lock is None:
+            lock = self._serial_locks[serial_key] = asyncio.Lock()
+        await lock.acquire()
+        task = asyncio.ensure_future(self._run("io", function, args, kwargs))
+
+        def done(task: asyncio.Task):
+            # 呼び出し側がキャンセルされても、処理が終わるまでは次の処理を始めない
+            lock.release()
+            if not task.cancelled():
+                task.exception()  # 呼び出し側がいなくなっても未取得の警告を出さない
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    async def run_cpu(self, function: Callable, *args, **kwargs) -> Any:
+        """CPUを使う処理を実行する
+
+        プロセスプールが有効なときは別プロセスで実行するので、function と引数は
+        pickle できるもの (モジュールのトップレベルの関数など) にすること。
+        """
+        return await self._run("cpu", function, args, kwargs)
+
+    def shutdown(self):
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = None
+        self._processes = None
+
+
+executor = ExecutorService()
+
+
+def offload(kind: str = "io"):
+    """同期関数を、共有のプールで実行するコルーチン関数に変えるデコレーター"""
+
+    def decorator(function):
+        run = executor.run_cpu if kind == "cpu" else executor.run_io
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            return await run(function, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
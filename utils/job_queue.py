@@ -0,0 +1,168 @@
+import copy
+import datetime
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from utils.executor import executor
+from utils.metrics import metrics
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# dead_letters に残す件数 (古いものから捨てる)
+DEFAULT_MAX_DEAD_LETTERS = 100
+
+
+class RetryPolicy:
+    """失敗したジョブの再試行の方針"""
+
+    def __init__(
+        self,
+        base_delay: float = 60,
+        max_delay: float = 60 * 60,
+        max_attempts: int = 8,
+        jitter: float = 0.2,
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.jitter = jitter
+
+    def delay(self, attempts: int) -> float:
+        """attempts 回失敗したあとに待つ秒数 (指数バックオフ + ジッター)"""
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        # 同時に失敗したジョブが一斉に再試行しないようにばらつかせる
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class Job:
+    """キューに入っている1件のジョブ"""
+
+    def __init__(
+        self,
+        key: str,
+        kind: str,
+        payload: Dict[str, Any],
+        attempts: int = 0,
+        next_run: Optional[str] = None,
+        last_error: Optional[str] = None,
+    ):
+        self.key = key
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+        self.next_run = next_run or datetime.datetime.now().strftime(TIME_FORMAT)
+        self.last_error = last_error
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "kind": self.kind,
+            "payload": self.payload,
+            "attempts": self.attempts,
+            "next_run": self.next_run,
+            "last_error": self.last_error,
+        }
+
+
+class JobQueue:
+    """YAMLファイルに保存される、再試行つきのジョブキュー
+
+    ジョブはキーで一意になり、失敗すると種類ごとの RetryPolicy に従って
+    間隔を空けて再試行される。再試行の上限に達したジョブは dead_letters に移し、
+    最新の max_dead_letters 件だけを残す。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        policies: Optional[Dict[str, RetryPolicy]] = None,
+        max_dead_letters: int = DEFAULT_MAX_DEAD_LETTERS,
+    ):
+        self.path = path
+        self.name = name
+        self.policies = policies or {}
+        self.max_dead_letters = max_dead_letters
+        self.default_policy = RetryPolicy()
+        self.jobs: Dict[str, Job] = {}
+        self.dead_letters: List[Dict[str, Any]] = []
+        self._results = metrics.counter("jobs_total", "ジョブキューで処理したジョブの数")
+        metrics.gauge("job_queue_depth", "ジョブキューで待っているジョブの数").set_function(
+            lambda: len(self.jobs), queue=name
+        )
+
+    def load(self):
+        """ジョブをYAMLファイルから読み込む"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = yaml.safe_load(f) or {}
+        self.jobs = {job["key"]: Job(**job) for job in state.get("jobs") or []}
+        self.dead_letters = self._latest_dead_letters(state.get("dead_letters") or [])
+
+    def _latest_dead_letters(self, dead_letters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # [-0:] は全件になるので、0件のときは別に扱う
+        if self.max_dead_letters <= 0:
+            return []
+        return dead_letters[-self.max_dead_letters :]
+
+    def _save(self, state):
+        with open(self.path, "w", encoding="utf-8") as f:
+            yaml.dump(
+                state, f, allow_unicode=True, default_flow_style=False, sort_keys=False
+            )
+
+    async def save(self):
+        """ジョブをYAMLファイルに保存する"""
+        state = {
+            "jobs": [job.to_dict() for job in self.jobs.values()],
+            "dead_letters": copy.deepcopy(self.dead_letters),
+        }
+        await executor.run_io(self._save, state, serial_key=self.path)
+
+    def add(self, kind: str, key: str, payload: Dict[str, Any]) -> Job:
+        """ジョブを追加する。同じキーのジョブがあればそれを返す"""
+        job = self.jobs.get(key)
+        if job is None:
+            job = self.jobs[key] = Job(key, kind, payload)
+        return job
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.jobs
+
+    def due(self, kind: Optional[str] = None) -> List[Job]:
+        """実行時刻になったジョブを返す"""
+        now = datetime.datetime.now().strftime(TIME_FORMAT)
+        return [
+            job
+            for job in self.jobs.values()
+            if job.next_run <= now and (kind is None or job.kind == kind)
+        ]
+
+    def succeed(self, job: Job):
+        self.jobs.pop(job.key, None)
+        self._results.inc(queue=self.name, kind=job.kind, result="succeeded")
+
+    def fail(self, job: Job, error: Any):
+        """失敗を記録し、再試行を予約するか dead_letters に移す"""
+        policy = self.policies.get(job.kind, self.default_policy)
+        job.attempts += 1
+        job.last_error = str(error)
+        if job.attempts >= policy.max_attempts:
+            self.jobs.pop(job.key, None)
+            dead = job.to_dict()
+            dead["failed_at"] = datetime.datetime.now().strftime(TIME_FORMAT)
+            self.dead_letters = self._latest_dead_letters(self.dead_letters + [dead])
+            self._results.inc(queue=self.name, kind=job.kind, result="dead")
+            print(f"{self.name}: {job.key} を{job.attempts}回試して諦めました: {error}")
+            return
+        delay = policy.delay(job.attempts)
+        next_run = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+        job.next_run = next_run.strftime(TIME_FORMAT)
+        self._results.inc(queue=self.name, kind=job.kind, result="retried")
+        print(
+            f"{self.name}: {job.key} に失敗しました ({job.attempts}回目)。"
+            f"{delay:.0f}秒後に再試行します: {error}"
+        )
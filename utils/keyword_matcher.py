@@ -0,0 +1,80 @@
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class KeywordMatcher:
+    """Aho–Corasick オートマトンによる複数キーワードの一括検索
+
+    キーワードの数に関係なく、本文を一度なめるだけで全ての出現を見つける。
+    キーワードの並び順を優先度として扱い、インデックスが小さいほど優先する。
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        # 重複と空文字列を除き、最初に現れた順序を優先度として保持する
+        self.keywords: List[str] = list(dict.fromkeys(k for k in keywords if k))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        for index, keyword in enumerate(self.keywords):
+            self._add(keyword, index)
+        self._build_failure_links()
+
+    def _add(self, keyword: str, index: int):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] = self._output[state] + (index,)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # 失敗遷移先で終わるキーワードもこの状態で一致している
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(開始位置, キーワードのインデックス) を出現順に返す"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        keywords = self.keywords
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield position - len(keywords[index]) + 1, index
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """(開始位置, キーワード) のリストを返す"""
+        return [(start, self.keywords[index]) for start, index in self.iter_matches(text)]
+
+    def best_match(self, text: str) -> Optional[int]:
+        """一致したキーワードのうち最も優先度の高いもののインデックスを返す"""
+        best = None
+        for _, index in self.iter_matches(text):
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return best
+
+    def __len__(self) -> int:
+        return len(self.keywords)
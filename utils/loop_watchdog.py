@@ -0,0 +1,197 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_INTERVAL = 0.1
+# リポジトリのルート。ここ以下のファイルのフレームを「犯人」として扱う
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LIBRARY_DIRS = ("site-packages", "dist-packages", ".venv", "venv")
+
+# (cog, 関数, 行番号)
+StallKey = Tuple[str, str, int]
+
+
+class StallStats:
+    """同じ場所で起きた停止の集計"""
+
+    def __init__(self, key: StallKey):
+        self.key = key
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.blocked_in: Counter = Counter()
+        self.last_stack: List[str] = []
+
+    @property
+    def cog(self) -> str:
+        return self.key[0]
+
+    @property
+    def function(self) -> str:
+        return f"{self.key[1]}:{self.key[2]}"
+
+
+class LoopWatchdog:
+    """イベントループの停止を検出し、停止中のスタックから原因の cog と関数を集計する
+
+    イベントループ上のハートビートが止まったことを別スレッドから検出し、
+    しきい値を超えて止まっている間はループのスレッドのスタックを採取する。
+    停止が終わったら、最も多く採取された場所にその停止時間を計上する。
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        interval: float = DEFAULT_INTERVAL,
+    ):
+        self.threshold = threshold
+        self.interval = interval
+        self.stats: Dict[StallKey, StallStats] = {}
+        self._lock = threading.Lock()
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lag = metrics.timer(
+            "event_loop_lag_seconds", "イベントループのハートビートの遅れ"
+        )
+        self._stalls = metrics.counter(
+            "event_loop_stalls_total", "しきい値を超えたイベントループの停止回数"
+        )
+        self._stall_seconds = metrics.counter(
+            "event_loop_stall_seconds_total", "イベントループが停止していた合計時間"
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """実行中のイベントループの監視を始める (ループ上から呼ぶ)"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._monitor, name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+        print(f"イベントループの監視を開始しました (しきい値: {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._lag.observe(max(0.0, loop.time() - started - self.interval))
+
+    def _monitor(self):
+        stall_started = None
+        samples: Counter = Counter()
+        blocked_in: Counter = Counter()
+        stacks: Dict[StallKey, List[str]] = {}
+        while not self._stop.wait(self.interval):
+            last_beat = self._last_beat
+            now = time.monotonic()
+            if now - last_beat >= self.threshold:
+                if stall_started is None:
+                    stall_started = last_beat
+                    samples.clear()
+                    blocked_in.clear()
+                    stacks.clear()
+                key, callee, stack = self._sample()
+                samples[key] += 1
+                blocked_in[callee] += 1
+                stacks[key] = stack
+            elif stall_started is not None:
+                # ハートビートが再開した。停止時間を最も多く採取された場所に計上する
+                key = samples.most_common(1)[0][0]
+                self._record(key, now - stall_started, blocked_in, stacks[key])
+                stall_started = None
+
+    def _sample(self) -> Tuple[StallKey, str, List[str]]:
+        """ループのスレッドのスタックを採取し、原因の場所を特定する"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return ("(不明)", "(不明)", 0), "(不明)", []
+        try:
+            summary = traceback.extract_stack(frame)
+        finally:
+            del frame
+        callee = f"{_module_name(summary[-1].filename)}.{summary[-1].name}"
+        key: StallKey = ("(ライブラリ)", summary[-1].name, summary[-1].lineno or 0)
+        for entry in reversed(summary):
+            if _is_project_file(entry.filename):
+                key = (_module_name(entry.filename), entry.name, entry.lineno or 0)
+                break
+        return key, callee, traceback.format_list(summary[-12:])
+
+    def _record(
+        self, key: StallKey, duration: float, blocked_in: Counter, stack: List[str]
+    ):
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = StallStats(key)
+            stats.count += 1
+            stats.total += duration
+            stats.max = max(stats.max, duration)
+            stats.blocked_in.update(blocked_in)
+            stats.last_stack = stack
+        self._stalls.inc(cog=key[0])
+        self._stall_seconds.inc(duration, cog=key[0])
+        callee = blocked_in.most_common(1)[0][0]
+        print(
+            f"イベントループが{duration:.2f}秒停止しました: "
+            f"{key[0]} {key[1]}:{key[2]} ({callee})"
+        )
+
+    def report(self, limit: int = 10) -> List[StallStats]:
+        """停止時間の合計が大きい順に返す"""
+        with self._lock:
+            ranked = sorted(self.stats.values(), key=lambda s: s.total, reverse=True)
+        return ranked[:limit]
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+
+
+def _is_project_file(filename: str) -> bool:
+    path = os.path.abspath(filename)
+    if not path.startswith(PROJECT_ROOT + os.sep) or path == os.path.abspath(__file__):
+        return False
+    return not any(part in _LIBRARY_DIRS for part in path.split(os.sep))
+
+
+def _module_name(filename: str) -> str:
+    path = os.path.abspath(filename)
+    if path.startswith(PROJECT_ROOT + os.sep):
+        path = os.path.relpath(path, PROJECT_ROOT)
+    else:
+        path = os.path.basename(path)
+    return os.path.splitext(path)[0].replace(os.sep, ".")
+
+
+watchdog = LoopWatchdog()
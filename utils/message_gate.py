@@ -0,0 +1,79 @@
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+import discord
+
+DEFAULT_MAX_SCAN_LENGTH = 2000
+
+
+class MessageGate:
+    """メッセージリスナーの前段で、調べる必要のないメッセージを安く捨てる
+
+    判定はすべて集合の参照か文字集合の比較だけで済むようにしてあり、
+    本文の検索 (キーワード検索器) まで進んだ件数と、理由別に捨てた件数を数える。
+    サーバーごとの有効/無効は既定ではオプトインで、enabled_guilds のサーバーだけを調べる。
+    """
+
+    def __init__(self, max_scan_length: int = DEFAULT_MAX_SCAN_LENGTH):
+        self.max_scan_length = max_scan_length
+        self.default_enabled = False
+        self.enabled_guilds: frozenset = frozenset()
+        self.disabled_guilds: frozenset = frozenset()
+        # キーワードの先頭文字の集合。本文にどれも含まれなければ検索しない
+        self.first_chars: frozenset = frozenset()
+        self.stats: Counter = Counter()
+
+    def set_guild_policy(
+        self,
+        default_enabled: bool,
+        enabled_guilds: Iterable[int] = (),
+        disabled_guilds: Iterable[int] = (),
+    ):
+        """サーバーごとの有効/無効を設定する"""
+        self.default_enabled = default_enabled
+        self.enabled_guilds = frozenset(enabled_guilds)
+        self.disabled_guilds = frozenset(disabled_guilds)
+
+    def set_keywords(self, keywords: Iterable[str]):
+        """キーワードから先頭文字のプレフィルタを作る"""
+        self.first_chars = frozenset(keyword[0] for keyword in keywords if keyword)
+
+    def guild_enabled(self, guild_id: int) -> bool:
+        if self.default_enabled:
+            return guild_id not in self.disabled_guilds
+        return guild_id in self.enabled_guilds
+
+    def admit(self, message: discord.Message) -> Optional[str]:
+        """検索すべきメッセージなら検索対象の本文を、そうでなければ None を返す"""
+        reason = None
+        if message.author.bot:
+            reason = "bot"
+        elif message.webhook_id is not None:
+            reason = "webhook"
+        elif message.guild is not None and not self.guild_enabled(message.guild.id):
+            reason = "guild_disabled"
+        elif not message.content:
+            reason = "empty"
+        if reason:
+            self.stats[reason] += 1
+            return None
+
+        text = message.content
+        if len(text) > self.max_scan_length:
+            text = text[: self.max_scan_length]
+            self.stats["truncated"] += 1
+        if self.first_chars.isdisjoint(text):
+            self.stats["prefilter"] += 1
+            return None
+
+        self.stats["scanned"] += 1
+        return text
+
+    def summary(self) -> Dict[str, int]:
+        """検索した件数と、理由別に捨てた件数を返す"""
+        skipped = sum(
+            count
+            for reason, count in self.stats.items()
+            if reason not in ("scanned", "truncated")
+        )
+        return {"scanned": self.stats["scanned"], "skipped": skipped, **self.stats}
@@ -0,0 +1,287 @@
+import functools
+import time
+import urllib.parse
+from collections import deque
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import aiohttp
+from aiohttp import web
+
+# 各時系列で保持する直近の計測値の数 (パーセンタイル計算用)
+DEFAULT_SAMPLE_WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """値の列から p パーセンタイル (0-100) を返す"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (
+        name
+        + '="'
+        + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        + '"'
+        for name, value in items
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class Counter:
+    """増える一方の値"""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(_label_key(labels), 0)
+
+    def render(self):
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Gauge:
+    """現在値。値を直接設定するか、読み出し時に関数で求める"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self.values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        self.values[_label_key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels):
+        """読み出し時に function() の値を使う"""
+        self._functions[_label_key(labels)] = function
+
+    def collect(self) -> Dict[LabelKey, float]:
+        values = dict(self.values)
+        for key, function in self._functions.items():
+            try:
+                values[key] = function()
+            except Exception as e:
+                print(f"メトリクス {self.name} の取得に失敗しました: {e}")
+        return values
+
+    def render(self):
+        for key, value in self.collect().items():
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class _TimerSeries:
+    def __init__(self, window: int):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples: deque = deque(maxlen=window)
+
+
+class Timer:
+    """所要時間 (秒) の回数・合計・最大値と直近の分布"""
+
+    type = "summary"
+
+    def __init__(self, name: str, help: str = "", window: int = DEFAULT_SAMPLE_WINDOW):
+        self.name = name
+        self.help = help
+        self.window = window
+        self.series: Dict[LabelKey, _TimerSeries] = {}
+
+    def observe(self, seconds: float, **labels):
+        key = _label_key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = _TimerSeries(self.window)
+        series.count += 1
+        series.sum += seconds
+        series.max = max(series.max, seconds)
+        series.samples.append(seconds)
+
+    def summary(self) -> Dict[LabelKey, Dict[str, float]]:
+        """ラベルごとの回数・平均・最大値・パーセンタイル"""
+        result = {}
+        for key, series in self.series.items():
+            samples = list(series.samples)
+            result[key] = {
+                "count": series.count,
+                "mean": series.sum / series.count if series.count else 0.0,
+                "max": series.max,
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "p99": percentile(samples, 99),
+            }
+        return result
+
+    def render(self):
+        for key, series in self.series.items():
+            samples = list(series.samples)
+            for quantile in QUANTILES:
+                yield (
+                    f"{self.name}{_format_labels(key, ('quantile', str(quantile)))} "
+                    f"{_format_value(percentile(samples, quantile * 100))}"
+                )
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(series.sum)}"
+            yield f"{self.name}_count{_format_labels(key)} {series.count}"
+
+
+class MetricsRegistry:
+    """メトリクスの登録先。同じ名前で取得すると同じインスタンスを返す"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _get(self, cls, name: str, help: str):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help)
+        elif not isinstance(metric, cls):
+            raise TypeError(f"メトリクス {name} は {type(metric).__name__} として登録済みです")
+        elif help and not metric.help:
+            metric.help = help
+        return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def timer(self, name: str, help: str = "") -> Timer:
+        return self._get(Timer, name, help)
+
+    def timed(self, name: str, help: str = "", **labels):
+        """コルーチン関数の所要時間を計測するデコレーター。例外も回数に含める"""
+        timer = self.timer(name, help)
+        errors = self.counter(f"{name.removesuffix('_seconds')}_errors_total")
+
+        def decorator(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                except Exception:
+                    errors.inc(**labels)
+                    raise
+                finally:
+                    timer.observe(time.perf_counter() - started, **labels)
+
+            return wrapper
+
+        return decorator
+
+    def render_prometheus(self) -> str:
+        """Prometheus のテキスト形式で出力する"""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def _host(url: str) -> str:
+    return urllib.parse.urlsplit(url).hostname or "unknown"
+
+
+def record_http(url: str, nbytes: int, status: Optional[int] = None):
+    """HTTPリクエスト1回分を記録する"""
+    metrics.counter("http_requests_total", "HTTPリクエスト数").inc(
+        host=_host(url), status=status or "error"
+    )
+    record_http_bytes(url, nbytes)
+
+
+def record_http_bytes(url: str, nbytes: int):
+    metrics.counter("http_response_bytes_total", "HTTPレスポンスの受信バイト数").inc(
+        nbytes, host=_host(url)
+    )
+
+
+def requests_hook(response, *args, **kwargs):
+    """requests のレスポンスフック。hooks={"response": requests_hook} で使う"""
+    record_http(response.url, len(response.content), response.status_code)
+    return response
+
+
+def aiohttp_trace_config() -> aiohttp.TraceConfig:
+    """aiohttp.ClientSession(trace_configs=[...]) に渡すと HTTP メトリクスを記録する"""
+
+    async def on_request_end(session, context, params):
+        # 本文はこの後で読まれるので、バイト数は受信したチャンクごとに数える
+        record_http(str(params.url), 0, params.response.status)
+
+    async def on_response_chunk_received(session, context, params):
+        record_http_bytes(str(params.url), len(params.chunk))
+
+    async def on_request_exception(session, context, params):
+        record_http(str(params.url), 0)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_response_chunk_received.append(on_response_chunk_received)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+class MetricsServer:
+    """/metrics を Prometheus のテキスト形式で返すHTTPサーバー"""
+
+    def __init__(self, registry: MetricsRegistry = metrics):
+        self.registry = registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle_metrics(self, request):
+        return web.Response(
+            text=self.registry.render_prometheus(),
+            content_type="text/plain",
+            charset="utf-8",
+        )
+
+    async def start(self, host: str, port: int):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        print(f"メトリクスを http://{host}:{port}/metrics で公開しました")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import time
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import yaml
+
+from utils.keyword_matcher import KeywordMatcher
+
+DEFAULT_COOLDOWN = 60
+
+
+class Rule:
+    """1つの警察ルール"""
+
+    def __init__(
+        self,
+        rule_id: str,
+        keywords: Dict[str, Optional[str]],
+        response: str,
+        cooldown: float,
+    ):
+        self.id = rule_id
+        # キーワード -> 正しい表記 (訂正しないルールでは None)
+        self.keywords = keywords
+        self.response = response
+        self.cooldown = cooldown
+
+    def render(self, keyword: str) -> str:
+        """返信文を作る"""
+        correct = self.keywords.get(keyword)
+        return self.response.replace("{keyword}", keyword).replace(
+            "{correct}", correct or ""
+        )
+
+
+class RuleSet:
+    """ルール一覧と、それらから組み立てたキーワード検索器"""
+
+    def __init__(self, rules: List[Rule], digest: str = ""):
+        self.rules = rules
+        self.digest = digest
+        # 検索器のインデックス -> (ルール, キーワード)。並び順がそのまま優先度
+        self._entries: List[Tuple[Rule, str]] = [
+            (rule, keyword) for rule in rules for keyword in rule.keywords
+        ]
+        self.matcher = KeywordMatcher(keyword for _, keyword in self._entries)
+        # 同じキーワードが複数ルールにある場合は、検索器と同じく最初のものを使う
+        first_entry: Dict[str, Tuple[Rule, str]] = {}
+        for entry in self._entries:
+            first_entry.setdefault(entry[1], entry)
+        self._entries = [first_entry[keyword] for keyword in self.matcher.keywords]
+
+    @property
+    def rule_ids(self) -> List[str]:
+        return [rule.id for rule in self.rules]
+
+    def match(
+        self, text: str, disabled_rules: Iterable[str] = ()
+    ) -> Optional[Tuple[Rule, str]]:
+        """無効化されていないルールのうち、最も優先度の高い一致を返す"""
+        disabled_rules = set(disabled_rules)
+        best = None
+        for _, index in self.matcher.iter_matches(text):
+            if best is not None and index >= best:
+                continue
+            if self._entries[index][0].id in disabled_rules:
+                continue
+            best = index
+            if best == 0:
+                break
+        return self._entries[best] if best is not None else None
+
+
+def parse_rule_set(data: Dict, digest: str = "") -> RuleSet:
+    """YAMLから読んだ辞書を RuleSet にする"""
+    default_cooldown = data.get("default_cooldown", DEFAULT_COOLDOWN)
+    rules = []
+    for item in data.get("rules") or []:
+        keywords: Dict[str, Optional[str]] = {}
+        for keyword in item.get("keywords") or []:
+            keywords[str(keyword)] = None
+        for keyword, correct in (item.get("corrections") or {}).items():
+            keywords[str(keyword)] = str(correct)
+        if not keywords or not item.get("response"):
+            print(f"警察ルール {item.get('id')} にキーワードか返信文がないため無視します")
+            continue
+        rules.append(
+            Rule(
+                str(item.get("id") or f"rule{len(rules)}"),
+                keywords,
+                item["response"],
+                float(item.get("cooldown", default_cooldown)),
+            )
+        )
+    return RuleSet(rules, digest)
+
+
+class RuleFile:
+    """ルールファイルを監視し、内容が変わったときだけ組み立て直す"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime: Optional[float] = None
+        self.rule_set = RuleSet([])
+
+    def reload(self, force: bool = False) -> bool:
+        """ファイルが更新されていれば読み直す。組み立て直した場合は True を返す"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            if self._mtime is None and not self.rule_set.rules:
+                print(f"{self.path} が見つかりません。警察ルールなしで動作します")
+            self._mtime = None
+            return False
+        if not force and mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        if digest == self.rule_set.digest:
+            return False  # 保存し直されただけで内容は同じ
+        try:
+            data = yaml.safe_load(raw) or {}
+            self.rule_set = parse_rule_set(data, digest)
+        except (yaml.YAMLError, AttributeError, TypeError, ValueError) as e:
+            print(f"警察ルールの読み込みに失敗しました。以前のルールを使い続けます: {e}")
+            return False
+        print(f"警察ルールを読み込みました: {len(self.rule_set.rules)}件")
+        return True
+
+
+class CooldownMap:
+    """期限付きのキーを持つ辞書。期限切れのキーはまとめて掃除する"""
+
+    def __init__(self, purge_threshold: int = 4096):
+        self._expires: Dict[Hashable, float] = {}
+        self._purge_threshold = purge_threshold
+
+    def active(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """key がクールダウン中かどうか"""
+        expires = self._expires.get(key)
+        if expires is None:
+            return False
+        now = time.monotonic() if now is None else now
+        if expires <= now:
+            del self._expires[key]
+            return False
+        return True
+
+    def start(self, key: Hashable, seconds: float, now: Optional[float] = None):
+        """key のクールダウンを開始する"""
+        if seconds <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        self._expires[key] = now + seconds
+        if len(self._expires) > self._purge_threshold:
+            self.purge(now)
+
+    def purge(self, now: Optional[float] = None):
+        """期限切れのキーを削除する"""
+        now = time.monotonic() if now is None else now
+        self._expires = {k: v for k, v in self._expires.items() if v > now}
+        # 生きているキーが多いときに掃除が毎回走らないよう閾値を広げる
+        self._purge_threshold = max(self._purge_threshold, 2 * len(self._expires))
+
+    def __len__(self) -> int:
+        return len(self._expires)
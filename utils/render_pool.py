@@ -0,0 +1,140 @@
+import asyncio
+import concurrent.futures
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from utils.metrics import metrics
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 8
+
+
+class RenderQueueFull(Exception):
+    """描画待ちのジョブが上限に達している"""
+
+
+class RenderPool:
+    """画像の描画専用のプロセスプール
+
+    ジョブは上限付きのキューに入り、ワーカーの数だけ並行して別プロセスで実行される。
+    同じキーのジョブが実行待ち・実行中であれば新しく投入せず、その結果を共有する。
+    キューが一杯のときは、空くまで待つか (wait=True)、RenderQueueFull を送出する。
+    ワーカーのプロセスが異常終了したときは、プロセスプールを作り直す。
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._processes: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers: List[asyncio.Task] = []
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._requests = metrics.counter("render_requests_total", "描画の依頼数")
+        self._seconds = metrics.timer("render_seconds", "描画1件の所要時間 (キュー待ちを除く)")
+        metrics.gauge("render_queue_depth", "描画待ちのジョブ数").set_function(
+            lambda: self._queue.qsize() if self._queue is not None else 0
+        )
+
+    def configure(self, workers: int, queue_size: int):
+        """ワーカーを起動する前に並列数とキューの長さを変更する"""
+        if self._processes is not None:
+            raise RuntimeError("ワーカーの起動後は設定を変更できません")
+        self.workers = workers
+        self.queue_size = queue_size
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        for consumer in self._consumers:
+            consumer.cancel()
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._in_flight = {}
+        if self._processes is None:
+            self._processes = self._create_processes()
+        self._consumers = [loop.create_task(self._consume()) for _ in range(self.workers)]
+
+    def _create_processes(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+
+    def _replace_broken(self, broken: concurrent.futures.ProcessPoolExecutor):
+        """異常終了したプロセスプールを作り直す (他のワーカーが作り直していれば何もしない)"""
+        if self._processes is not broken:
+            return
+        print("描画用のプロセスが異常終了したため、プロセスプールを作り直します")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._processes = self._create_processes()
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, function, args, future = await self._queue.get()
+            started = time.perf_counter()
+            processes = self._processes
+            try:
+                result = await loop.run_in_executor(processes, function, *args)
+                if not future.done():
+                    future.set_result(result)
+            except BrokenProcessPool as e:
+                self._replace_broken(processes)
+                if not future.done():
+                    future.set_exception(e)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._seconds.observe(time.perf_counter() - started)
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+                self._queue.task_done()
+
+    async def render(
+        self, key: Hashable, function: Callable, *args, wait: bool = True
+    ) -> Any:
+        """function(*args) を描画用のプロセスで実行して結果を返す
+
+        function と引数は pickle できるもの (モジュールのトップレベルの関数など) にすること。
+        """
+        self._ensure_started()
+        future = self._in_flight.get(key)
+        if future is not None:
+            self._requests.inc(result="deduplicated")
+            return await asyncio.shield(future)
+
+        future = self._loop.create_future()
+        # 誰も結果を待っていなくても、未取得の例外として警告を出さない
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        job = (key, function, args, future)
+        try:
+            if wait:
+                await self._queue.put(job)
+            else:
+                self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._requests.inc(result="rejected")
+            del self._in_flight[key]
+            error = RenderQueueFull(f"描画待ちが{self.queue_size}件に達しています")
+            future.set_exception(error)
+            raise error
+        except BaseException:
+            # キューに入る前にキャンセルされた。同じキーで待っていた側には失敗として伝える
+            del self._in_flight[key]
+            future.set_exception(RuntimeError("描画の依頼が取り消されました"))
+            raise
+        self._requests.inc(result="queued")
+        return await asyncio.shield(future)
+
+    def shutdown(self):
+        for consumer in self._consumers:
+            consumer.cancel()
+        self._consumers = []
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+
+render_pool = RenderPool()
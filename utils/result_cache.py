@@ -0,0 +1,235 @@
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.executor import executor
+from utils.metrics import metrics
+
+DEFAULT_PENDING_TTL = 600
+DEFAULT_MAX_DISK_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_MEMORY_ENTRIES = 16
+# 期限切れの確定前の結果を、送信のやり直し用に残しておく秒数
+DEFAULT_STALE_KEEP = 24 * 60 * 60
+# 確定前の結果のファイル名につける印 (例: abc001.pending.png)
+PENDING_SUFFIX = ".pending"
+# ディスクのファイル名に使えるコンテストIDだけを保存する
+_SAFE_CONTEST_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class ResultArtifact:
+    """1コンテスト分の結果 (表・画像・メタデータ)"""
+
+    def __init__(
+        self,
+        contest_id: str,
+        ratings_final: bool,
+        table: Dict[str, Any],
+        png: bytes,
+        metadata: Optional[Dict[str, Any]] = None,
+        created_at: Optional[float] = None,
+    ):
+        self.contest_id = contest_id
+        self.ratings_final = ratings_final
+        # ResultTable.to_dict() の形式
+        self.table = table
+        self.png = png
+        self.metadata = metadata or {}
+        self.created_at = time.time() if created_at is None else created_at
+
+    @property
+    def key(self) -> Tuple[str, bool]:
+        return self.contest_id, self.ratings_final
+
+
+class ResultCache:
+    """コンテスト結果のキャッシュ
+
+    (コンテストID, レート確定済みか) をキーにする。レート確定前の結果は
+    パフォーマンスやレートが後から変わるので短いTTLで使い回す。再起動後の送信の
+    やり直しでも他の送信先と同じ画像を送れるよう、確定前の結果もディスクに残す。
+    確定後の結果は期限なしでディスクに保存し、合計サイズを超えたら
+    最近使われていないものから消す (メモリから返したときもファイルの更新時刻を進める)。
+    期限切れの確定前の結果は読み出しでは消さず、put のときに stale_keep 秒を過ぎたものを捨てる。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        pending_ttl: float = DEFAULT_PENDING_TTL,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+        max_memory_entries: int = DEFAULT_MAX_MEMORY_ENTRIES,
+        stale_keep: float = DEFAULT_STALE_KEEP,
+    ):
+        self.directory = directory
+        self.pending_ttl = pending_ttl
+        self.stale_keep = stale_keep
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_entries = max_memory_entries
+        # レート確定前の結果。contest_id -> ResultArtifact
+        self._pending: Dict[str, ResultArtifact] = {}
+        # レート確定後の結果のうち、最近使ったもの
+        self._final: "OrderedDict[str, ResultArtifact]" = OrderedDict()
+        self._requests = metrics.counter("result_cache_requests_total", "結果キャッシュの参照数")
+
+    def _paths(self, contest_id: str, pending: bool = False) -> Tuple[str, str]:
+        base = os.path.join(self.directory, contest_id)
+        if pending:
+            base += PENDING_SUFFIX
+        return base + ".png", base + ".json"
+
+    def _remember(self, artifact: ResultArtifact):
+        self._final[artifact.contest_id] = artifact
+        self._final.move_to_end(artifact.contest_id)
+        while len(self._final) > self.max_memory_entries:
+            self._final.popitem(last=False)
+
+    async def get(
+        self, contest_id: str, allow_stale: bool = False
+    ) -> Optional[ResultArtifact]:
+        """確定済みの結果があればそれを、なければ期限内の確定前の結果を返す
+
+        allow_stale=True のときは期限切れの確定前の結果も返す
+        (送信のやり直しで、他の送信先と同じ画像を送るときなど)。
+        """
+        artifact = self._final.get(contest_id)
+        if artifact is not None:
+            self._final.move_to_end(contest_id)
+            self._requests.inc(result="memory")
+            # ディスクから消す順番は更新時刻で決めるので、よく使うものを古く見せない
+            if _SAFE_CONTEST_ID.fullmatch(contest_id):
+                await executor.run_io(self._touch, contest_id)
+            return artifact
+
+        if _SAFE_CONTEST_ID.fullmatch(contest_id):
+            artifact = await executor.run_io(self._load, contest_id)
+            if artifact is not None:
+                self._remember(artifact)
+                self._pending.pop(contest_id, None)
+                self._requests.inc(result="disk")
+                return artifact
+
+        artifact = self._pending.get(contest_id)
+        if artifact is None and allow_stale and _SAFE_CONTEST_ID.fullmatch(contest_id):
+            # 再起動でメモリから消えた確定前の結果
+            artifact = await executor.run_io(self._load, contest_id, True)
+            if artifact is not None and time.time() - artifact.created_at < self.stale_keep:
+                self._pending[contest_id] = artifact
+            else:
+                artifact = None
+        if artifact is not None:
+            if allow_stale or time.time() - artifact.created_at < self.pending_ttl:
+                self._requests.inc(result="pending")
+                return artifact
+        self._requests.inc(result="miss")
+        return None
+
+    async def put(self, artifact: ResultArtifact):
+        """結果を保存する。確定前の結果も送信のやり直し用にディスクへ書き込む"""
+        self._sweep_pending()
+        if not artifact.ratings_final:
+            self._pending[artifact.contest_id] = artifact
+        else:
+            self._pending.pop(artifact.contest_id, None)
+            self._remember(artifact)
+        if _SAFE_CONTEST_ID.fullmatch(artifact.contest_id):
+            try:
+                await executor.run_io(
+                    self._store, artifact, serial_key=("result_cache", self.directory)
+                )
+            except OSError as e:
+                print(f"結果キャッシュの保存に失敗しました ({artifact.contest_id}): {e}")
+
+    def _sweep_pending(self):
+        """stale_keep 秒を過ぎた確定前の結果を捨てる"""
+        now = time.time()
+        for contest_id, artifact in list(self._pending.items()):
+            if now - artifact.created_at >= self.stale_keep:
+                del self._pending[contest_id]
+
+    def _touch(self, contest_id: str, pending: bool = False):
+        """最終利用時刻として、ファイルの更新時刻を今にする"""
+        now = time.time()
+        for path in self._paths(contest_id, pending):
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+
+    def _load(self, contest_id: str, pending: bool = False) -> Optional[ResultArtifact]:
+        png_path, meta_path = self._paths(contest_id, pending)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            table = meta["table"]
+            with open(png_path, "rb") as f:
+                png = f.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"結果キャッシュの読み込みに失敗しました ({contest_id}): {e}")
+            return None
+        # 最終利用時刻として更新時刻を使う (LRUで消す順番の基準)
+        self._touch(contest_id, pending)
+        return ResultArtifact(
+            contest_id,
+            not pending,
+            table,
+            png,
+            meta.get("metadata"),
+            meta.get("created_at"),
+        )
+
+    def _store(self, artifact: ResultArtifact):
+        os.makedirs(self.directory, exist_ok=True)
+        png_path, meta_path = self._paths(artifact.contest_id, not artifact.ratings_final)
+        meta = {
+            "contest_id": artifact.contest_id,
+            "created_at": artifact.created_at,
+            "metadata": artifact.metadata,
+            "table": artifact.table,
+        }
+        # 書きかけのファイルを読まないよう、一時ファイルに書いてから置き換える
+        with open(png_path + ".tmp", "wb") as f:
+            f.write(artifact.png)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(png_path + ".tmp", png_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        if artifact.ratings_final:
+            # 確定後の結果があれば、確定前の結果はもう使わない
+            for path in self._paths(artifact.contest_id, pending=True):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self._evict()
+
+    def _evict(self):
+        """ディスク上の合計サイズが上限を超えていれば、最近使われていないものから消す"""
+        entries: Dict[str, List[Any]] = {}
+        for name in os.listdir(self.directory):
+            contest_id, ext = os.path.splitext(name)
+            if ext not in (".png", ".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = entries.setdefault(contest_id, [0.0, 0])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+        total = sum(size for _, size in entries.values())
+        for contest_id, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if total <= self.max_disk_bytes:
+                break
+            for path in self._paths(contest_id):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            print(f"結果キャッシュから {contest_id} を削除しました")
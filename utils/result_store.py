@@ -0,0 +1,155 @@
+import datetime
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contests (
+    contest_id TEXT PRIMARY KEY,
+    is_rated INTEGER NOT NULL,
+    ratings_final INTEGER NOT NULL,
+    held_at TEXT,
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    contest_id TEXT NOT NULL,
+    user_name TEXT NOT NULL,
+    club_rank INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    score REAL NOT NULL,
+    performance INTEGER,
+    old_rating INTEGER,
+    new_rating INTEGER,
+    PRIMARY KEY (contest_id, user_name)
+);
+CREATE INDEX IF NOT EXISTS results_user ON results (user_name);
+CREATE TABLE IF NOT EXISTS task_results (
+    contest_id TEXT NOT NULL,
+    user_name TEXT NOT NULL,
+    task TEXT NOT NULL,
+    score REAL NOT NULL,
+    penalty INTEGER NOT NULL,
+    failure INTEGER NOT NULL,
+    PRIMARY KEY (contest_id, user_name, task)
+);
+"""
+
+# コンテストの並び順。開催日時が分からないものは記録した日時を使う
+_CONTEST_ORDER = "COALESCE(c.held_at, c.recorded_at)"
+
+
+class ResultStore:
+    """部員のコンテスト結果を蓄積する SQLite のデータベース
+
+    コンテストごと・部員ごとの順位、得点、問題ごとの結果、パフォーマンス、
+    レートを記録し、集計は pandas で行う。メソッドはブロッキングするので、
+    executor.run_io から呼ぶこと (書き込みは serial_key=path で直列にする)。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        if not self._initialized:
+            connection.executescript(SCHEMA)
+            self._initialized = True
+        return connection
+
+    def record_contest(
+        self,
+        contest_id: str,
+        records: List[Dict[str, Any]],
+        is_rated: bool,
+        ratings_final: bool,
+        held_at: Optional[str] = None,
+    ):
+        """1コンテスト分の結果を記録する。記録済みなら置き換える"""
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO contests VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (contest_id) DO UPDATE SET"
+                    " is_rated = excluded.is_rated,"
+                    " ratings_final = excluded.ratings_final,"
+                    " held_at = COALESCE(excluded.held_at, contests.held_at)",
+                    (contest_id, is_rated, ratings_final, held_at, now),
+                )
+                connection.execute("DELETE FROM results WHERE contest_id = ?", (contest_id,))
+                connection.execute(
+                    "DELETE FROM task_results WHERE contest_id = ?", (contest_id,)
+                )
+                connection.executemany(
+                    "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            contest_id,
+                            record["user_name"],
+                            record["club_rank"],
+                            record["rank"],
+                            record["score"],
+                            record["performance"],
+                            record["old_rating"],
+                            record["new_rating"],
+                        )
+                        for record in records
+                    ],
+                )
+                connection.executemany(
+                    "INSERT INTO task_results VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (contest_id, record["user_name"], task, *result)
+                        for record in records
+                        for task, result in record["tasks"].items()
+                    ],
+                )
+        finally:
+            connection.close()
+
+    def member_history(self, user_name: str, limit: int) -> pd.DataFrame:
+        """部員の直近 limit 回のコンテスト結果を、古い順に返す"""
+        connection = self._connect()
+        try:
+            history = pd.read_sql_query(
+                "SELECT r.contest_id, r.club_rank, r.rank, r.score, r.performance,"
+                " r.old_rating, r.new_rating"
+                " FROM results r JOIN contests c USING (contest_id)"
+                f" WHERE r.user_name = ? ORDER BY {_CONTEST_ORDER} DESC LIMIT ?",
+                connection,
+                params=(user_name, limit),
+            )
+        finally:
+            connection.close()
+        return history.iloc[::-1].reset_index(drop=True)
+
+    def club_performance(self, limit: int) -> pd.DataFrame:
+        """直近 limit 回のコンテストごとの参加人数とパフォーマンスの集計を、古い順に返す"""
+        connection = self._connect()
+        try:
+            results = pd.read_sql_query(
+                "SELECT r.contest_id, r.user_name, r.performance"
+                " FROM results r JOIN ("
+                "   SELECT contest_id, " + _CONTEST_ORDER + " AS held"
+                "   FROM contests c ORDER BY held DESC LIMIT ?"
+                " ) recent USING (contest_id)"
+                " ORDER BY recent.held",
+                connection,
+                params=(limit,),
+            )
+        finally:
+            connection.close()
+        summary = results.groupby("contest_id", sort=False).agg(
+            participants=("user_name", "count"),
+            mean_performance=("performance", "mean"),
+            max_performance=("performance", "max"),
+        )
+        return summary.reset_index()
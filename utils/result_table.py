@@ -0,0 +1,282 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 色が変わるレートの境目と、それぞれの帯の色 (灰・茶・緑・水・青・黄・橙・赤)
+RATING_BANDS = np.array([400, 800, 1200, 1600, 2000, 2400, 2800])
+BAND_COLORS = [
+    {"red": 0.5, "green": 0.5, "blue": 0.5},  # 灰色
+    {"red": 0.47, "green": 0.262, "blue": 0.082},  # 茶色
+    {"red": 0.215, "green": 0.494, "blue": 0.133},  # 緑色
+    {"red": 0.337, "green": 0.741, "blue": 0.749},  # 水色
+    {"red": 0, "green": 0, "blue": 0.960},  # 青色
+    {"red": 0.752, "green": 0.752, "blue": 0.239},  # 黄色
+    {"red": 0.937, "green": 0.529, "blue": 0.200},  # 橙色
+    {"red": 0.917, "green": 0.200, "blue": 0.137},  # 赤色
+]
+HEADER = ["順位", "ユーザー", "得点", "A", "B", "C", "D", "E", "F", "G", "perf", "レート変化"]
+# 結果を集計する部員の所属
+CLUB_AFFILIATION = "電子電脳技術研究会"
+# レート更新後に公開される、コンテストごとのパフォーマンスとレート
+PERFORMANCE_URL = "https://raw.githubusercontent.com/key-moon/ac-predictor-data/refs/heads/master/results/{contest_id}.json"
+
+
+def contest_tasks(contest_id: str) -> List[str]:
+    """コンテストIDから問題のリストを生成する (a から g まで)"""
+    return [f"{contest_id}_{chr(ord('a') + i)}" for i in range(7)]
+
+
+def parse_performance(items: List[Dict[str, Any]]) -> Dict[str, tuple]:
+    """ac-predictor-data の結果を {ユーザー: (パフォーマンス, 旧レート, 新レート)} にする"""
+    return {
+        item["UserScreenName"]: (item["Performance"], item["OldRating"], item["NewRating"])
+        for item in items
+    }
+
+
+def color_bands(values) -> np.ndarray:
+    """レートやパフォーマンスの配列を色の帯の番号に変換する (欠損は -1)"""
+    values = np.asarray(values, dtype=float)
+    bands = np.searchsorted(RATING_BANDS, values, side="right")
+    return np.where(np.isnan(values), -1, bands)
+
+
+def rating_to_color(rating):
+    """Rating に応じた色を返す"""
+    return BAND_COLORS[int(color_bands([rating])[0])]
+
+
+def true_performance(performance, is_rated: bool) -> np.ndarray:
+    """400以下のパフォーマンスを補正前の値に戻す (欠損は NaN のまま)"""
+    performance = np.asarray(performance, dtype=float)
+    if not is_rated:
+        return performance
+    with np.errstate(over="ignore"):
+        corrected = np.round(400 / np.exp((400 - performance) / 400))
+    return np.where(performance <= 400, corrected, performance)
+
+
+def _optional(value: float) -> Optional[int]:
+    return None if math.isnan(value) else int(value)
+
+
+def _nan_to_none(values: np.ndarray) -> list:
+    """配列をリストに変換し、NaN を None にする"""
+    return np.where(np.isnan(values), None, values.astype(object)).tolist()
+
+
+class ResultTable:
+    """1コンテスト分の部員の結果を、列ごとの数値の配列で持つ表
+
+    パフォーマンスの補正や色の判定は配列のまま一括で行い、
+    表示用の文字列は rows() で描画するときにだけ作る。
+    欠損値は NaN で表す。
+    """
+
+    def __init__(
+        self,
+        contest_id: str,
+        is_rated: bool,
+        tasks: Sequence[str],
+        user_names: Sequence[str],
+        rank,
+        score,
+        task_score,
+        task_penalty,
+        task_failure,
+        performance=None,
+        old_rating=None,
+        new_rating=None,
+    ):
+        self.contest_id = contest_id
+        self.is_rated = is_rated
+        self.tasks = list(tasks)
+        self.user_names = list(user_names)
+        count = len(self.user_names)
+        self.rank = np.asarray(rank, dtype=np.int64).reshape(count)
+        self.score = np.asarray(score, dtype=float).reshape(count)
+        shape = (count, len(self.tasks))
+        self.task_score = np.asarray(task_score, dtype=float).reshape(shape)
+        self.task_penalty = np.asarray(task_penalty, dtype=np.int64).reshape(shape)
+        self.task_failure = np.asarray(task_failure, dtype=np.int64).reshape(shape)
+        # ac-predictor から取得した値 (補正前のパフォーマンス)
+        self.performance, self.old_rating, self.new_rating = (
+            np.full(count, np.nan) if values is None else np.asarray(values, dtype=float)
+            for values in (performance, old_rating, new_rating)
+        )
+
+    def __len__(self) -> int:
+        return len(self.user_names)
+
+    @classmethod
+    def from_standings(
+        cls,
+        contest_id: str,
+        standings: Dict[str, Any],
+        tasks: Sequence[str],
+        affiliation: str,
+        performance_data: Optional[Dict[str, tuple]] = None,
+    ) -> "ResultTable":
+        """順位表のJSONから、所属に affiliation を含む参加者の表を作る"""
+        user_names, rank, score, task_cells = [], [], [], []
+        for row in standings["StandingsData"]:
+            if affiliation not in (row.get("Affiliation") or ""):
+                continue
+            try:
+                user_name = row["UserScreenName"]
+                row_rank = row["Rank"]
+                row_score = row["TotalResult"]["Score"] / 100
+            except (KeyError, TypeError) as e:
+                print(f"行の処理中にエラーが発生しました: {e}, row: {row}")
+                continue
+            task_results = row.get("TaskResults") or {}
+            cells = []
+            for task in tasks:
+                # (得点, ペナルティ, 不正解数)。未提出は得点を NaN にする
+                cell = (np.nan, 0, 0)
+                task_result = task_results.get(task)
+                if task_result:
+                    try:
+                        cell = (
+                            task_result["Score"],
+                            task_result["Penalty"],
+                            task_result.get("Failure", 0),
+                        )
+                    except (KeyError, TypeError) as e:
+                        print(
+                            f"Task result 処理中にエラーが発生しました: {e}, task_result: {task_result}"
+                        )
+                cells.append(cell)
+            user_names.append(user_name)
+            rank.append(row_rank)
+            score.append(row_score)
+            task_cells.append(cells)
+
+        cells = np.array(task_cells, dtype=float).reshape(len(user_names), len(tasks), 3)
+        table = cls(
+            contest_id,
+            standings.get("IsRated", True),
+            tasks,
+            user_names,
+            rank,
+            score,
+            cells[..., 0],
+            cells[..., 1],
+            cells[..., 2],
+        )
+        if performance_data:
+            table.apply_performance(performance_data)
+        return table
+
+    def apply_performance(self, performance_data: Dict[str, tuple]):
+        """ac-predictor のデータからパフォーマンスとレートの列を埋め直す"""
+        missing = (None, None, None)
+        values = np.array(
+            [performance_data.get(user_name, missing) for user_name in self.user_names],
+            dtype=float,
+        ).reshape(len(self), 3)
+        self.performance, self.old_rating, self.new_rating = values.T
+
+    @property
+    def adjusted_performance(self) -> np.ndarray:
+        """表示するパフォーマンス (400以下を補正したもの)"""
+        return true_performance(self.performance, self.is_rated)
+
+    def rating_colors(self) -> List[Optional[dict]]:
+        """新しいレートに応じた各行の色 (レートがなければ None)"""
+        return [
+            BAND_COLORS[band] if band >= 0 else None
+            for band in color_bands(self.new_rating)
+        ]
+
+    def performance_colors(self) -> List[Optional[dict]]:
+        """パフォーマンスに応じた各行の色 (パフォーマンスがなければ None)"""
+        return [
+            BAND_COLORS[band] if band >= 0 else None
+            for band in color_bands(self.adjusted_performance)
+        ]
+
+    def rows(self) -> List[list]:
+        """スプレッドシートに書き込む表示用の行を作る"""
+        performance = self.adjusted_performance
+        rows = []
+        for i, user_name in enumerate(self.user_names):
+            cells = []
+            for score, penalty, failure in zip(
+                self.task_score[i], self.task_penalty[i], self.task_failure[i]
+            ):
+                if math.isnan(score):
+                    cells.append("-")
+                elif score >= 1:
+                    points = int(score // 100)
+                    cells.append(f"{points} ({penalty})" if penalty > 0 else f"{points}")
+                elif score == 0:
+                    cells.append(f"({failure + penalty})")
+                else:
+                    cells.append(f"({penalty})")
+
+            if math.isnan(self.old_rating[i]) or math.isnan(self.new_rating[i]):
+                rating_change = "-"
+            else:
+                old_rating, new_rating = int(self.old_rating[i]), int(self.new_rating[i])
+                rating_change = f"{old_rating} → {new_rating} ({new_rating - old_rating})"
+
+            rows.append(
+                [f"{i + 1} ({self.rank[i]})", user_name, float(self.score[i])]
+                + cells
+                + [
+                    "-" if math.isnan(performance[i]) else int(performance[i]),
+                    rating_change,
+                ]
+            )
+        return rows
+
+    def records(self) -> List[Dict[str, Any]]:
+        """ResultStore に記録する形式に変換する"""
+        performance = self.adjusted_performance
+        records = []
+        for i, user_name in enumerate(self.user_names):
+            tasks = {
+                task: (
+                    float(self.task_score[i, j] / 100),
+                    int(self.task_penalty[i, j]),
+                    int(self.task_failure[i, j]),
+                )
+                for j, task in enumerate(self.tasks)
+                if not math.isnan(self.task_score[i, j])
+            }
+            records.append(
+                {
+                    "user_name": user_name,
+                    "club_rank": i + 1,
+                    "rank": int(self.rank[i]),
+                    "score": float(self.score[i]),
+                    "performance": _optional(performance[i]),
+                    "old_rating": _optional(self.old_rating[i]),
+                    "new_rating": _optional(self.new_rating[i]),
+                    "tasks": tasks,
+                }
+            )
+        return records
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON や YAML に保存できる形式に変換する (NaN は None にする)"""
+        return {
+            "contest_id": self.contest_id,
+            "is_rated": self.is_rated,
+            "tasks": self.tasks,
+            "user_names": self.user_names,
+            "rank": self.rank.tolist(),
+            "score": self.score.tolist(),
+            "task_score": _nan_to_none(self.task_score),
+            "task_penalty": self.task_penalty.tolist(),
+            "task_failure": self.task_failure.tolist(),
+            "performance": _nan_to_none(self.performance),
+            "old_rating": _nan_to_none(self.old_rating),
+            "new_rating": _nan_to_none(self.new_rating),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ResultTable":
+        return cls(**data)